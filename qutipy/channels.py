@@ -20,14 +20,17 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
 
+import functools
 import itertools
 
 import cvxpy as cvx
 import numpy as np
+import scipy.sparse as sp
 from numpy.linalg import inv, matrix_power
 from scipy.linalg import eig, sqrtm
 
 from qutipy.general_functions import (
+    _cvx_apply_map,
     Tr,
     dag,
     eye,
@@ -40,14 +43,15 @@ from qutipy.general_functions import (
     SWAP
 )
 
-from qutipy.misc import cvxpy_to_numpy, numpy_to_cvxpy
+from qutipy.misc import sdp_template, solve_sdp_template
 from qutipy.pauli import (
+    Pauli_transform,
     generate_nQubit_Pauli,
     generate_nQubit_Pauli_X,
     generate_nQubit_Pauli_Z,
 )
 from qutipy.states import max_ent, random_density_matrix, random_state_vector, generate_Bell_basis
-from qutipy.weyl import discrete_Weyl, discrete_Weyl_Z
+from qutipy.weyl import discrete_Weyl, discrete_Weyl_transform, discrete_Weyl_Z
 from qutipy.linalg import generate_linear_op_basis, gram_schmidt, vec, Sqrtm
 
 ##################################################################################
@@ -55,24 +59,333 @@ from qutipy.linalg import generate_linear_op_basis, gram_schmidt, vec, Sqrtm
 ##################################################################################
 
 
-def choi_representation(K, dA, L=None, adjoint=False, normalized=False):
+class QuantumChannel:
+    """
+    A linear map (typically a quantum channel) from operators on a dA-dimensional
+    space to operators on a dB-dimensional space, stored in any of the following
+    representations:
+
+        - kraus: a list of Kraus operators K_i, each of size dB x dA.
+        - choi: the Choi representation sum_i vec(K_i)vec(K_i)^dag, defined with
+            the channel acting on the second half of the maximally entangled
+            vector, as in choi_representation.
+        - natural: the natural representation sum_i K_i ⊗ conj(K_i), as in
+            natural_representation.
+        - stinespring: the isometry V=sum_i K_i ⊗ |i>, of size dB*dE x dA, as in
+            generate_channel_isometry.
+
+    The channel stores the representation that it was constructed from, and the
+    other representations are computed (with reshapes and einsums) the first time
+    they are needed and then memoized. Obtaining the Kraus representation from the
+    Choi or natural representation requires the map to be completely positive.
+
+    The functions in this module that take Kraus operators (or a Choi
+    representation with choi=True) also accept a QuantumChannel, in which case the
+    memoized representations are used.
+    """
+
+    def __init__(self, dA, dB, kraus=None, choi=None, natural=None, stinespring=None):
+        if kraus is None and choi is None and natural is None and stinespring is None:
+            raise ValueError("At least one representation of the channel is needed.")
+
+        self.dA = dA
+        self.dB = dB
+        self._kraus = None if kraus is None else [np.array(k) for k in kraus]
+        self._choi = None if choi is None else np.array(choi)
+        self._natural = None if natural is None else np.array(natural)
+        self._stinespring = None if stinespring is None else np.array(stinespring)
+
+    @classmethod
+    def from_kraus(cls, K):
+        """
+        Constructs the channel from its Kraus operators. The dimensions are
+        determined from the shape of the Kraus operators.
+        """
+
+        dB, dA = np.shape(K[0])
+
+        return cls(dA, dB, kraus=K)
+
+    @classmethod
+    def from_choi(cls, J, dA, dB):
+        return cls(dA, dB, choi=J)
+
+    @classmethod
+    def from_natural(cls, N, dA, dB):
+        return cls(dA, dB, natural=N)
+
+    @classmethod
+    def from_stinespring(cls, V, dA, dB):
+        return cls(dA, dB, stinespring=V)
+
+    @property
+    def kraus(self):
+        if self._kraus is None:
+            if self._stinespring is not None:
+                dE = self._stinespring.shape[0] // self.dB
+                V = np.reshape(self._stinespring, (self.dB, dE, self.dA))
+                self._kraus = [V[:, i, :] for i in range(dE)]
+            else:
+                self._kraus = _choi_to_kraus_eigh(self.choi, self.dA, self.dB)
+
+        return self._kraus
+
+    @property
+    def choi(self):
+        if self._choi is None:
+            if self._natural is not None:
+                N = np.reshape(self._natural, (self.dB, self.dB, self.dA, self.dA))
+                J = np.transpose(N, (2, 0, 3, 1))
+                self._choi = np.reshape(J, (self.dA * self.dB, self.dA * self.dB))
+            else:
+                self._choi = choi_representation(self.kraus, self.dA)
+
+        return self._choi
+
+    @property
+    def natural(self):
+        if self._natural is None:
+            if self._kraus is not None or self._stinespring is not None:
+                K = np.array(self.kraus)
+                N = np.einsum("ibj,ick->bcjk", K, np.conjugate(K))
+                self._natural = np.reshape(N, (self.dB**2, self.dA**2))
+            else:
+                self._natural = choi_to_natural(self._choi, self.dA, self.dB)
+
+        return self._natural
+
+    @property
+    def stinespring(self):
+        if self._stinespring is None:
+            K = np.array(self.kraus)
+            V = np.transpose(K, (1, 0, 2))
+            self._stinespring = np.reshape(V, (self.dB * len(K), self.dA))
+
+        return self._stinespring
+
+    def apply(self, rho, sys=None, dim=None, adjoint=False):
+        """
+        Applies the channel to rho, as in apply_channel.
+        """
+
+        return apply_channel(self.kraus, rho, sys, dim, adjoint)
+
+    def adjoint(self):
+        """
+        Returns the adjoint of the channel.
+        """
+
+        return QuantumChannel(self.dB, self.dA, kraus=[dag(k) for k in self.kraus])
+
+    def __repr__(self):
+        reps = [
+            name
+            for name in ["kraus", "choi", "natural", "stinespring"]
+            if getattr(self, "_" + name) is not None
+        ]
+
+        return (
+            "QuantumChannel(dA="
+            + str(self.dA)
+            + ", dB="
+            + str(self.dB)
+            + ", computed="
+            + str(reps)
+            + ")"
+        )
+
+
+class ProductChannel(QuantumChannel):
+    """
+    The tensor product of the channels in the list factors (each given by a list
+    of Kraus operators or by a QuantumChannel), which acts on the tensor product
+    of the input spaces of the factors, in the same order.
+
+    The product is kept in factored form: the Kraus operators of the product are
+    generated one at a time by iter_kraus, the channel is applied one factor at a
+    time (see apply), and the Choi and natural representations are computed from
+    the Choi representations of the factors (the Choi representation of a tensor
+    product of channels is a permutation of the tensor product of their Choi
+    representations). The full list of product Kraus operators is only built if
+    the kraus (or stinespring) representation is requested.
+    """
+
+    def __init__(self, factors):
+        self.factors = [
+            f if isinstance(f, QuantumChannel) else QuantumChannel.from_kraus(f)
+            for f in factors
+        ]
+
+        self.dA = int(np.prod([f.dA for f in self.factors]))
+        self.dB = int(np.prod([f.dB for f in self.factors]))
+        self._kraus = None
+        self._choi = None
+        self._natural = None
+        self._stinespring = None
+
+    def iter_kraus(self):
+        """
+        Generates the Kraus operators of the product channel one at a time, in the
+        same order as tensor_channels.
+        """
+
+        for K in itertools.product(*[f.kraus for f in self.factors]):
+            yield functools.reduce(np.kron, K)
+
+    @property
+    def kraus(self):
+        if self._kraus is None:
+            self._kraus = list(self.iter_kraus())
+
+        return self._kraus
+
+    @property
+    def choi(self):
+        if self._choi is None:
+            n = len(self.factors)
+            dims = []
+            for f in self.factors:
+                dims += [f.dA, f.dB]
+
+            # The tensor product of the Choi representations acts on the systems
+            # A1 B1 A2 B2 ..., which are reordered to A1 A2 ... B1 B2 ...
+            J = functools.reduce(np.kron, [f.choi for f in self.factors])
+            perm = list(range(1, 2 * n, 2)) + list(range(2, 2 * n + 1, 2))
+            self._choi = syspermute(J, perm, dims)
+
+        return self._choi
+
+    @property
+    def natural(self):
+        if self._natural is None:
+            self._natural = choi_to_natural(self.choi, self.dA, self.dB)
+
+        return self._natural
+
+    def apply(self, rho, sys=None, dim=None, adjoint=False):
+        """
+        Applies the channel to rho, as in apply_channel, one factor at a time.
+        """
+
+        if sys is None:
+            sys = [1]
+            dim = [self.dB if adjoint else self.dA]
+
+        dim = list(dim)
+
+        # Split every system in sys into the input systems of the factors.
+        local_dims = [f.dB if adjoint else f.dA for f in self.factors]
+
+        new_dim = []
+        first = {}
+        for i, d in enumerate(dim):
+            if i + 1 in sys:
+                first[i + 1] = len(new_dim)
+                new_dim += local_dims
+            else:
+                new_dim.append(d)
+
+        X = rho
+
+        for k, f in enumerate(self.factors):
+            X = apply_channel(
+                f.kraus, X, [first[s] + k + 1 for s in sys], new_dim, adjoint
+            )
+            for s in sys:
+                new_dim[first[s] + k] = f.dA if adjoint else f.dB
+
+        return X
+
+    def adjoint(self):
+        """
+        Returns the adjoint of the channel.
+        """
+
+        return ProductChannel([f.adjoint() for f in self.factors])
+
+    def __repr__(self):
+        return (
+            "ProductChannel(dA="
+            + str(self.dA)
+            + ", dB="
+            + str(self.dB)
+            + ", factors="
+            + str(len(self.factors))
+            + ")"
+        )
+
+
+def _choi_to_kraus_eigh(J, dA, dB, tol=1e-12):
+    """
+    Kraus operators of a CP map from its (Hermitian, PSD) Choi representation,
+    using its eigendecomposition. Eigenvectors with eigenvalues below tol (relative
+    to the largest eigenvalue) are discarded.
+    """
+
+    D, U = np.linalg.eigh(J)
+
+    if np.any(D < -tol * np.max(np.abs(D))):
+        raise ValueError("The map is not completely positive.")
+
+    K = []
+    for i in np.flatnonzero(D > tol * np.max(np.abs(D))):
+        # vec(K)=K^T flattened (row-major), so K is obtained by reshaping and
+        # transposing the eigenvector.
+        K.append(np.sqrt(D[i]) * np.reshape(U[:, i], (dA, dB)).T)
+
+    return K
+
+
+def choi_representation(K, dA=None, L=None, adjoint=False, normalized=False):
     """
     Returns the Choi representation of the superoperator with Kraus operators K
     and L. dA is the dimension of the input space of the channel.
 
     The Choi represenatation is defined with the channel acting on the second
-    half of the maximally entangled vector.
+    half of the maximally entangled vector, so that it is equal to
+
+        sum_i vec(K_i)vec(L_i)^dag,
+
+    which is computed directly from the Kraus operators. K can also be a
+    QuantumChannel, in which case its (memoized) Choi representation is used.
     """
 
-    Gamma = max_ent(dA, normalized=normalized)
+    if isinstance(K, QuantumChannel) and L is None:
+        J = K.choi
+        if normalized:
+            return J / K.dA
+        else:
+            return J
 
-    if L == None:
-        return apply_superoperator(K, K, Gamma, [2], [dA, dA])
+    if isinstance(K, QuantumChannel):
+        K = K.kraus
+    if isinstance(L, QuantumChannel):
+        L = L.kraus
+
+    K = np.array(K, dtype=np.complex128)
+    L = K if L is None else np.array(L, dtype=np.complex128)
+
+    # One-dimensional operators are treated as row vectors, as in apply_channel.
+    if K.ndim == 2:
+        K = K[:, np.newaxis, :]
+    if L.ndim == 2:
+        L = L[:, np.newaxis, :]
+
+    dB = K.shape[1]
+    dA = K.shape[2]
+
+    # vec(K_i)=sum_j |j> ⊗ K_i|j>, so the entries of the Choi representation are
+    # J[(j,b),(k,c)]=sum_i K_i[b,j]conj(L_i[c,k]).
+    J = np.einsum("ibj,ick->jbkc", K, np.conjugate(L))
+    J = np.reshape(J, (dA * dB, dA * dB))
+
+    if normalized:
+        return J / dA
     else:
-        return apply_superoperator(K, L, Gamma, [2], [dA, dA])
+        return J
     
 
-def choi_state(K,dA,L=None,adjoint=False):
+def choi_state(K,dA=None,L=None,adjoint=False):
     """
     Returns the normalized Choi representation of the superoperator
     with Kraus operators K and L. dA is the dimension of the input
@@ -95,9 +408,13 @@ def natural_representation(K):
 
     N=sum_i K_i ⊗ conj(K_i),
 
-    where the sum is over the Kraus operators K_i in K.
+    where the sum is over the Kraus operators K_i in K. K can also be a
+    QuantumChannel, in which case its (memoized) natural representation is used.
     """
 
+    if isinstance(K, QuantumChannel):
+        return K.natural
+
     return np.sum([tensor(k, np.conjugate(k)) for k in K], 0)
 
 
@@ -107,8 +424,14 @@ def choi_to_kraus(P, dA, dB):
 
     The Choi representation is defined with the channel acting on the second half of
     the maximally entangled vector.
+
+    P can also be a QuantumChannel, in which case its (memoized) Kraus
+    representation is returned.
     """
 
+    if isinstance(P, QuantumChannel):
+        return P.kraus
+
     D, U = eig(P)
 
     U_cols = U.shape[1]
@@ -149,6 +472,9 @@ def choi_to_natural(C_AB, dA, dB):
     with a simple reshuffling of indices.
     """
 
+    if isinstance(C_AB, QuantumChannel):
+        return C_AB.natural
+
     C_AB = np.array(C_AB)
 
     return np.array(
@@ -164,21 +490,31 @@ def choi_to_stinespring(C_AB, dA, dB):
     Stinespring representation.
     """
 
+    if isinstance(C_AB, QuantumChannel):
+        C_AB = C_AB.choi
+
     C_AB_purif = vec(sqrtm(C_AB))
     gamma = max_ent(dA, normalized=False, as_matrix=False)
 
     return tensor(dag(gamma), eye(dB * (dA * dB))) @ tensor(eye(dA), C_AB_purif)
 
 
-def generate_channel_isometry(K, dA, dB):
+def generate_channel_isometry(K, dA=None, dB=None):
     """
     Generates an isometric extension of the
     channel specified by the Kraus operators K. dA is the dimension of the
     input space of the channel, and dB is the dimension of the output space
     of the channel. If dA=dB, then the function also outputs a unitary
     extension of the channel given by a particular construction.
+
+    K can also be a QuantumChannel, in which case dA and dB do not have to be
+    specified.
     """
 
+    if isinstance(K, QuantumChannel):
+        dA, dB = K.dA, K.dB
+        K = K.kraus
+
     dimE = len(K)
 
     V = np.sum([tensor(K[i], ket(dimE, i)) for i in range(dimE)], 0)
@@ -204,7 +540,7 @@ def generate_channel_isometry(K, dA, dB):
         return V
 
 
-def transfer_matrix(K, dA, dB, basis="W", as_dict=False):
+def transfer_matrix(K, dA=None, dB=None, basis="W", as_dict=False, fast=True):
     """
     For the channel N with input dimension dA, output dimension dB,
     and Kraus operators in K, this function
@@ -229,31 +565,85 @@ def transfer_matrix(K, dA, dB, basis="W", as_dict=False):
         - basis='standard': this reverts to the natural_representation
             function.
 
+    The transfer matrix is obtained from the natural representation N by a change
+    of basis: with the (row-major) vectorized basis elements stacked as the rows of
+    the matrices B_in and B_out,
+
+        c=(1/dB)*conj(B_out)*N*B_in^T.
+
+    If fast=True, then for the 'W', 'Wtensor', and 'pauli' bases, the change of
+    basis is done with the fast transforms discrete_Weyl_transform and
+    Pauli_transform instead of with the matrices B_in and B_out.
+
+    K can also be a QuantumChannel, in which case dA and dB do not have to be
+    specified.
     """
 
+    if isinstance(K, QuantumChannel):
+        dA, dB = K.dA, K.dB
+
     if basis == "standard":
         return natural_representation(K)
     else:
+        N = natural_representation(K)
+
+        c = _change_of_basis(N, dA, dB, basis.lower(), fast)
+
+        if isinstance(c, str):
+            return c
+
+        c = (1 / dB) * c
+
         if as_dict:
-            c = {}
+            return {(i, j): c[i, j] for j in range(dA**2) for i in range(dB**2)}
         else:
-            c = np.zeros((dB**2, dA**2), dtype=complex)
+            return c
 
-        Binput = generate_linear_op_basis(dA, basis=basis)
-        Boutput = generate_linear_op_basis(dB, basis=basis)
 
-        for j in range(len(Binput)):
-            for i in range(len(Boutput)):
-                if as_dict:
-                    c[(i, j)] = (1 / dB) * Tr(
-                        dag(Boutput[i]) @ apply_channel(K, Binput[j])
-                    )
-                else:
-                    c[i, j] = (1 / dB) * Tr(
-                        dag(Boutput[i]) @ apply_channel(K, Binput[j])
-                    )
+def _change_of_basis(N, dA, dB, basis, fast):
+    """
+    Calculates conj(B_out)*N*B_in^T for the superoperator N (acting on row-major
+    vectorized operators), as needed for transfer_matrix.
+    """
+
+    qubits = all(2 ** int(round(np.log2(d))) == d for d in [dA, dB])
+
+    if fast and basis == "w":
+
+        def transform(X, d):
+            return discrete_Weyl_transform(X, d, 1)
+
+    elif fast and basis == "pauli" and qubits:
+
+        def transform(X, d):
+            return Pauli_transform(X, int(round(np.log2(d))))
+
+    elif fast and basis == "wtensor" and qubits:
+        # The tensor-product Weyl basis with local dimension 2 (the default of
+        # generate_linear_op_basis).
+        def transform(X, d):
+            return discrete_Weyl_transform(X, 2, int(round(np.log2(d))))
+
+    else:
+        B_in = generate_linear_op_basis(dA, basis=basis)
+        B_out = generate_linear_op_basis(dB, basis=basis)
+        if isinstance(B_in, str):
+            return B_in
+        elif isinstance(B_out, str):
+            return B_out
+
+        B_in = np.reshape(B_in, (dA**2, dA**2))
+        B_out = np.reshape(B_out, (dB**2, dB**2))
+
+        return np.conjugate(B_out) @ N @ B_in.T
 
-        return c
+    # transform(X,d) calculates conj(B)*vec(X) for every X in the batch. Applying
+    # it to the rows of conj(N) gives conj(N*B_in^T)^T, whose rows are then the
+    # vectorized images N(B_j) of the input basis elements.
+    A = np.conjugate(transform(np.reshape(np.conjugate(N), (dB**2, dA, dA)), dA))
+    C = transform(np.reshape(A.T, (dA**2, dB, dB)), dB)
+
+    return C.T
 
 
 ##################################################################################
@@ -273,9 +663,13 @@ def adjoint_superoperator(K,L):
 def adjoint_channel(K):
     """
     Determines the adjoint of the quantum channel defined by its Kraus operators,
-    contained in the list K.
+    contained in the list K. If K is a QuantumChannel, then the adjoint is also
+    returned as a QuantumChannel.
     """
 
+    if isinstance(K, QuantumChannel):
+        return K.adjoint()
+
     return adjoint_superoperator(K,K)[0]
 
 
@@ -286,9 +680,13 @@ def apply_channel(K, rho, sys=None, dim=None, adjoint=False):
     rho are given by dim.
 
     If adjoint is True, then this function applies the adjoint of the given
-    channel.
+    channel. K can also be a QuantumChannel; a ProductChannel is applied one
+    factor at a time.
     """
 
+    if isinstance(K, ProductChannel):
+        return K.apply(rho, sys, dim, adjoint)
+
     return apply_superoperator(K, K, rho, sys, dim, adjoint)
 
 
@@ -300,12 +698,17 @@ def apply_superoperator(K, L, rho, sys=None, dim=None, adjoint=False):
 
     If adjoint is True, then this function applies the adjoint of the given
     superoperator.
+
+    rho can also be an array of shape (...,D,D), i.e., a stack of operators, in
+    which case the superoperator is applied to every operator in the stack.
+
+    K and L can also be QuantumChannels.
     """
 
-    if isinstance(rho, cvx.Variable):
-        rho = cvxpy_to_numpy(rho)
-        rho_out = apply_superoperator(K, L, rho, sys, dim, adjoint)
-        return numpy_to_cvxpy(rho_out)
+    if isinstance(K, QuantumChannel):
+        K = K.kraus
+    if isinstance(L, QuantumChannel):
+        L = L.kraus
 
     if adjoint:
         K_tmp = K
@@ -315,47 +718,178 @@ def apply_superoperator(K, L, rho, sys=None, dim=None, adjoint=False):
         K = [dag(K_tmp[i]) for i in range(len(K_tmp))]
         L = [dag(L_tmp[i]) for i in range(len(L_tmp))]
 
+    if isinstance(rho, cvx.Expression):
+        M, shape = superoperator_map(K, L, sys, dim)
+        return _cvx_apply_map(M, rho, shape)
+
     if sys is None:  # Applying the channel to the full state.
         return np.sum([K[i] @ rho @ dag(L[i]) for i in range(len(K))], 0)
     else:  # Applying the channel to subsystems
-        A = []
-        B = []
-        n = len(
-            dim
-        )  # [2, 2, _2, _2] Total number of systems corresponding to the state rho
-        k = len(
-            sys
-        )  # [ 3, 4 ] # Total number of systems on which the channel is being applied
-        indices = itertools.product(
-            range(len(K)), repeat=k
-        )  # All possible tuples of the indices of the Kraus operators of the channel
-        for index in indices:
-            l = 0
-            X = 1
-            Y = 1
-            for i in range(n):
-                if i + 1 in sys:
-                    X = tensor(X, K[index[l]])
-                    Y = tensor(Y, L[index[l]])
-                    l += 1
-                else:
-                    X = tensor(X, eye(dim[i]))
-                    Y = tensor(Y, eye(dim[i]))
-            A.append(X)
-            B.append(Y)
+        # The superoperator acts as a product on the systems in sys, so it can be
+        # applied one system at a time. For each system, the Kraus operators are
+        # contracted only with the corresponding (row and column) axes of rho, so
+        # that no operator on the full space is ever constructed.
+        K = np.array(K)
+        L = np.array(L)
+
+        # One-dimensional operators are treated as row vectors, as in tensor().
+        if K.ndim == 2:
+            K = K[:, np.newaxis, :]
+        if L.ndim == 2:
+            L = L[:, np.newaxis, :]
+
+        dim = list(dim)
+        n = len(dim)
+
+        rho = np.array(rho)
+        batch = rho.shape[:-2]
+        b = len(batch)
+
+        X = np.reshape(rho, batch + tuple(dim + dim))
+
+        for s in sys:
+            X = apply_local_superoperator(K, L, X, b + s - 1, n)
+            dim[s - 1] = K.shape[1]
+
+        return np.reshape(X, batch + (np.prod(dim), np.prod(dim)))
+
+
+def superoperator_map(K, L, sys=None, dim=None):
+    """
+    Returns the sparse matrix M of the superoperator with Kraus operators in K and
+    L acting on the systems specified by the list sys (see apply_superoperator),
+    acting on (row-major) vectorized operators, i.e.,
+
+        M @ rho.reshape(-1) = apply_superoperator(K, L, rho, sys, dim).reshape(-1),
+
+    together with the shape of the output operator. This is used to apply
+    superoperators to cvxpy expressions.
+    """
+
+    K = [np.atleast_2d(k) for k in K]
+    L = [np.atleast_2d(l) for l in L]
+
+    if sys is None:
+        M = sp.csr_matrix(
+            np.sum([np.kron(K[i], np.conjugate(L[i])) for i in range(len(K))], 0)
+        )
+
+        return M, (K[0].shape[0], L[0].shape[0])
+
+    dim = list(dim)
+    M = sp.identity(int(np.prod(dim)) ** 2, format="csr")
 
-        return np.sum([A[i] @ rho @ dag(B[i]) for i in range(len(A))], 0)
+    # Since vec(K rho L^†)=(K ⊗ conj(L))vec(rho), the map is built one system at a
+    # time from the Kraus operators extended by identities on the other systems.
+    for s in sys:
+        I1 = sp.identity(int(np.prod(dim[: s - 1])))
+        I2 = sp.identity(int(np.prod(dim[s:])))
 
+        M_s = 0
+        for i in range(len(K)):
+            K_i = sp.kron(sp.kron(I1, K[i]), I2)
+            L_i = sp.kron(sp.kron(I1, np.conjugate(L[i])), I2)
+            M_s = M_s + sp.kron(K_i, L_i)
 
-def compose_channels(C):
+        M = sp.csr_matrix(M_s) @ M
+        dim[s - 1] = K[0].shape[0]
+
+    D = int(np.prod(dim))
+
+    return M, (D, D)
+
+
+def apply_local_superoperator(K, L, X, axis, n):
+    """
+    Applies the superoperator with Kraus operators in K and L to one tensor
+    factor of the operator X, which should be given as an array with 2*n axes:
+    the first n axes index the rows of each subsystem, and the last n axes index
+    the columns. The superoperator acts on the subsystem with row axis given by
+    axis (counting from zero). X can also have leading (batch) axes, in which
+    case axis should be offset by the number of batch axes. K and L should be
+    arrays of shape (r,dB,dA), with r the number of Kraus operators.
+
+    The cost is O(r*dB*dA*D^2), where D^2 is the number of elements of X, because
+    the Kraus operators are only contracted with the axes they act on.
+    """
+
+    # Contract the Kraus operators with the row axis of the subsystem. The result
+    # has axes (r,dB,<remaining axes of X>).
+    Y = np.tensordot(K, X, axes=([2], [axis]))
+
+    # Contract conj(L) with the column axis of the subsystem and sum over the
+    # Kraus operators at the same time. The column axis of X is at position
+    # n+axis, which is n+axis+1 in Y after removing the row axis and adding the
+    # two Kraus axes at the front.
+    Y = np.tensordot(Y, np.conjugate(L), axes=([0, n + axis + 1], [0, 2]))
+
+    # Move the new row and column axes back to their original positions.
+    return np.moveaxis(Y, [0, -1], [axis, n + axis])
+
+
+def compress_kraus(K, tol=1e-12, method="auto"):
+    """
+    Returns a list of Kraus operators for the same CP map as the Kraus operators
+    in K, with the minimal number of Kraus operators (the Kraus rank of the map).
+    Zero and linearly dependent Kraus operators are thereby removed.
+
+    Choices for the method are:
+
+        - method='gram': uses the eigendecomposition of the Gram matrix
+            G_ij=Tr[K_i^dagger*K_j], so that the new Kraus operators are linear
+            combinations of the given ones. The cost is independent of the
+            dimension of the Choi representation.
+        - method='choi': uses the eigendecomposition of the Choi representation
+            (see choi_to_kraus).
+        - method='auto' (default): uses 'gram' if the number of Kraus operators
+            is smaller than dA*dB, and 'choi' otherwise.
+
+    Eigenvalues below tol (relative to the largest eigenvalue) are discarded.
+    K can also be a QuantumChannel.
+    """
+
+    if isinstance(K, QuantumChannel):
+        K = K.kraus
+
+    K = np.array(K)
+    r, dB, dA = K.shape
+
+    if method == "auto":
+        method = "gram" if r < dA * dB else "choi"
+
+    if method == "choi":
+        return _choi_to_kraus_eigh(choi_representation(K, dA), dA, dB, tol=tol)
+    elif method == "gram":
+        M = np.reshape(K, (r, dA * dB))
+        G = np.conjugate(M) @ M.T
+        D, U = np.linalg.eigh(G)
+
+        # With M=Q*S*V^dagger, the minimal Kraus operators correspond to the
+        # columns of Q*S=M*V, i.e., to the combinations sum_i U[i,k]*K_i.
+        keep = np.flatnonzero(D > tol * np.max(np.abs(D)))[::-1]
+        K_new = np.tensordot(U[:, keep], K, axes=([0], [0]))
+
+        return [K_new[k] for k in range(len(keep))]
+    else:
+        raise ValueError("Unknown method '{}'.".format(method))
+
+
+def compose_channels(C, compress=False, tol=1e-12):
     """
     Takes a composition of channels. The variable C should be a list of lists,
     with each list consisting of the Kraus operators of the channels to be composed.
 
     If C=[K1,K2,...,Kn], then this function returns the composition such that
     the channel corresponding to K1 is applied first, then K2, etc.
+
+    If compress=True, then the Kraus operators are reduced to the minimal number
+    with compress_kraus (with tolerance tol).
+
+    The elements of C can also be QuantumChannels.
     """
 
+    C = [c.kraus if isinstance(c, QuantumChannel) else c for c in C]
+
     d = C[0][0].shape[0]
 
     lengths = []
@@ -373,16 +907,33 @@ def compose_channels(C):
             tmp = C[i][comb[i]] @ tmp
         K_n.append(tmp)
 
-    return K_n
+    if compress:
+        return compress_kraus(K_n, tol)
+    else:
+        return K_n
 
 
-def tensor_channels(C):
+def tensor_channels(C, lazy=False, compress=False, tol=1e-12):
     """
     Takes the tensor product of the channels in C.
 
-    C is a list of lists of Kraus operators.
+    C is a list of lists of Kraus operators (or of QuantumChannels).
+
+    If lazy=True, then a ProductChannel is returned, which does not construct the
+    product Kraus operators unless they are requested. Otherwise, if
+    compress=True, then the Kraus operators are reduced to the minimal number
+    with compress_kraus (with tolerance tol). Since the Kraus rank of a product is
+    the product of the Kraus ranks, the factors are compressed first.
     """
 
+    if lazy:
+        return ProductChannel(C)
+
+    C = [c.kraus if isinstance(c, QuantumChannel) else c for c in C]
+
+    if compress:
+        C = [compress_kraus(c, tol) for c in C]
+
     lengths = []
     for c in C:
         lengths.append(len(c))
@@ -400,14 +951,29 @@ def tensor_channels(C):
     return K_n
 
 
-def n_channel_uses(K, n):
+def n_channel_uses(K, n, lazy=False, compress=False, tol=1e-12):
     """
     Given the Kraus operators K of a channel, this function generates the
     Kraus operators corresponding to the n-fold tensor power of the channel.
     dA is the dimension of the input space, and dA the dimension of the
     output space.
+
+    If lazy=True, then a ProductChannel is returned, which does not construct the
+    r^n product Kraus operators unless they are requested. Otherwise, if
+    compress=True, then the Kraus operators of the channel are first reduced to
+    the minimal number with compress_kraus (with tolerance tol), so that the
+    result has the minimal number of Kraus operators as well.
     """
 
+    if lazy:
+        return ProductChannel([K] * n)
+
+    if isinstance(K, QuantumChannel):
+        K = K.kraus
+
+    if compress:
+        K = compress_kraus(K, tol)
+
     r = len(K)  # Number of Kraus operators
 
     combs = list(itertools.product(*[range(r)] * n))
@@ -430,6 +996,9 @@ def channel_scalar_multiply(K, x):
     This means that each Kraus operator is multiplied by sqrt(x)!
     """
 
+    if isinstance(K, QuantumChannel):
+        K = K.kraus
+
     K_new = []
 
     for i in range(len(K)):
@@ -438,30 +1007,96 @@ def channel_scalar_multiply(K, x):
     return K_new
 
 
-def diamond_norm(K, dA, dB, L=None, display=False, choi=False, dual=False, HP=False, return_var=False):
+def _Weyl_diagonal_coefficients(J, d, tol=1e-9):
     """
-    Computes the diamond norm of a superoperator with Kraus operators in the list K.
-    dA is the dimension of the input space of the channel, and dB is the
-    dimension of the output space.
+    Checks whether the map with Choi representation J, with input and output
+    dimension d, is of the form X -> sum_a c_a W_a X W_a^dagger, where the W_a are
+    the discrete-Weyl operators or (if d=2^n) the n-qubit Pauli operators. This is
+    the case for the maps constructed by Pauli_channel, Pauli_channel_nQubit,
+    Pauli_channel_qudit, and depolarizing_channel (and for differences of them).
 
-    The function can be used to calculate the diamond norm of an arbitrary superoperator,
-    not just a completely-positive map. In that case, the lists K and L 
-    contain operators forming an operator-sum decomposition of the map.
+    Returns the coefficients c_a if this is the case, and None otherwise.
+    """
 
-    You can set HP=True if the map is Hermiticity preserving, in which case
-    one can evaluate a slightly simpler SDP in order to get the diamond norm.
+    bases = ["w"]
+    if d > 2 and 2 ** int(round(np.log2(d))) == d:
+        bases.append("pauli")
 
-    The form of the SDP used comes from Theorem 3.1 of:
+    for basis in bases:
+        B = generate_linear_op_basis(d, basis=basis)
 
-        'Simpler semidefinite programs for completely bounded norms',
-            Chicago Journal of Theoretical Computer Science 2013,
-            by John Watrous
+        # The columns of V are the vectorized basis operators, which are
+        # orthogonal with norm sqrt(d).
+        V = np.reshape(np.transpose(B, (0, 2, 1)), (d**2, d**2)).T
+        chi = dag(V) @ J @ V / d**2
+
+        c = np.diag(chi)
+
+        if np.allclose(chi - np.diag(c), 0, atol=tol * max(1, np.max(np.abs(c)))):
+            return c
+
+    return None
+
+
+def _unitary_from_choi(J, dA, dB, tol=1e-9):
+    """
+    Returns the unitary U if J is the Choi representation of the unitary channel
+    X -> UXU^dagger (up to the irrelevant global phase of U), and None otherwise.
     """
 
-    if choi:
-        J = K
+    if dA != dB:
+        return None
+
+    w, v = np.linalg.eigh(J)
+
+    if np.any(np.abs(w[:-1]) > tol * max(1, abs(w[-1]))):
+        return None
+
+    U = np.sqrt(abs(w[-1])) * np.reshape(v[:, -1], (dA, dB)).T
+
+    if np.allclose(dag(U) @ U, eye(dA), atol=np.sqrt(tol)):
+        return U
     else:
-        J = choi_representation(K, dA, L)
+        return None
+
+
+def _unitary_diamond_distance(U, V):
+    """
+    Returns the normalized diamond distance between the unitary channels
+    X -> UXU^dagger and X -> VXV^dagger, which is sqrt(1-m^2), where m is the
+    distance from the origin to the numerical range (the convex hull of the
+    eigenvalues) of U^dagger*V. If the eigenvalues span an arc of length s<pi on
+    the unit circle, then m=cos(s/2); otherwise, m=0.
+    """
+
+    angles = np.sort(np.mod(np.angle(np.linalg.eigvals(dag(U) @ V)), 2 * np.pi))
+    gaps = np.diff(np.append(angles, angles[0] + 2 * np.pi))
+    spread = 2 * np.pi - np.max(gaps)
+
+    return np.sin(min(spread, np.pi) / 2)
+
+
+def _is_CP_choi(J, tol=1e-9):
+    """
+    Checks whether J is positive semi-definite, i.e., whether it is the Choi
+    representation of a completely positive map.
+    """
+
+    if not np.allclose(J, dag(J)):
+        return False
+
+    w = np.linalg.eigvalsh((J + dag(J)) / 2)
+
+    return w[0] >= -tol * max(1, abs(w[-1]))
+
+
+def _diamond_norm_problem(dA, dB, dual, HP):
+    """
+    Builds the SDP template (see misc.sdp_template) for diamond_norm, with the
+    Choi representation of the map as the parameter "J".
+    """
+
+    J = cvx.Parameter((dA * dB, dA * dB), hermitian=HP, complex=not HP)
 
     if dual:
         if HP:
@@ -471,32 +1106,18 @@ def diamond_norm(K, dA, dB, L=None, display=False, choi=False, dual=False, HP=Fa
             c=[t>=0,C>>0,cvx.partial_trace(C,[dA,dB],1)==t*eye(dA),-C<<J,J<<C]
 
             obj=cvx.Minimize(t)
-            prob=cvx.Problem(obj,constraints=c)
+            variables={"C": C}
 
-            prob.solve(eps=1e-7,verbose=display)
-
-            if return_var:
-                return prob.value, C.value
-            else:
-                return prob.value
-            
         else:
             Y0=cvx.Variable((dA*dB,dA*dB),hermitian=True)
             Y1=cvx.Variable((dA*dB,dA*dB),hermitian=True)
 
-            M=cvx.bmat([[Y0,-J],[-dag(J),Y1]])
+            M=cvx.bmat([[Y0,-J],[-J.H,Y1]])
 
             c=[Y0>>0,Y1>>0,M>>0]
 
             obj=cvx.Minimize((1/2)*cvx.norm(cvx.partial_trace(Y0,[dA,dB],1))+(1/2)*cvx.norm(cvx.partial_trace(Y1,[dA,dB],1)))
-            prob=cvx.Problem(obj,constraints=c)
-
-            prob.solve(eps=1e-7,verbose=display)
-
-            if return_var:
-                return prob.value, Y0.value, Y1.value
-            else:
-                return prob.value
+            variables={"Y0": Y0, "Y1": Y1}
 
     else:
         if HP:
@@ -507,14 +1128,7 @@ def diamond_norm(K, dA, dB, L=None, display=False, choi=False, dual=False, HP=Fa
             c=[X1>>0,X2>>0,X1+X2==cvx.kron(sigma,eye(dB)),sigma>>0,cvx.trace(sigma)==1]
 
             obj=cvx.Maximize(cvx.real(cvx.trace(J@(X1-X2))))
-            prob=cvx.Problem(obj,constraints=c)
-
-            prob.solve(eps=1e-7,verbose=display)
-
-            if return_var:
-                return prob.value, X1.value, X2.value, sigma.value
-            else:
-                return prob.value
+            variables={"X1": X1, "X2": X2, "sigma": sigma}
 
         else:
             X = cvx.Variable((dA * dB, dA * dB), complex=True)
@@ -526,21 +1140,107 @@ def diamond_norm(K, dA, dB, L=None, display=False, choi=False, dual=False, HP=Fa
             c = [rho0>>0,rho1>>0,M >> 0, cvx.trace(rho0) == 1, cvx.trace(rho1) == 1]
 
             obj = cvx.Maximize(
-                (1 / 2) * cvx.real(cvx.trace(dag(J) @ X))
+                (1 / 2) * cvx.real(cvx.trace(J.H @ X))
                 + (1 / 2) * cvx.real(cvx.trace(J @ X.H))
             )
+            variables={"X": X, "rho0": rho0, "rho1": rho1}
 
-            prob = cvx.Problem(obj, constraints=c)
+    return cvx.Problem(obj, constraints=c), {"J": J}, variables
 
-            prob.solve(eps=1e-7,verbose=display)
 
-            if return_var:
-                return prob.value, X.value, rho0.value, rho1.value
-            else:
-                return prob.value
+def diamond_norm(K, dA=None, dB=None, L=None, display=False, choi=False, dual=False, HP=False, return_var=False, warm_start=False, method="auto"):
+    """
+    Computes the diamond norm of a superoperator with Kraus operators in the list K.
+    dA is the dimension of the input space of the channel, and dB is the
+    dimension of the output space.
 
+    The function can be used to calculate the diamond norm of an arbitrary superoperator,
+    not just a completely-positive map. In that case, the lists K and L 
+    contain operators forming an operator-sum decomposition of the map.
+
+    You can set HP=True if the map is Hermiticity preserving, in which case
+    one can evaluate a slightly simpler SDP in order to get the diamond norm.
+
+    The form of the SDP used comes from Theorem 3.1 of:
 
-def completely_bounded_norm(K, dA, dB, L=None, display=False, choi=False):
+        'Simpler semidefinite programs for completely bounded norms',
+            Chicago Journal of Theoretical Computer Science 2013,
+            by John Watrous
+
+    The SDP is built once for every (dA,dB,dual,HP) and cached, with the Choi
+    representation as a parameter (see misc.sdp_template). If warm_start=True,
+    the solver starts from the solution of the previous call with the same
+    dimensions and options.
+
+    The diamond norm has a closed form in the following cases, which are used
+    instead of the SDP depending on method:
+
+        - method='cp': for a completely positive map, the diamond norm is the
+            largest eigenvalue of sum_i K_i^dagger*K_i (i.e., of the partial trace
+            of the Choi representation over the output).
+        - method='pauli': for a map of the form X -> sum_a c_a W_a X W_a^dagger,
+            with W_a the discrete-Weyl (or n-qubit Pauli) operators, the diamond
+            norm is sum_a |c_a|.
+        - method='sdp': always solve the SDP.
+        - method='auto' (default): use the first of the closed forms above that
+            applies, and solve the SDP otherwise (or if return_var=True).
+
+    K can also be a QuantumChannel, in which case dA and dB do not have to be
+    specified.
+    """
+
+    if isinstance(K, QuantumChannel):
+        dA, dB = K.dA, K.dB
+        if L is None:
+            K, choi = K.choi, True
+
+    if choi:
+        J = K
+    else:
+        J = choi_representation(K, dA, L)
+
+    if method not in ["auto", "sdp", "cp", "pauli"]:
+        raise ValueError("Unknown method '{}'.".format(method))
+
+    if method == "auto" and return_var:
+        method = "sdp"
+
+    if method in ["auto", "cp"]:
+        if _is_CP_choi(J):
+            return np.max(np.linalg.eigvalsh(partial_trace(J, [2], [dA, dB])))
+        elif method == "cp":
+            raise ValueError("The map is not completely positive.")
+
+    if method in ["auto", "pauli"]:
+        c = _Weyl_diagonal_coefficients(J, dA) if dA == dB else None
+        if c is not None:
+            return np.sum(np.abs(c))
+        elif method == "pauli":
+            raise ValueError("The map is not diagonal in the Weyl or Pauli basis.")
+
+    template = sdp_template(
+        ("diamond_norm", dA, dB, dual, HP),
+        lambda: _diamond_norm_problem(dA, dB, dual, HP),
+    )
+
+    value, var = solve_sdp_template(
+        template, {"J": J}, warm_start=warm_start, eps=1e-7, verbose=display
+    )
+
+    if return_var:
+        if dual and HP:
+            return value, var["C"]
+        elif dual:
+            return value, var["Y0"], var["Y1"]
+        elif HP:
+            return value, var["X1"], var["X2"], var["sigma"]
+        else:
+            return value, var["X"], var["rho0"], var["rho1"]
+    else:
+        return value
+
+
+def completely_bounded_norm(K, dA=None, dB=None, L=None, display=False, choi=False):
     """
     Computes the completely bounded norm of the superoperator defined by the
     operators in the lists K and L that form an operator-sum decomposition
@@ -551,6 +1251,10 @@ def completely_bounded_norm(K, dA, dB, L=None, display=False, choi=False):
     from definitions.
     """
 
+    if isinstance(K, QuantumChannel):
+        dA, dB = K.dA, K.dB
+        K, choi = K.kraus, False
+
     if choi:
         F=SWAP([1,2],[dA,dB])
         K=F@K.T@F
@@ -569,7 +1273,34 @@ def completely_bounded_norm(K, dA, dB, L=None, display=False, choi=False):
         return diamond_norm(K, dB, dA, L, display=display, choi=choi)
 
 
-def diamond_distance_channels(K1,K2,dA,dB,choi=False,display=False,return_var=False,dual=False):
+def _diamond_distance_problem(dA, dB, dual):
+    """
+    Builds the SDP template (see misc.sdp_template) for diamond_distance_channels,
+    with the difference of the Choi representations as the parameter "C".
+    """
+
+    C = cvx.Parameter((dA * dB, dA * dB), hermitian=True)
+
+    if dual:
+        Z=cvx.Variable((dA*dB,dA*dB),hermitian=True)
+
+        c=[Z>>0,Z>>C]
+
+        obj=cvx.Minimize(cvx.norm(cvx.partial_trace(Z,[dA,dB],1)))
+        variables={"Z": Z}
+    else:
+        W=cvx.Variable((dA*dB,dA*dB),hermitian=True)
+        rho=cvx.Variable((dA,dA),hermitian=True)
+
+        c=[W>>0,rho>>0,W<<cvx.kron(rho,eye(dB)),cvx.trace(rho)==1]
+
+        obj=cvx.Maximize(cvx.real(cvx.trace(C@W)))
+        variables={"W": W, "rho": rho}
+
+    return cvx.Problem(obj, constraints=c), {"C": C}, variables
+
+
+def diamond_distance_channels(K1,K2,dA=None,dB=None,choi=False,display=False,return_var=False,dual=False,warm_start=False,method="auto"):
     '''
     Computes the diamond norm distance (1/2)||K1-K2||_◇
     between two quantum channels, where K1 and K2 are the
@@ -580,44 +1311,85 @@ def diamond_distance_channels(K1,K2,dA,dB,choi=False,display=False,return_var=Fa
     The SDP we use comes from Section 4 of:
         'Semidefinite Programs for Completely Bounded Norms',
         John Watrous, Theory of Computing 5, 217 (2009).
+
+    The SDP is built once for every (dA,dB,dual) and cached, with the Choi
+    representations as a parameter (see misc.sdp_template). If warm_start=True,
+    the solver starts from the solution of the previous call with the same
+    dimensions.
+
+    The diamond distance has a closed form in the following cases, which are
+    used instead of the SDP depending on method:
+
+        - method='unitary': for two unitary channels X -> UXU^dagger and
+            X -> VXV^dagger, the diamond distance is sqrt(1-m^2), where m is the
+            distance from the origin to the numerical range of U^dagger*V.
+        - method='pauli': for two Pauli channels (as constructed by
+            Pauli_channel, Pauli_channel_nQubit, Pauli_channel_qudit, or
+            depolarizing_channel), with error probabilities p and q, the diamond
+            distance is (1/2)*||p-q||_1.
+        - method='sdp': always solve the SDP.
+        - method='auto' (default): use the first of the closed forms above that
+            applies, and solve the SDP otherwise (or if return_var=True).
+
+    K1 and K2 can also be QuantumChannels, in which case dA and dB do not have
+    to be specified.
     '''
 
-    if choi:
+    for K in [K1, K2]:
+        if isinstance(K, QuantumChannel):
+            dA, dB = K.dA, K.dB
+
+    if isinstance(K1, QuantumChannel):
+        C1=K1.choi
+    elif choi:
         C1=K1
-        C2=K2
     else:
         C1=choi_representation(K1,dA)
-        C2=choi_representation(K2,dA)
-    
-    if dual:
-        Z=cvx.Variable((dA*dB,dA*dB),hermitian=True)
 
-        c=[Z>>0,Z>>C1-C2]
+    if isinstance(K2, QuantumChannel):
+        C2=K2.choi
+    elif choi:
+        C2=K2
+    else:
+        C2=choi_representation(K2,dA)
 
-        obj=cvx.Minimize(cvx.norm(cvx.partial_trace(Z,[dA,dB],1)))
-        prob=cvx.Problem(obj,constraints=c)
+    if method not in ["auto", "sdp", "unitary", "pauli"]:
+        raise ValueError("Unknown method '{}'.".format(method))
 
-        prob.solve(eps=1e-9,verbose=display)
+    if method == "auto" and return_var:
+        method = "sdp"
 
-        if return_var:
-            return prob.value,Z.value
-        else:
-            return prob.value
-    else:
-        W=cvx.Variable((dA*dB,dA*dB),hermitian=True)
-        rho=cvx.Variable((dA,dA),hermitian=True)
+    if method in ["auto", "unitary"]:
+        U1 = _unitary_from_choi(C1, dA, dB)
+        U2 = _unitary_from_choi(C2, dA, dB) if U1 is not None else None
+        if U2 is not None:
+            return _unitary_diamond_distance(U1, U2)
+        elif method == "unitary":
+            raise ValueError("The channels are not both unitary.")
 
-        c=[W>>0,rho>>0,W<<cvx.kron(rho,eye(dB)),cvx.trace(rho)==1]
+    if method in ["auto", "pauli"]:
+        c = _Weyl_diagonal_coefficients(C1 - C2, dA) if dA == dB else None
+        if c is not None:
+            return np.sum(np.abs(c)) / 2
+        elif method == "pauli":
+            raise ValueError("The channels are not both Pauli channels.")
 
-        obj=cvx.Maximize(cvx.real(cvx.trace((C1-C2)@W)))
-        prob=cvx.Problem(obj,constraints=c)
+    template = sdp_template(
+        ("diamond_distance_channels", dA, dB, dual),
+        lambda: _diamond_distance_problem(dA, dB, dual),
+    )
 
-        prob.solve(eps=1e-9,verbose=display)
+    value, var = solve_sdp_template(
+        template, {"C": C1 - C2}, warm_start=warm_start, eps=1e-9, verbose=display
+    )
 
-        if return_var:
-            return prob.value,W.value,rho.value
+    if return_var:
+        if dual:
+            return value,var["Z"]
         else:
-            return prob.value
+            return value,var["W"],var["rho"]
+    else:
+        return value
 
 
 ##################################################################################
@@ -994,7 +1766,7 @@ def Pauli_twirl_channel(K,d,input='kraus',output='kraus',n_qubit=False):
     n-qubit Pauli operators to do the twirling.
     '''
 
-    if input=='kraus':
+    if isinstance(K, QuantumChannel) or input=='kraus':
         C=choi_representation(K,d)
     elif input=='choi':
         C=K
@@ -1040,7 +1812,7 @@ def amplitude_damping_channel(gamma):
     return [A1, A2]
 
 
-def T1_T2_channel(T1,T2):
+def T1_T2_channel(T1,T2,compress=False):
     """
     Generates the qubit channel corresponding to T1 and 
     T2 noise. Specifically, this is a concatenation of
@@ -1056,6 +1828,9 @@ def T1_T2_channel(T1,T2):
         arXiv:1210.5799
 
     T1 and T2 should be specified in dimensionless time units.
+
+    If compress=True, then the Kraus operators are reduced to the minimal number
+    (see compress_kraus).
     """
 
     gamma=1-np.exp(-1/T1)
@@ -1063,7 +1838,7 @@ def T1_T2_channel(T1,T2):
 
     #print(gamma,p)
 
-    return compose_channels([amplitude_damping_channel(gamma),phase_damping_channel(p)])
+    return compose_channels([amplitude_damping_channel(gamma),phase_damping_channel(p)],compress=compress)
 
 
 
@@ -1249,7 +2024,7 @@ def closest_unital_channel(K,d,choi=False,display=False,return_var=False):
     equal to d.
     """
 
-    if choi:
+    if choi and not isinstance(K, QuantumChannel):
         C=K
     else:
         C=choi_representation(K,d)
@@ -1288,7 +2063,7 @@ def closest_Pauli_channel(K,d,n_qubit=False,choi=False,display=False,return_var=
     channel in the n-qubit Pauli operator representation.
     """
 
-    if choi:
+    if choi and not isinstance(K, QuantumChannel):
         C=K
     else:
         C=choi_representation(K,d)
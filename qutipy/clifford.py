@@ -28,27 +28,35 @@ from qutipy.general_functions import (
     dag,
     eye,
     ket,
-    trace_distance_pure_states,
-    unitary_distance,
+    pure_state_key,
+)
+from qutipy.pauli import (
+    Pauli_transform,
+    PauliString,
+    generate_nQubit_Pauli_X,
+    generate_nQubit_Pauli_Z,
 )
 
 
-def Clifford_group_generators(n):
+def Clifford_group_generators(n, local=False):
     """
     Outputs the generators of the n-qubit Clifford group.
+
+    If local=True, then the generators are returned as LocalGates (see the gates
+    module), which avoids building 2^n x 2^n matrices.
     """
 
     G = []
 
     if n == 1:
-        G = [H_i(1, 1), S_i(1, 1)]
+        G = [H_i(1, 1, local=local), S_i(1, 1, local=local)]
     else:
         for i in range(1, n + 1):
-            G.append(H_i(i, n))
-            G.append(S_i(i, n))
+            G.append(H_i(i, n, local=local))
+            G.append(S_i(i, n, local=local))
             for j in range(1, n + 1):
                 if i < j:
-                    G.append(CNOT_ij(i, j, n))
+                    G.append(CNOT_ij(i, j, n, local=local))
                 else:
                     continue
 
@@ -145,71 +153,60 @@ def Clifford_twirl_channel_one_qubit(K, rho, sys=[1], dim=[2]):
     return rho_twirl, C
 
 
-def generate_Clifford_group(n, display=False):
+def generate_Clifford_group(n, display=False, as_tableau=False):
     """
     Generates the n-qubit Clifford group. The display variable is for testing
     purposes, and to see the progress through the code.
 
-    Note that even for n=2, this code will take a long time to run! There are
-    11520 elements of the two-qubit Clifford group!
+    The group is generated by a breadth-first search over products of the
+    generators. Every element is identified by its stabilizer tableau, which is
+    a canonical form of the element up to a global phase, so that checking whether
+    an element has already been generated takes constant time. The dense unitaries
+    are computed only for the elements that are added to the group, and not at all
+    if as_tableau=True, in which case the elements are returned as CliffordTableau
+    objects.
+
+    There are 24 elements of the one-qubit Clifford group and 11520 elements of
+    the two-qubit Clifford group. To sample elements of the Clifford group for
+    larger n, use Clifford_group_element or random_Clifford instead.
     """
 
     G = Clifford_group_generators(n)
+    G_T = [
+        (CliffordTableau.from_unitary(g, n), CliffordTableau.from_unitary(dag(g), n))
+        for g in G
+    ]
 
-    def in_list(L, elem):
-        # Last modified: 27 June 2019
-        """
-        Checks if the given unitary elem is in the list L.
-        """
+    C_T = [CliffordTableau.identity(n)]
+    C = [eye(2**n)]
+    found = set(C_T)
 
-        x = 0
-        for l in L:
-            if (
-                np.around(unitary_distance(l, elem), 10) == 0
-            ):  # Check of the distance is zero (up to 10 decimal places)
-                x = 1
-                break
+    # Products of elements found in earlier rounds have already been checked, so
+    # only the elements that were added in the last round need to be multiplied by
+    # the generators.
+    start = 0
 
-        return x
+    while start < len(C_T):
+        end = len(C_T)
 
-    C = [eye(2**n)]
-    generated = False
-
-    while not generated:
-        tmp = []
-        num_added = 0
-
-        for c in C:
-            for g in G:
-                t1 = c @ g
-                t2 = c @ dag(g)
-
-                # t1 and t2 might be the same, in which case we add only one of the two to the list (if needed).
-                # Also, t1 and t2 might already by in tmp (up to global phase),
-                # so we need to check for that as well.
-                if np.around(unitary_distance(t1, t2), 10) == 0:
-                    if not in_list(C, t1) and not in_list(tmp, t1):
-                        tmp.append(t1)
-                        num_added += 1
-                # if t1 and t2 are different, add both to the list (if needed).
-                else:
-                    if not in_list(C, t1) and not in_list(tmp, t1):
-                        tmp.append(t1)
-                        num_added += 1
-                    if not in_list(C, t2) and not in_list(tmp, t2):
-                        tmp.append(t2)
-                        num_added += 1
-
-        if num_added > 0:
-            for t in tmp:
-                C.append(t)
-        else:
-            generated = True
+        for i in range(start, end):
+            for g, (g_T, g_dag_T) in zip(G, G_T):
+                for t_T, h in [(C_T[i] * g_T, g), (C_T[i] * g_dag_T, dag(g))]:
+                    if t_T not in found:
+                        found.add(t_T)
+                        C_T.append(t_T)
+                        if not as_tableau:
+                            C.append(C[i] @ h)
+
+        start = end
 
         if display:
-            print(len(C))
+            print(len(C_T))
 
-    return C
+    if as_tableau:
+        return C_T
+    else:
+        return C
 
 
 def generate_state_2design(C, n, display=False):
@@ -218,31 +215,652 @@ def generate_state_2design(C, n, display=False):
     corresponding state 2-design. This uses the fact that the Clifford
     gates (for any n) form a unitary 2-design, and that any unitary
     t-design can be used to construct a state t-design.
+
+    C can be any iterable (such as a generator) of unitaries or of
+    CliffordTableau objects. Duplicate states are removed using the canonical
+    form given by pure_state_key, so that every state is only compared once
+    against a hash set.
+    """
+
+    S = []
+
+    for s in state_2design_iter(C, n):
+        S.append(s)
+
+        if display:
+            print(len(S))
+
+    return S
+
+
+def state_2design_iter(C, n):
+    """
+    Streaming version of generate_state_2design: takes an iterable (such as a
+    generator) of n-qubit Clifford gates, given as unitaries or CliffordTableau
+    objects, and yields the distinct states C|0...0> one at a time, starting with
+    |0...0> itself.
+    """
+
+    s = ket(2**n, 0)
+    found = {pure_state_key(s)}
+
+    yield s
+
+    for c in C:
+        if isinstance(c, CliffordTableau):
+            s = np.reshape(c.to_state(), (2**n, 1))
+        else:
+            # c|0...0> is the first column of c.
+            s = np.array(c)[:, [0]]
+
+        key = pure_state_key(s)
+
+        if key not in found:
+            found.add(key)
+            yield s
+
+
+def _bit_count(a):
+    return bin(a).count("1")
+
+
+def _bits_to_int(bits):
+    # The first bit is the most significant one.
+    out = 0
+    for b in bits:
+        out = (out << 1) | int(b)
+
+    return out
+
+
+def _int_to_bits(a, n):
+    return [(a >> (n - 1 - j)) & 1 for j in range(n)]
+
+
+def _Pauli_product(p1, p2):
+    """
+    Multiplies two n-qubit Pauli operators, each given as a tuple (x,z,q) of
+    integers, with x and z the bit masks of the X and Z parts (the first qubit
+    being the most significant bit), representing the operator i^q Z^z X^x.
+    """
+
+    x1, z1, q1 = p1
+    x2, z2, q2 = p2
+
+    # (Z^z1 X^x1)(Z^z2 X^x2)=(-1)^{x1.z2} Z^{z1+z2} X^{x1+x2}
+    return (x1 ^ x2, z1 ^ z2, (q1 + q2 + 2 * _bit_count(x1 & z2)) % 4)
+
+
+def _symplectic_inner(v, w):
+    n = len(v) // 2
+    t = 0
+    for i in range(n):
+        t += v[2 * i] * w[2 * i + 1] + w[2 * i] * v[2 * i + 1]
+
+    return t % 2
+
+
+def _transvection(k, v):
+    return (v + _symplectic_inner(k, v) * k) % 2
+
+
+def _find_transvection(x, y):
     """
+    Finds two vectors h1 and h2 such that y=Z_h2 Z_h1 x, where Z_h is the
+    symplectic transvection v -> v+<h,v>h.
+    """
+
+    out = np.zeros((2, len(x)), dtype=np.int64)
+
+    if np.array_equal(x, y):
+        return out
+    if _symplectic_inner(x, y) == 1:
+        out[0] = (x + y) % 2
+        return out
+
+    z = np.zeros(len(x), dtype=np.int64)
+    n = len(x) // 2
+
+    for i in range(n):
+        ii = 2 * i
+        if (x[ii] + x[ii + 1]) != 0 and (y[ii] + y[ii + 1]) != 0:
+            z[ii] = (x[ii] + y[ii]) % 2
+            z[ii + 1] = (x[ii + 1] + y[ii + 1]) % 2
+            if (z[ii] + z[ii + 1]) == 0:
+                z[ii + 1] = 1
+                if x[ii] != x[ii + 1]:
+                    z[ii] = 1
+            out[0] = (x + z) % 2
+            out[1] = (y + z) % 2
+            return out
+
+    for i in range(n):
+        ii = 2 * i
+        if (x[ii] + x[ii + 1]) != 0 and (y[ii] + y[ii + 1]) == 0:
+            if x[ii] == x[ii + 1]:
+                z[ii + 1] = 1
+            else:
+                z[ii + 1] = x[ii]
+                z[ii] = x[ii + 1]
+            break
+
+    for i in range(n):
+        ii = 2 * i
+        if (x[ii] + x[ii + 1]) == 0 and (y[ii] + y[ii + 1]) != 0:
+            if y[ii] == y[ii + 1]:
+                z[ii + 1] = 1
+            else:
+                z[ii + 1] = y[ii]
+                z[ii] = y[ii + 1]
+            break
+
+    out[0] = (x + z) % 2
+    out[1] = (y + z) % 2
+
+    return out
+
+
+def symplectic_matrix(i, n):
+    """
+    Generates the ith element of the symplectic group Sp(2n,Z_2), for
+    i=0,1,...,symplectic_group_size(n)-1, using the algorithm from
+
+        R. Koenig and J. A. Smolin. J. Math. Phys. 55, 122202 (2014).
+
+    The rows of the output are the images of the basis vectors in the ordering
+    (x1,z1,x2,z2,...,xn,zn).
+    """
+
+    nn = 2 * n
+    s = (1 << nn) - 1
+    k = (i % s) + 1
+    i //= s
+
+    f1 = np.array([(k >> j) & 1 for j in range(nn)], dtype=np.int64)
+    e1 = np.zeros(nn, dtype=np.int64)
+    e1[0] = 1
+    T = _find_transvection(e1, f1)
+
+    r = i % (1 << (nn - 1))
+    bits = np.array([(r >> j) & 1 for j in range(nn - 1)], dtype=np.int64)
+
+    eprime = e1.copy()
+    for j in range(2, nn):
+        eprime[j] = bits[j - 1]
+    h0 = _transvection(T[0], eprime)
+    h0 = _transvection(T[1], h0)
+
+    if bits[0] == 1:
+        f1 = 0 * f1
+
+    if n != 1:
+        g = np.zeros((nn, nn), dtype=np.int64)
+        g[0:2, 0:2] = eye(2)
+        g[2:, 2:] = symplectic_matrix(i >> (nn - 1), n - 1)
+    else:
+        g = np.array(eye(2), dtype=np.int64)
+
+    for j in range(nn):
+        g[j] = _transvection(T[0], g[j])
+        g[j] = _transvection(T[1], g[j])
+        g[j] = _transvection(h0, g[j])
+        g[j] = _transvection(f1, g[j])
+
+    return g
+
+
+def symplectic_group_size(n):
+    """
+    Returns the number of elements of the symplectic group Sp(2n,Z_2).
+    """
+
+    N = 1
+    for j in range(1, n + 1):
+        N *= 2 ** (2 * j - 1) * (2 ** (2 * j) - 1)
+
+    return N
+
+
+def Clifford_group_size(n):
+    """
+    Returns the number of elements of the n-qubit Clifford group, up to global
+    phases. This is 24 for n=1 and 11520 for n=2.
+    """
+
+    return symplectic_group_size(n) * 4**n
+
+
+class CliffordTableau:
+    """
+    Stabilizer tableau of an n-qubit Clifford unitary U (up to a global phase).
+
+    The tableau consists of the 2n Pauli operators U X_j U^dag (rows 0,...,n-1)
+    and U Z_j U^dag (rows n,...,2n-1), for j=1,...,n. Every row is stored as a
+    pair of integers x and z, whose bits are the X and Z parts of the Pauli
+    operator (with the first qubit being the most significant bit), together with
+    a sign bit r, so that the row is (-1)^r P_1 ⊗ ... ⊗ P_n, with every P_j being
+    one of I, X, Y, Z.
+
+    Two tableaux are equal if and only if the corresponding unitaries are equal up
+    to a global phase, so the tableau is also used as the (hashable) canonical form
+    of a Clifford element. The dense unitary is only constructed when calling the
+    to_unitary() method.
+    """
+
+    def __init__(self, n, x, z, r):
+        self.n = n
+        self.x = tuple(int(a) for a in x)
+        self.z = tuple(int(a) for a in z)
+        self.r = tuple(int(a) % 2 for a in r)
+
+        if not (len(self.x) == len(self.z) == len(self.r) == 2 * n):
+            raise ValueError("The tableau must have 2n rows.")
+
+    @classmethod
+    def identity(cls, n):
+        x = [1 << (n - 1 - j) for j in range(n)] + [0] * n
+        z = [0] * n + [1 << (n - 1 - j) for j in range(n)]
+
+        return cls(n, x, z, [0] * (2 * n))
+
+    @classmethod
+    def from_unitary(cls, U, n):
+        """
+        Constructs the tableau of the n-qubit Clifford unitary U.
+        """
+
+        U = np.array(U)
+        x = []
+        z = []
+        r = []
+
+        for P in [generate_nQubit_Pauli_X, generate_nQubit_Pauli_Z]:
+            for j in range(n):
+                indices = [0] * n
+                indices[j] = 1
+                c = Pauli_transform(U @ P(indices) @ dag(U), n) / 2**n
+                k = np.argmax(np.abs(c))
+                if not np.isclose(np.abs(c[k]), 1) or not np.isclose(np.imag(c[k]), 0):
+                    raise ValueError("U is not a Clifford unitary.")
+                # k is the index of the Pauli operator in lexicographical ordering,
+                # i.e., its base-4 digits are the indices 0,1,2,3 of I,X,Y,Z.
+                d = [(k // 4 ** (n - 1 - m)) % 4 for m in range(n)]
+                x.append(_bits_to_int([i in [1, 2] for i in d]))
+                z.append(_bits_to_int([i in [2, 3] for i in d]))
+                r.append(int(np.real(c[k]) < 0))
+
+        return cls(n, x, z, r)
+
+    @classmethod
+    def from_index(cls, i, n):
+        """
+        Constructs the ith element of the n-qubit Clifford group, for
+        i=0,1,...,Clifford_group_size(n)-1, without enumerating the group. The
+        symplectic part of the element is given by symplectic_matrix, and the signs
+        of the rows by the bits of i mod 4^n.
+        """
+
+        N = Clifford_group_size(n)
+        if i < 0 or i >= N:
+            raise ValueError("The index must be between 0 and " + str(N - 1) + ".")
+
+        signs = i % 4**n
+        g = symplectic_matrix(i // 4**n, n)
+
+        rows = [g[2 * j] for j in range(n)] + [g[2 * j + 1] for j in range(n)]
+        x = [_bits_to_int(row[0::2]) for row in rows]
+        z = [_bits_to_int(row[1::2]) for row in rows]
+
+        r = [(signs >> k) & 1 for k in range(2 * n)]
+
+        return cls(n, x, z, r)
+
+    @classmethod
+    def random(cls, n, rng=None):
+        """
+        Generates a uniformly random element of the n-qubit Clifford group. rng is
+        an optional numpy random Generator.
+        """
+
+        if rng is None:
+            rng = np.random.default_rng()
+
+        # The index of symplectic_matrix is a mixed-radix number, with the digits
+        # (i mod 4^j-1) and (i mod 2^(2j-1)) used at the level j of the recursion.
+        i = 0
+        place = 1
+        for j in range(n, 0, -1):
+            for radix in [4**j - 1, 2 ** (2 * j - 1)]:
+                i += int(rng.integers(radix)) * place
+                place *= radix
+
+        return cls.from_index(i * 4**n + int(rng.integers(4**n)), n)
+
+    def _row(self, k):
+        # The kth row, in the form (x,z,q) used by _Pauli_product.
+        x = self.x[k]
+        z = self.z[k]
 
-    def in_list(L, elem):
+        return (x, z, (2 * self.r[k] - _bit_count(x & z)) % 4)
+
+    def _image(self, x, z, q):
+        """
+        Returns the image U (i^q Z^z X^x) U^dag in the form (x,z,q).
+        """
+
+        n = self.n
+        out = (0, 0, q)
+        for j in range(n):
+            if (z >> (n - 1 - j)) & 1:
+                out = _Pauli_product(out, self._row(n + j))
+        for j in range(n):
+            if (x >> (n - 1 - j)) & 1:
+                out = _Pauli_product(out, self._row(j))
+
+        return out
+
+    def compose(self, other):
+        """
+        Returns the tableau of the product U*V, where U is the unitary of this
+        tableau and V is the unitary of the tableau other.
+        """
+
+        x = []
+        z = []
+        r = []
+        for k in range(2 * self.n):
+            xk, zk, qk = self._image(*other._row(k))
+            x.append(xk)
+            z.append(zk)
+            r.append(((qk + _bit_count(xk & zk)) % 4) // 2)
+
+        return CliffordTableau(self.n, x, z, r)
+
+    def __mul__(self, other):
+        if not isinstance(other, CliffordTableau):
+            return NotImplemented
+
+        return self.compose(other)
+
+    def symplectic(self):
+        """
+        Returns the 2n x 2n binary symplectic matrix of the tableau, whose rows are
+        the X and Z parts (x1,...,xn,z1,...,zn) of the rows of the tableau.
+        """
+
+        n = self.n
+        M = np.zeros((2 * n, 2 * n), dtype=np.int64)
+        for k in range(2 * n):
+            M[k, 0:n] = _int_to_bits(self.x[k], n)
+            M[k, n:] = _int_to_bits(self.z[k], n)
+
+        return M
+
+    def inverse(self):
+        """
+        Returns the tableau of the inverse unitary.
+        """
+
+        n = self.n
+        Omega = np.kron(np.array([[0, 1], [1, 0]]), eye(n)).astype(np.int64)
+        M = (Omega @ self.symplectic().T @ Omega) % 2
+
+        x = [_bits_to_int(M[k, 0:n]) for k in range(2 * n)]
+        z = [_bits_to_int(M[k, n:]) for k in range(2 * n)]
+        T = CliffordTableau(n, x, z, [0] * (2 * n))
+
+        # U*T maps every X_j and Z_j to itself up to a sign, and these signs are
+        # undone by flipping the signs of the corresponding rows of T.
+        return CliffordTableau(n, x, z, self.compose(T).r)
+
+    def conjugate(self, P):
+        """
+        Returns U P U^dag for the PauliString P.
+        """
+
+        x = _bits_to_int(P.x_bits())
+        z = _bits_to_int(P.z_bits())
+        q = (P.phase - _bit_count(x & z)) % 4
+        x, z, q = self._image(x, z, q)
+
+        return self._Pauli_string(x, z, q)
+
+    def _Pauli_string(self, x, z, q):
+        n = self.n
+
+        return PauliString(
+            _int_to_bits(x, n), _int_to_bits(z, n), q + _bit_count(x & z)
+        )
+
+    def stabilizers(self):
         """
-        Checks if the given pure state elem is in the list L.
+        Returns the stabilizers U Z_j U^dag of the state U|0...0> as PauliStrings.
         """
 
-        x = 0
+        return [self._Pauli_string(*self._row(self.n + j)) for j in range(self.n)]
+
+    def destabilizers(self):
+        """
+        Returns the destabilizers U X_j U^dag as PauliStrings.
+        """
+
+        return [self._Pauli_string(*self._row(j)) for j in range(self.n)]
+
+    def to_state(self):
+        """
+        Constructs the state vector of the stabilizer state U|0...0> (up to a global
+        phase), as a one-dimensional array.
+        """
 
-        for l in L:
-            if np.around(trace_distance_pure_states(l, elem), 10) == 0:
-                x = 1
+        D = 2**self.n
+        stabilizers = self.stabilizers()
+
+        # Project a computational basis vector onto the stabilizer state. At least
+        # one basis vector has a non-zero overlap with the stabilizer state.
+        for b in range(D):
+            psi = np.zeros(D, dtype=np.complex128)
+            psi[b] = 1
+            for S in stabilizers:
+                psi = (psi + S.apply(psi)) / 2
+            if np.linalg.norm(psi) > 1e-8:
                 break
 
-        return x
+        return psi / np.linalg.norm(psi)
 
-    S = [ket(2**n, 0)]
+    def to_unitary(self):
+        """
+        Constructs the 2^n x 2^n unitary of the tableau (up to a global phase). The
+        first column is the stabilizer state U|0...0>, and the other columns are
+        obtained from it as U|b>=U X^b U^dag U|0...0>.
+        """
 
-    for c in C:
-        s_test = c @ ket(2**n, 0)
+        n = self.n
+        D = 2**n
+        destabilizers = self.destabilizers()
 
-        if not in_list(S, s_test):
-            S.append(s_test)
+        U = np.zeros((D, D), dtype=np.complex128)
+        U[:, 0] = self.to_state()
+        for b in range(1, D):
+            # Clear the least significant set bit of b.
+            j = n - 1 - (len(bin(b & -b)) - 3)
+            U[:, b] = destabilizers[j].apply(U[:, b & (b - 1)])
 
-        if display:
-            print(len(S))
+        return U
 
-    return S
+    def key(self):
+        return (self.n, self.x, self.z, self.r)
+
+    def __eq__(self, other):
+        if not isinstance(other, CliffordTableau):
+            return NotImplemented
+
+        return self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        rows = [str(P) for P in self.destabilizers() + self.stabilizers()]
+
+        return "CliffordTableau(" + ", ".join(rows) + ")"
+
+
+def Clifford_group_element(i, n, as_tableau=False):
+    """
+    Generates the ith element of the n-qubit Clifford group, with
+    i=0,1,...,Clifford_group_size(n)-1, without enumerating the group. If
+    as_tableau=True, then the element is returned as a CliffordTableau; otherwise,
+    the unitary is returned.
+    """
+
+    C = CliffordTableau.from_index(i, n)
+
+    if as_tableau:
+        return C
+    else:
+        return C.to_unitary()
+
+
+def random_Clifford(n, as_tableau=False, rng=None):
+    """
+    Generates a uniformly random element of the n-qubit Clifford group. If
+    as_tableau=True, then the element is returned as a CliffordTableau; otherwise,
+    the unitary is returned.
+    """
+
+    C = CliffordTableau.random(n, rng)
+
+    if as_tableau:
+        return C
+    else:
+        return C.to_unitary()
+
+
+class PauliFrame:
+    """
+    Pauli-frame simulation of a Clifford circuit on n qubits with Pauli noise,
+    measurements in the standard basis, and Pauli corrections conditioned on the
+    measurement outcomes.
+
+    Since Clifford gates map Pauli operators to Pauli operators, every sample
+    (shot) of the Pauli noise leaves the state of the circuit equal to the state of
+    the noiseless circuit up to a Pauli operator, called the frame. The frame is
+    conjugated by every gate, and an X or Y in the frame on a measured qubit flips
+    the measurement outcome, which means that the wrong correction is applied. The
+    phase of the frame is irrelevant and is not stored.
+
+    The frames of all of the shots are stored as boolean arrays x and z of shape
+    (shots,n), so that every gate, noise location, and measurement takes time
+    O(shots), independent of the dimension 2^n. The noise is sampled using the
+    numpy random Generator rng. As in the gates module, the qubits are labelled
+    from 1 to n.
+    """
+
+    def __init__(self, n, shots=10000, rng=None):
+        self.n = n
+        self.shots = shots
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.x = np.zeros((shots, n), dtype=bool)
+        self.z = np.zeros((shots, n), dtype=bool)
+
+    def H(self, i):
+        i -= 1
+        self.x[:, i], self.z[:, i] = self.z[:, i].copy(), self.x[:, i].copy()
+
+    def S(self, i):
+        i -= 1
+        self.z[:, i] ^= self.x[:, i]
+
+    def CNOT(self, i, j):
+        i, j = i - 1, j - 1
+        self.x[:, j] ^= self.x[:, i]
+        self.z[:, i] ^= self.z[:, j]
+
+    def CZ(self, i, j):
+        i, j = i - 1, j - 1
+        self.z[:, i] ^= self.x[:, j]
+        self.z[:, j] ^= self.x[:, i]
+
+    def Pauli_noise(self, qubits, p):
+        """
+        Applies Pauli noise to the given qubits, where p is the list of the 4^k
+        probabilities of the k-qubit Pauli operators on the qubits, in the order of
+        generate_nQubit_Pauli (so that p[0] is the probability of no error).
+        """
+
+        k = len(qubits)
+        samples = self.rng.choice(4**k, size=self.shots, p=np.asarray(p).flatten())
+
+        for m, q in enumerate(qubits):
+            index = (samples // 4 ** (k - 1 - m)) % 4
+            self.x[:, q - 1] ^= (index == 1) | (index == 2)
+            self.z[:, q - 1] ^= (index == 2) | (index == 3)
+
+    def Bell_noise(self, i, p):
+        """
+        Applies Bell-diagonal noise to a Bell pair whose first qubit is i, where p
+        is a 2 x 2 array (or a list of length 4) of probabilities such that p[z,x]
+        is the probability of the Bell state bell(z,x), i.e., of the error Z^z X^x
+        on qubit i.
+        """
+
+        samples = self.rng.choice(4, size=self.shots, p=np.asarray(p).flatten())
+
+        self.z[:, i - 1] ^= samples >= 2
+        self.x[:, i - 1] ^= samples % 2 == 1
+
+    def measure(self, i):
+        """
+        Measures qubit i in the standard basis, returning the boolean array that
+        indicates for which shots the outcome is flipped with respect to the
+        noiseless circuit. The frame on the qubit is reset.
+        """
+
+        flips = self.x[:, i - 1].copy()
+        self.x[:, i - 1] = False
+        self.z[:, i - 1] = False
+
+        return flips
+
+    def correct(self, flips, P, qubits):
+        """
+        Accounts for a correction by the Pauli operator P (a PauliString) on the
+        given qubits, conditioned on a measurement outcome, in the shots for which
+        the outcome is flipped (as returned by measure).
+        """
+
+        qubits = np.array(qubits) - 1
+        self.x[:, qubits] ^= flips[:, None] & P.x_bits().astype(bool)
+        self.z[:, qubits] ^= flips[:, None] & P.z_bits().astype(bool)
+
+    def commutes(self, stabilizers, qubits=None):
+        """
+        Returns the boolean array that indicates for which shots the frame on the
+        given qubits (by default, all of the qubits) commutes with all of the
+        Pauli operators in the list stabilizers (of PauliStrings on these qubits).
+        """
+
+        if qubits is None:
+            qubits = range(1, self.n + 1)
+
+        qubits = np.array(qubits) - 1
+        Sx = np.array([S.x_bits() for S in stabilizers], dtype=np.float32)
+        Sz = np.array([S.z_bits() for S in stabilizers], dtype=np.float32)
+
+        x = self.x[:, qubits].astype(np.float32)
+        z = self.z[:, qubits].astype(np.float32)
+
+        return np.all(np.mod(x @ Sz.T + z @ Sx.T, 2) == 0, axis=1)
+
+    def fidelity(self, stabilizers, qubits=None):
+        """
+        Estimates the fidelity of the output state on the given qubits with respect
+        to the (pure) stabilizer state whose stabilizer group is generated by the
+        list stabilizers of n_out PauliStrings on n_out qubits.
+
+        If the noiseless circuit outputs this stabilizer state, then the output
+        state of a shot is equal to it if and only if the frame commutes with all of
+        the stabilizers, so the fidelity is estimated by the fraction of such shots.
+        """
+
+        return np.mean(self.commutes(stabilizers, qubits))
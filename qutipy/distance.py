@@ -23,8 +23,8 @@
 import cvxpy as cvx
 import numpy as np
 
-from qutipy.general_functions import eye, partial_trace, trace_norm
-from qutipy.misc import cvxpy_to_numpy, numpy_to_cvxpy
+from qutipy.general_functions import eye, trace_norm
+from qutipy.misc import sdp_template, solve_sdp_template
 
 
 def norm_trace_dist(rho, sigma, sdp=False, dual=False, display=False):
@@ -68,39 +68,53 @@ def norm_trace_dist(rho, sigma, sdp=False, dual=False, display=False):
         return (1 / 2) * trace_norm(rho - sigma)
 
 
-def norm_diamond_dist(J1, J2, dA, dB, dual=False, display=False):
+def _norm_diamond_dist_problem(dA, dB, dual):
     """
-    Calculates the normalized diamond distance between two channels with
-    Choi representations J1 and J2. For arbitrary superoperators, one can
-    calculate this using the function diamond_norm as follows: (1/2)*diamond_norm(J1,J2,dA,dB).
+    Builds the SDP template (see misc.sdp_template) for norm_diamond_dist, with
+    the difference of the Choi representations as the parameter "J".
     """
 
+    J = cvx.Parameter((dA * dB, dA * dB), hermitian=True)
+
     if not dual:
         rho = cvx.Variable((dA, dA), hermitian=True)
         P = cvx.Variable((dA * dB, dA * dB), hermitian=True)
 
         c = [rho >> 0, P >> 0, P << cvx.kron(rho, eye(dB)), cvx.trace(rho) == 1]
 
-        f = cvx.trace(P @ (J1 - J2))
-
-        obj = cvx.Maximize(cvx.real(f))
-        prob = cvx.Problem(obj, constraints=c)
-
-        prob.solve(verbose=display)
-
-        return prob.value
+        obj = cvx.Maximize(cvx.real(cvx.trace(P @ J)))
 
     else:
         mu = cvx.Variable()
-        Z = cvx.Variable((dA, dB), hermitian=True)
+        Z = cvx.Variable((dA * dB, dA * dB), hermitian=True)
 
-        Z_A = numpy_to_cvxpy(partial_trace(cvxpy_to_numpy(Z), [2], [dA, dB]))
+        Z_A = cvx.partial_trace(Z, [dA, dB], 1)
 
-        c = [mu >= 0, Z >> 0, Z >> J1 - J2, mu * eye(dA) >> Z_A]
+        c = [mu >= 0, Z >> 0, Z >> J, mu * eye(dA) >> Z_A]
 
         obj = cvx.Minimize(mu)
-        prob = cvx.Problem(obj, constraints=c)
 
-        prob.solve(verbose=display)
+    return cvx.Problem(obj, constraints=c), {"J": J}, {}
+
+
+def norm_diamond_dist(J1, J2, dA, dB, dual=False, display=False, warm_start=False):
+    """
+    Calculates the normalized diamond distance between two channels with
+    Choi representations J1 and J2. For arbitrary superoperators, one can
+    calculate this using the function diamond_norm as follows: (1/2)*diamond_norm(J1,J2,dA,dB).
+
+    The SDP is built once for every (dA,dB,dual) and cached (see
+    misc.sdp_template). If warm_start=True, the solver starts from the solution
+    of the previous call with the same dimensions.
+    """
+
+    template = sdp_template(
+        ("norm_diamond_dist", dA, dB, dual),
+        lambda: _norm_diamond_dist_problem(dA, dB, dual),
+    )
+
+    value, _ = solve_sdp_template(
+        template, {"J": J1 - J2}, warm_start=warm_start, verbose=display
+    )
 
-        return prob.value
+    return value
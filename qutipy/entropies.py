@@ -20,46 +20,423 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
 
+import functools
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
 import cvxpy as cvx
 import numpy as np
 from numpy.linalg import matrix_power, norm
 from scipy.linalg import fractional_matrix_power, logm
 from scipy.optimize import minimize
 
-from qutipy.channels import apply_channel, largest_inner_product_channels
-from qutipy.general_functions import Tr, dag, eye, ket, partial_trace, tensor, spectral_norm
+from qutipy.channels import (
+    QuantumChannel,
+    apply_channel,
+    largest_inner_product_channels,
+)
+from qutipy.general_functions import Tr, eye, partial_trace, tensor, spectral_norm
 from qutipy.linalg import Sqrtm,inv
+from qutipy.misc import LRUCache, read_only
+
+# Cache for the eigen-decompositions computed by spectral_decomposition, so that
+# many states can be compared against the same fixed state without recomputing
+# its spectrum.
+spectral_cache = LRUCache(max_bytes=2**26)
+
+
+def spectral_decomposition(X, cache=True):
+    """
+    Returns the eigenvalues and (column) eigenvectors of the Hermitian operator X,
+    or of every operator in a stack X of shape (...,d,d), as given by
+    numpy.linalg.eigh.
+
+    If cache=True, the decomposition is stored in spectral_cache, keyed by the
+    contents of X, and the (read-only) stored arrays are returned on subsequent
+    calls with the same operator.
+    """
+
+    X = np.ascontiguousarray(X)
+
+    if not cache:
+        return np.linalg.eigh(X)
+
+    key = (X.shape, X.dtype.str, hashlib.sha1(X.tobytes()).hexdigest())
+    value = spectral_cache.get(key)
+
+    if value is None:
+        value = read_only(tuple(np.linalg.eigh(X)))
+        spectral_cache.put(key, value)
+
+    return value
+
+
+def _is_hermitian(X):
+    """
+    Checks whether X is a Hermitian operator, or a stack of Hermitian operators.
+    """
+
+    return (
+        X.ndim >= 2
+        and X.shape[-1] == X.shape[-2]
+        and np.allclose(X, np.conj(np.swapaxes(X, -1, -2)))
+    )
+
+
+def _is_state_vector(X):
+    """
+    Checks whether X is a state vector of shape (d,1), or a stack of such vectors.
+    """
+
+    return X.ndim >= 2 and X.shape[-1] == 1 and X.shape[-2] > 1
+
+
+def _Schmidt_entropy(psi, dimA, dimB, tol=1e-12):
+    """
+    Returns the entropy of the reduced states of the pure state psi (or of every
+    state vector in a stack of shape (...,dimA*dimB,1)) on A and on B, which are
+    equal, computed from the squared Schmidt coefficients of psi.
+    """
+
+    M = np.reshape(psi, psi.shape[:-2] + (dimA, dimB))
+    p = np.linalg.svd(M, compute_uv=False) ** 2
+
+    return (0.0 - np.sum(p * _log2_on_support(p, tol), axis=-1))[()]
+
+
+def _kraus(K):
+    """
+    Returns the Kraus operators of K (a list of Kraus operators or a
+    QuantumChannel) as an array of shape (m,dB,dA).
+    """
+
+    if isinstance(K, QuantumChannel):
+        K = K.kraus
+
+    return np.asarray(K)
+
+
+def _pure_output_vectors(K, psi, dim_in=None):
+    """
+    Returns the matrix V whose columns are the vectors K_k*psi, or (I ⊗ K_k)*psi if
+    psi is a state of two dim_in-dimensional systems, so that the output state of
+    the channel K for the input state psi is V*V^dagger.
+    """
+
+    K = _kraus(K)
+
+    if dim_in is None:
+        return np.einsum("kba,a->bk", K, psi)
+    else:
+        M = np.reshape(psi, (dim_in, dim_in))
+        return np.einsum("kba,ia->ibk", K, M).reshape((-1, len(K)))
+
+
+def _apply_batched(f, *X):
+    """
+    Applies the function f to the (d,d) operators in the stacks X, whose batch
+    dimensions are broadcast against each other.
+    """
+
+    batch = np.broadcast_shapes(*(x.shape[:-2] for x in X))
+
+    if batch == ():
+        return f(*X)
+
+    X = [np.broadcast_to(x, batch + x.shape[-2:]) for x in X]
+    out = np.empty(batch)
+
+    for index in np.ndindex(*batch):
+        out[index] = f(*(x[index] for x in X))
+
+    return out
+
+
+def _log2_on_support(w, tol):
+    """
+    Returns the base-2 logarithm of the eigenvalues w on the support (w>tol), and
+    zero elsewhere.
+    """
+
+    support = w > tol
+
+    return np.where(support, np.log2(np.where(support, w, 1)), 0)
+
+
+def _relative_entropy_spectra(rho, sigma, tol):
+    """
+    Spectral kernel for the relative entropy and its variance. With rho=sum_i
+    r_i|r_i><r_i| and sigma=sum_j s_j|s_j><s_j|, returns the arrays r_i, log2(r_i),
+    P_ij=|<r_i|s_j>|^2, and log2(s_j) (logarithms restricted to the supports), as
+    well as a boolean array that is True when supp(rho) is not contained in
+    supp(sigma). The decomposition of a single (two-dimensional) sigma is cached.
+    """
+
+    r, R = np.linalg.eigh(rho)
+    s, S = spectral_decomposition(sigma, cache=sigma.ndim == 2)
+
+    r = np.where(r > tol, r, 0)
+    P = np.abs(np.conj(np.swapaxes(R, -1, -2)) @ S) ** 2
+
+    # Diagonal of rho in the eigenbasis of sigma; its weight on the kernel of
+    # sigma must vanish for the relative entropy to be finite.
+    Q = np.einsum("...i,...ij->...j", r, P)
+    outside = np.sum(np.where(s > tol, 0, Q), axis=-1) > tol
+
+    return r, _log2_on_support(r, tol), P, _log2_on_support(s, tol), outside
+
+
+def _entropy_gradient(rho, tol=1e-12):
+    """
+    Returns the entropy H(rho)=-Tr[rho*log2(rho)] of the positive semi-definite
+    (not necessarily normalized) operator rho, or of every operator in a stack of
+    shape (...,d,d), together with its gradient, i.e., the Hermitian operator G
+    such that dH=Tr[G*drho].
+
+    Since Tr[rho*Dlog(rho)[drho]]=Tr[drho] for the Frechet derivative Dlog(rho) of
+    the logarithm, the gradient is G=-log2(rho)-I/ln(2), where the logarithm is
+    restricted to the support of rho.
+    """
+
+    r, U = np.linalg.eigh(rho)
+    log_r = _log2_on_support(r, tol)
+
+    H = 0.0 - np.sum(r * log_r, axis=-1)
+    G = -(U * (log_r + 1 / np.log(2))[..., np.newaxis, :]) @ np.conj(
+        np.swapaxes(U, -1, -2)
+    )
+
+    return H, G
+
+
+def _state_from_parameters(x):
+    """
+    Returns the unit vector psi=v/|v| with v=x[:n]+1j*x[n:], together with |v|.
+    """
+
+    n = len(x) // 2
+    v = x[:n] + 1j * x[n:]
+    nv = norm(v)
+
+    return v / nv, nv
+
+
+def _state_gradient(psi, nv, g):
+    """
+    Returns the gradient, with respect to the real parameters x of psi (see
+    _state_from_parameters), of f(psi*psi^dagger), given g=G*psi, where G is the
+    gradient of f with respect to the operator psi*psi^dagger.
+    """
+
+    w = 2 * (g - np.real(np.vdot(psi, g)) * psi) / nv
+
+    return np.concatenate([np.real(w), np.imag(w)])
+
+
+def _coherent_inf_objective(x, K, dim_in, dim_out, s=1):
+    """
+    Returns minus the coherent information of the state obtained by sending one
+    share of the pure state specified by x through the channel K, together with
+    its gradient with respect to x.
+    """
+
+    psi, nv = _state_from_parameters(x)
+
+    V = _pure_output_vectors(K, psi, dim_in)
+    rho_AB = V @ np.conj(V.T)
+
+    H_AB, G_AB = _entropy_gradient(rho_AB)
+
+    if s == 1:
+        H, G = _entropy_gradient(partial_trace(rho_AB, [1], [dim_in, dim_out]))
+        G = tensor(eye(dim_in), G)
+    else:
+        H, G = _entropy_gradient(partial_trace(rho_AB, [2], [dim_in, dim_out]))
+        G = tensor(G, eye(dim_out))
+
+    # (I ⊗ K)^dagger(G)*psi=sum_k (I ⊗ K_k^dagger)*G*(I ⊗ K_k)*psi.
+    W = np.reshape((G - G_AB) @ V, (dim_in, dim_out, -1))
+    g = np.einsum("kba,ibk->ia", np.conj(np.asarray(_kraus(K))), W).reshape(-1)
+
+    return H_AB - H, -_state_gradient(psi, nv, g)
+
+
+def _Holevo_inf_objective(x, K, dim, tol=1e-12):
+    """
+    Returns minus the Holevo information of the ensemble obtained by measuring
+    the first (dim^2-dimensional) system of the pure state specified by x in the
+    standard basis and sending the post-measurement states through the channel
+    K, together with its gradient with respect to x.
+    """
+
+    psi, nv = _state_from_parameters(x)
+
+    # The unnormalized post-measurement states R_j=p_j*rho_j.
+    M = np.reshape(psi, (dim**2, dim))
+    R = np.einsum("ja,jb->jab", M, np.conj(M))
+    p = np.real(np.einsum("jaa->j", R))
+
+    # With sigma_j=K(R_j), the Holevo information is
+    # H(sum_j sigma_j)-sum_j [H(sigma_j)+Tr[sigma_j]*log2(p_j)].
+    sigma = apply_channel(K, R)
+    t = np.real(np.einsum("jaa->j", sigma))
+    log_p = _log2_on_support(p, tol)
+
+    H, G = _entropy_gradient(np.sum(sigma, axis=0))
+    H_j, G_j = _entropy_gradient(sigma)
+
+    chi = H - np.sum(H_j + t * log_p)
+
+    # Gradient with respect to R_j, using dp_j=Tr[dR_j].
+    ratio = np.where(p > tol, t / np.where(p > tol, p, 1), 1) / np.log(2)
+    W = apply_channel(
+        K, G - G_j - log_p[:, None, None] * np.eye(G.shape[-1]), adjoint=True
+    )
+    W = W - ratio[:, None, None] * np.eye(dim)
+
+    g = np.einsum("jab,jb->ja", W, M).reshape(-1)
+
+    return -chi, -_state_gradient(psi, nv, g)
+
+
+def _min_output_entropy_objective(x, K):
+    """
+    Returns the entropy of the output of the channel K for the pure input state
+    specified by x, together with its gradient with respect to x.
+    """
+
+    psi, nv = _state_from_parameters(x)
+
+    V = _pure_output_vectors(K, psi)
+
+    H, G = _entropy_gradient(V @ np.conj(V.T))
+
+    # K^dagger(G)*psi=sum_k K_k^dagger*G*K_k*psi.
+    g = np.einsum("kba,bk->a", np.conj(np.asarray(_kraus(K))), G @ V)
 
+    return H, _state_gradient(psi, nv, g)
 
-def relative_entropy_var(rho, sigma):
+
+def _minimize_with_trace(objective, x_init, display=False):
+    """
+    Minimizes the function objective, which returns its value and its gradient,
+    starting from x_init. Returns the optimal value and an array containing the
+    value of the objective after every iteration.
+    """
+
+    last = {}
+
+    def fun(x):
+        value, grad = objective(x)
+        last["x"] = np.copy(x)
+        last["value"] = value
+        return value, grad
+
+    trace = []
+
+    def callback(xk):
+        if not np.array_equal(xk, last["x"]):
+            fun(xk)
+        trace.append(last["value"])
+
+    opt = minimize(
+        fun,
+        x_init,
+        jac=True,
+        callback=callback,
+        options={"disp": display, "gtol": 1e-8},
+    )
+
+    return opt.fun, np.array(trace)
+
+
+def _multistart_minimize(objective, n, display, starts, processes):
+    """
+    Minimizes objective (see _minimize_with_trace) over n real parameters from
+    the given number of random starting points. If starts>1, the optimizations
+    are run in parallel in a pool of processes (with processes workers, by default
+    the number of CPUs). Returns the best optimal value and the list of traces.
+    """
+
+    x_inits = [np.random.rand(n) for _ in range(starts)]
+
+    if starts == 1:
+        results = [_minimize_with_trace(objective, x_inits[0], display)]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(
+                executor.map(
+                    _minimize_with_trace,
+                    [objective] * starts,
+                    x_inits,
+                    [display] * starts,
+                )
+            )
+
+    values = [value for value, _ in results]
+
+    return np.min(values), [trace for _, trace in results]
+
+
+def relative_entropy_var(rho, sigma, tol=1e-12):
     """
     Returns the relative entropy variance of rho and sigma, defined as
 
     V(rho||sigma)=Tr[rho*(log2(rho)-log2(sigma))^2]-D(rho||sigma)^2.
+
+    For Hermitian rho and sigma, this is evaluated from their spectra (see
+    relative_entropy), and rho and sigma can be stacks of operators of shape
+    (...,d,d). The value is inf if supp(rho) is not contained in supp(sigma).
     """
 
-    return (
-        np.real(
-            Tr(
-                rho
-                @ matrix_power((logm(rho)) / np.log(2) - (logm(sigma)) / np.log(2), 2)
+    rho = np.asarray(rho)
+    sigma = np.asarray(sigma)
+
+    if not (_is_hermitian(rho) and _is_hermitian(sigma)):
+        return _apply_batched(
+            lambda X, Y: np.real(
+                Tr(X @ matrix_power((logm(X) - logm(Y)) / np.log(2), 2))
             )
+            - relative_entropy(X, Y) ** 2,
+            rho,
+            sigma,
         )
-        - relative_entropy(rho, sigma) ** 2
+
+    r, log_r, P, log_s, outside = _relative_entropy_spectra(rho, sigma, tol)
+
+    D = np.sum(r * log_r, axis=-1) - np.einsum("...i,...ij,...j->...", r, P, log_s)
+    second = (
+        np.sum(r * log_r**2, axis=-1)
+        - 2 * np.einsum("...i,...ij,...j->...", r * log_r, P, log_s)
+        + np.einsum("...i,...ij,...j->...", r, P, log_s**2)
     )
 
+    return np.where(outside, np.inf, second - D**2)[()]
+
 
 def mutual_information(rhoAB, dimA, dimB):
     """
     Computes the mutual information of the bipartite state rhoAB, defined as
 
-    I(A;B)_rho=D(rhoAB||rhoA⊗ rhoB)
+    I(A;B)_rho=D(rhoAB||rhoA⊗ rhoB)=H(A)+H(B)-H(AB).
+
+    rhoAB can also be a stack of states of shape (...,dimA*dimB,dimA*dimB). If
+    rhoAB is a state vector, then I(A;B)=2H(A), which is computed from the Schmidt
+    coefficients.
     """
 
+    rhoAB = np.asarray(rhoAB)
+
+    if _is_state_vector(rhoAB):
+        return 2 * _Schmidt_entropy(rhoAB, dimA, dimB)
+
     rhoA = partial_trace(rhoAB, [2], [dimA, dimB])
     rhoB = partial_trace(rhoAB, [1], [dimA, dimB])
 
-    return relative_entropy(rhoAB, tensor(rhoA, rhoB))
+    if not _is_hermitian(rhoAB):
+        return relative_entropy(rhoAB, tensor(rhoA, rhoB))
+
+    return entropy(rhoA) + entropy(rhoB) - entropy(rhoAB)
 
 
 def bin_entropy(p):
@@ -90,11 +467,19 @@ def sandwiched_Renyi_rel_ent(rho, sigma, alpha):
 
 def coherent_inf_state(rho_AB, dimA, dimB, s=1):
     """
-    Calculates the coherent information of the state rho_AB.
+    Calculates the coherent information of the state rho_AB, which can also be
+    a stack of states of shape (...,dimA*dimB,dimA*dimB).
 
-    If s=2, then calculates the reverse coherent information.
+    If s=2, then calculates the reverse coherent information. If rho_AB is a
+    state vector, then both are equal to H(A)=H(B), which is computed from the
+    Schmidt coefficients.
     """
 
+    rho_AB = np.asarray(rho_AB)
+
+    if _is_state_vector(rho_AB):
+        return _Schmidt_entropy(rho_AB, dimA, dimB)
+
     if s == 1:  # Calculate I_c(A>B)=H(B)-H(AB)
         rho_B = partial_trace(rho_AB, [1], [dimA, dimB])
         return entropy(rho_B) - entropy(rho_AB)
@@ -141,19 +526,17 @@ def Holevo_inf_ensemble(p, S):
     """
     Computes the Holevo information of an ensemble.
 
-    p is an array of probabilities, and S is an array of states.
+    p is an array of probabilities, and S is an array of states. Batches of
+    ensembles are given by p of shape (...,n) and S of shape (...,n,d,d).
 
     Based on MATLAB code written by Felix Lediztky.
     """
 
-    dim = np.shape(S[0])[0]
-
-    R = np.zeros((dim, dim))
-    av = 0
+    p = np.asarray(p)
+    S = np.asarray(S)
 
-    for i in range(len(p)):
-        R = R + p[i] * S[i]
-        av = av + p[i] * entropy(S[i])
+    R = np.einsum("...i,...ijk->...jk", p, S)
+    av = np.sum(p * entropy(S), axis=-1)
 
     return entropy(R) - av
 
@@ -171,43 +554,67 @@ def Petz_Renyi_rel_ent(rho, sigma, alpha):
     return (1.0 / (alpha - 1)) * np.log2(Q)
 
 
-def coherent_inf_channel(K, dim_in, dim_out, s=1, display=True):
+def coherent_inf_channel(
+    K,
+    dim_in,
+    dim_out,
+    s=1,
+    display=True,
+    starts=1,
+    processes=None,
+    return_all=False,
+):
     """
     Calculates the coherent information of the channel specified by
     the Kraus operators in K.
 
     If s=2, then calculates the reverse coherent information of the channel.
+
+    The optimization over pure input states uses the analytic gradient of the
+    coherent information. If starts>1, then the optimization is repeated from
+    that many random starting points in parallel, using a pool of processes
+    (with processes workers, by default the number of CPUs), and the best value
+    is returned. If return_all=True, then the list of traces, i.e., the values of
+    the coherent information after every iteration of every optimization, is
+    also returned.
     """
 
-    def objfunc(x):
-        Re = np.array(x[0 : dim_in**2])
-        Re = np.reshape(Re, [*Re.shape, 1][:2])  # Build a matrix instead of a list
+    objective = functools.partial(
+        _coherent_inf_objective, K=K, dim_in=dim_in, dim_out=dim_out, s=s
+    )
 
-        Im = np.array(x[dim_in**2 :])
-        Im = np.reshape(Im, [*Im.shape, 1][:2])  # Build a matrix instead of a list
+    value, traces = _multistart_minimize(
+        objective, 2 * dim_in**2, display, starts, processes
+    )
 
-        psi = np.array(Re.T + 1j * Im.T)
-        psi = psi / norm(psi)
+    value = np.max([0, -value])
 
-        psi_AA = psi * dag(psi)
+    if return_all:
+        return value, [-trace for trace in traces]
+    else:
+        return value
 
-        rho_AB = apply_channel(K, psi_AA, [2], dim=[dim_in, dim_in])
 
-        return -coherent_inf_state(rho_AB, dim_in, dim_out, s)
+def entropy(rho, tol=1e-12):
+    """
+    Returns the quantum (von Neumann) entropy of the state rho.
 
-    x_init = np.random.rand(2 * dim_in**2)
+    For Hermitian rho, this is computed from the eigenvalues of rho (those below
+    tol are treated as zero), and rho can be a stack of states of shape (...,d,d).
+    The entropy of a state vector (a pure state) is zero.
+    """
 
-    opt = minimize(objfunc, x_init, options={"disp": display})
+    rho = np.asarray(rho)
 
-    return np.max([0, -opt.fun])
+    if _is_state_vector(rho):
+        return np.zeros(rho.shape[:-2])[()]
 
+    if not _is_hermitian(rho):
+        return _apply_batched(lambda X: -np.real(Tr(X @ logm(X))) / np.log(2), rho)
 
-def entropy(rho):
-    """
-    Returns the quantum (von Neumann) entropy of the state rho.
-    """
+    r = np.linalg.eigvalsh(rho)
 
-    return -np.real(Tr(rho @ logm(rho))) / np.log(2)
+    return (0.0 - np.sum(r * _log2_on_support(r, tol), axis=-1))[()]
 
 
 def hypo_testing_rel_ent(
@@ -267,13 +674,34 @@ def hypo_testing_rel_ent(
                 return -np.log2(prob.value)
 
 
-def relative_entropy(rho, sigma):
+def relative_entropy(rho, sigma, tol=1e-12):
     """
     Computes the standard (von Neumann) quantum relative entropy of rho
-    and sigma, provided that supp(rho) is contained in supp(sigma).
+    and sigma, which is inf if supp(rho) is not contained in supp(sigma).
+
+    For Hermitian rho and sigma, this is computed as the spectral sum
+
+    D(rho||sigma)=sum_i r_i*log2(r_i)-sum_{i,j} r_i*|<r_i|s_j>|^2*log2(s_j),
+
+    where eigenvalues below tol are treated as zero. The eigen-decomposition of
+    sigma is cached (see spectral_decomposition), so comparing many states against
+    the same sigma only diagonalizes sigma once. rho and sigma can also be stacks
+    of operators of shape (...,d,d).
     """
 
-    return np.real(Tr(rho @ (logm(rho) - logm(sigma)))) / np.log(2)
+    rho = np.asarray(rho)
+    sigma = np.asarray(sigma)
+
+    if not (_is_hermitian(rho) and _is_hermitian(sigma)):
+        return _apply_batched(
+            lambda X, Y: np.real(Tr(X @ (logm(X) - logm(Y)))) / np.log(2), rho, sigma
+        )
+
+    r, log_r, P, log_s, outside = _relative_entropy_spectra(rho, sigma, tol)
+
+    D = np.sum(r * log_r, axis=-1) - np.einsum("...i,...ij,...j->...", r, P, log_s)
+
+    return np.where(outside, np.inf, D)[()]
 
 
 def max_relative_entropy(P,Q,sdp=True,dual=False):
@@ -313,69 +741,52 @@ def max_relative_entropy(P,Q,sdp=True,dual=False):
 
 
 
-def Holevo_inf_channel(K, dim, display=True):
+def Holevo_inf_channel(
+    K, dim, display=True, starts=1, processes=None, return_all=False
+):
     """
     Computes the Holevo information of a channel given by its set of
     Kraus operators K. dim is the dimension of the input space of the
     channel.
 
+    The optimization uses the analytic gradient of the Holevo information, and
+    the options starts, processes, and return_all are as in coherent_inf_channel.
+
     Based on MATLAB code written by Felix Leditzky.
     """
 
-    def objfunc(x):
-        Re = np.array(x[0 : dim**3])
-        Im = np.array(x[dim**3 :])
-
-        psi = np.array([Re + 1j * Im]).T
-        psi = psi / norm(psi)
-
-        p = []
-        S = []
-
-        for j in range(dim**2):
-            R = (
-                tensor(dag(ket(dim**2, j)), eye(dim))
-                @ (psi @ dag(psi))
-                @ tensor(ket(dim**2, j), eye(dim))
-            )
-            p.append(Tr(R))
-            rho = R / Tr(R)
-            rho_out = apply_channel(K, rho)
-            S.append(rho_out)
+    objective = functools.partial(_Holevo_inf_objective, K=K, dim=dim)
 
-        return -np.real(Holevo_inf_ensemble(p, S))
-
-    x_init = np.random.rand(2 * dim**3)
-
-    opt = minimize(objfunc, x_init, options={"disp": display})
+    value, traces = _multistart_minimize(
+        objective, 2 * dim**3, display, starts, processes
+    )
 
-    return -opt.fun
+    if return_all:
+        return -value, [-trace for trace in traces]
+    else:
+        return -value
 
 
-def min_output_entropy(K, dim, display=True):
+def min_output_entropy(
+    K, dim, display=True, starts=1, processes=None, return_all=False
+):
     """
     Computes the minimum output entropy of a channel given by its set of
     Kraus operators K. dim is the dimension of the input space of the
     channel.
-    """
 
-    def objfunc(x):
-        Re = np.array(x[0:dim])
-        Im = np.array(x[dim:])
-
-        psi = np.array([Re + 1j * Im]).T
-        psi = psi / norm(psi)
-
-        rho = psi @ dag(psi)
-        rho_out = apply_channel(K, rho)
-
-        return entropy(rho_out)
+    The optimization uses the analytic gradient of the output entropy, and the
+    options starts, processes, and return_all are as in coherent_inf_channel.
+    """
 
-    x_init = np.random.rand(2 * dim)
+    objective = functools.partial(_min_output_entropy_objective, K=K)
 
-    opt = minimize(objfunc, x_init, options={"disp": display})
+    value, traces = _multistart_minimize(objective, 2 * dim, display, starts, processes)
 
-    return opt.fun
+    if return_all:
+        return value, traces
+    else:
+        return value
 
 
 def conditional_min_entropy(P_AB, dA, dB, condition="B", display=False, prec=1e-7):
@@ -24,8 +24,8 @@ import numpy as np
 from scipy.linalg import sqrtm
 
 from qutipy.linalg import Sqrtm
-from qutipy.channels import apply_channel, choi_representation
-from qutipy.general_functions import Tr, dag, ket, trace_norm
+from qutipy.channels import QuantumChannel, choi_representation
+from qutipy.general_functions import Tr, ket, trace_norm
 from qutipy.states import max_ent
 
 
@@ -35,6 +35,9 @@ def avg_fidelity_qubit(K):
     average fidelity is to be found.
     """
 
+    if isinstance(K, QuantumChannel):
+        K = K.kraus
+
     ket0 = ket(2, 0)
     ket1 = ket(2, 1)
     ket_plus = (1.0 / np.sqrt(2)) * (ket0 + ket1)
@@ -46,8 +49,10 @@ def avg_fidelity_qubit(K):
 
     F = 0
 
+    # For a pure state psi, <psi|K(psi)|psi>=sum_k |<psi|K_k|psi>|^2, so that the
+    # output state does not have to be built.
     for state in states:
-        F += np.real(Tr((state @ dag(state)) * apply_channel(K, state @ dag(state))))
+        F += np.sum([np.abs(np.vdot(state, k @ state)) ** 2 for k in K])
 
     return (1.0 / 6.0) * F
 
@@ -94,6 +99,20 @@ def ent_fidelity(sigma, d):
 def fidelity(rho, sigma):
     """
     Returns the fidelity between the states rho and sigma.
+
+    Either state can also be given as a state vector psi (of shape (d,1)), in which
+    case the fidelity is <psi|sigma|psi> (or |<psi|phi>|^2 if both are state
+    vectors), which avoids computing matrix square roots.
     """
 
+    rho = np.asarray(rho)
+    sigma = np.asarray(sigma)
+
+    if rho.shape[-1] == 1 and sigma.shape[-1] == 1:
+        return np.abs(np.vdot(rho, sigma)) ** 2
+    elif rho.shape[-1] == 1:
+        return np.real(np.vdot(rho, sigma @ rho))
+    elif sigma.shape[-1] == 1:
+        return np.real(np.vdot(sigma, rho @ sigma))
+
     return trace_norm(Sqrtm(rho) @ Sqrtm(sigma)) ** 2
@@ -21,99 +21,190 @@
 #
 
 import numpy as np
+import scipy.sparse as sp
 from scipy.linalg import expm
 from scipy.stats import unitary_group
 
-from qutipy.general_functions import dag, eye, ket, syspermute, tensor
+from qutipy.general_functions import dag, eye, ket, tensor
 
 
-def CNOT_ij(i, j, n):
+class LocalGate:
     """
-    CNOT gate on qubits i and j, i being the control and j being the target.
-    The total number of qubits is n.
+    The operator U acting on the qubits in the list qubits (labelled from 1 to n)
+    of a system of n qubits, i.e., U ⊗ I with the tensor factors arranged
+    according to qubits, where U is a 2^k x 2^k matrix for k=len(qubits).
+
+    The 2^n x 2^n matrix is never built: the gate is applied to a vector or
+    matrix X by contracting U with the corresponding axes of X (reshaped into a
+    tensor with one axis per qubit), which takes time O(2^k 2^n) per column of X.
+    Use G @ X and X @ G for the products with the full operator, G.apply(X) for
+    U|psi> or U X U^†, and to_sparse() or to_matrix() if the matrix is needed.
     """
 
-    dims = 2 * np.ones(n)
-    dims = dims.astype(int)
+    # Makes numpy arrays defer to __rmatmul__ in X @ G.
+    __array_ufunc__ = None
 
-    indices = np.linspace(1, n, n)
-    indices_diff = np.setdiff1d(indices, [i, j])
+    def __init__(self, U, qubits, n):
+        qubits = [int(q) for q in np.ravel(qubits)]
 
-    perm_arrange = np.append(np.array([i, j]), indices_diff)
-    perm_rearrange = np.zeros(n)
+        if len(set(qubits)) != len(qubits) or min(qubits) < 1 or max(qubits) > n:
+            raise ValueError("qubits must be distinct integers between 1 and n.")
 
-    for i in range(n):
-        perm_rearrange[i] = np.argwhere(perm_arrange == i + 1)[0][0] + 1
+        self.U = np.asarray(U)
+        self.qubits = qubits
+        self.n = n
 
-    perm_rearrange = perm_rearrange.astype(int)
+        if self.U.shape != (2 ** len(qubits), 2 ** len(qubits)):
+            raise ValueError("U must be a 2^k x 2^k matrix for k=len(qubits).")
 
-    Sx = np.array([[0, 1], [1, 0]])
-    CX = tensor(ket(2, 0) @ dag(ket(2, 0)), eye(2)) + tensor(
-        ket(2, 1) @ dag(ket(2, 1)), Sx
-    )
+    @property
+    def shape(self):
+        return (2**self.n, 2**self.n)
+
+    def adjoint(self):
+        return LocalGate(dag(self.U), self.qubits, self.n)
+
+    def _left(self, U, X):
+        # Calculates (U ⊗ I) X for a 2^n x m matrix (or 2^n vector) X.
+        k = len(self.qubits)
+        axes = [q - 1 for q in self.qubits]
+
+        T = np.reshape(X, (2,) * self.n + X.shape[1:])
+        T = np.tensordot(
+            np.reshape(U, (2,) * (2 * k)), T, axes=(list(range(k, 2 * k)), axes)
+        )
+        T = np.moveaxis(T, list(range(k)), axes)
+
+        return np.reshape(T, X.shape)
+
+    def __matmul__(self, X):
+        if isinstance(X, LocalGate):
+            return NotImplemented
+
+        return self._left(self.U, np.asarray(X))
+
+    def __rmatmul__(self, X):
+        X = np.asarray(X)
+
+        return self._left(self.U.T, X.T).T
+
+    def apply(self, X):
+        """
+        Applies the gate to the state vector X, or (if X is a square matrix) to the
+        density matrix X, giving U X U^†.
+        """
+
+        X = np.asarray(X)
 
-    out_temp = tensor(CX, [eye(2), n - 2])
+        if X.ndim == 2 and X.shape[0] == X.shape[1] and X.shape[0] > 1:
+            return self._left(self.U, self._left(self.U, X).conj().T).conj().T
+        else:
+            return self._left(self.U, X)
 
-    out = syspermute(out_temp, perm_rearrange, dims)
+    def to_sparse(self):
+        """
+        Returns the 2^n x 2^n matrix of the gate as a scipy.sparse CSR matrix, which
+        is built directly from the entries of U.
+        """
 
-    return out
+        k = len(self.qubits)
+        N = 2**self.n
+        shifts = self.n - np.array(self.qubits)
 
+        cols = np.arange(N)
+        local = np.zeros(N, dtype=int)
+        rest = cols.copy()
 
-def CZ_ij(i, j, n):
+        for m in range(k):
+            bit = (cols >> shifts[m]) & 1
+            local |= bit << (k - 1 - m)
+            rest &= ~(1 << shifts[m])
+
+        rows = np.empty((2**k, N), dtype=int)
+
+        for l in range(2**k):
+            rows[l] = rest
+            for m in range(k):
+                rows[l] |= ((l >> (k - 1 - m)) & 1) << shifts[m]
+
+        data = self.U[:, local]
+        nonzero = data != 0
+
+        M = sp.coo_matrix(
+            (
+                data[nonzero],
+                (rows[nonzero], np.broadcast_to(cols, rows.shape)[nonzero]),
+            ),
+            shape=(N, N),
+        )
+
+        return M.tocsr()
+
+    def to_matrix(self):
+        return self.to_sparse().toarray()
+
+    def __repr__(self):
+        return "LocalGate(qubits={}, n={})".format(self.qubits, self.n)
+
+
+def _local_gate(U, qubits, n, sparse=False, local=False):
     """
-    CZ gate on qubits i and j, i being the control and j being the target.
-    The total number of qubits is n. (Note that for the CZ gate it does matter
-    which qubit is the control and which qubit is the target.)
+    Returns the gate U on the given qubits of n qubits as a LocalGate (if
+    local=True), a scipy.sparse matrix (if sparse=True), or a numpy array.
+    """
+
+    G = LocalGate(U, qubits, n)
+
+    if local:
+        return G
+    elif sparse:
+        return G.to_sparse()
+    else:
+        return G.to_matrix()
+
+
+def CNOT_ij(i, j, n, sparse=False, local=False):
     """
+    CNOT gate on qubits i and j, i being the control and j being the target.
+    The total number of qubits is n.
 
-    dims = 2 * np.ones(n)
-    dims = dims.astype(int)
+    If sparse=True, then the gate is returned as a scipy.sparse matrix, and if
+    local=True, then it is returned as a LocalGate (the same holds for all of the
+    gates on the ith and jth qubits in this module).
+    """
 
-    indices = np.linspace(1, n, n)
-    indices_diff = np.setdiff1d(indices, [i, j])
+    Sx = np.array([[0, 1], [1, 0]])
+    CX = tensor(ket(2, 0) @ dag(ket(2, 0)), eye(2)) + tensor(
+        ket(2, 1) @ dag(ket(2, 1)), Sx
+    )
 
-    perm_arrange = np.append(np.array([i, j]), indices_diff)
-    perm_rearrange = np.zeros(n)
+    return _local_gate(CX, [i, j], n, sparse, local)
 
-    for i in range(n):
-        perm_rearrange[i] = np.argwhere(perm_arrange == i + 1)[0][0] + 1
 
-    perm_rearrange = perm_rearrange.astype(int)
+def CZ_ij(i, j, n, sparse=False, local=False):
+    """
+    CZ gate on qubits i and j, i being the control and j being the target.
+    The total number of qubits is n. (Note that for the CZ gate it does matter
+    which qubit is the control and which qubit is the target.)
+    """
 
     Sz = np.array([[1, 0], [0, -1]])
     CZ = tensor(ket(2, 0) @ dag(ket(2, 0)), eye(2)) + tensor(
         ket(2, 1) @ dag(ket(2, 1)), Sz
     )
 
-    out_temp = tensor(CZ, [eye(2), n - 2])
-
-    out = syspermute(out_temp, perm_rearrange, dims)
+    return _local_gate(CZ, [i, j], n, sparse, local)
 
-    return out
 
-
-def H_i(i, n):
+def H_i(i, n, sparse=False, local=False):
     """
     Generates the matrix for the Hadamard gate applied to the ith qubit.
     n is the total number of qubits.
     """
 
-    dims = 2 * np.ones(n)
-    dims = dims.astype(int)
-    indices = np.linspace(1, n, n)
-    indices_diff = np.setdiff1d(indices, i)
-    perm_arrange = np.append(np.array([i]), indices_diff)
-    perm_rearrange = np.zeros(n)
-
-    for i in range(n):
-        perm_rearrange[i] = np.argwhere(perm_arrange == i + 1)[0][0] + 1
-
-    perm_rearrange = perm_rearrange.astype(int)
     H = (1 / np.sqrt(2)) * np.array([[1, 1], [1, -1]])
-    out_temp = tensor(H, [eye(2), n - 1])
-    out = syspermute(out_temp, perm_rearrange, dims)
 
-    return out
+    return _local_gate(H, [i], n, sparse, local)
 
 
 def RandomUnitary(dim):
@@ -124,29 +215,13 @@ def RandomUnitary(dim):
     return unitary_group.rvs(dim)
 
 
-def Rx_i(i, t, n):
+def Rx_i(i, t, n, sparse=False, local=False):
     """
     Rotation about the X axis on qubit i by angle t. The total number of
     qubits is n.
     """
 
-    dims = 2 * np.ones(n)
-    dims = dims.astype(int)
-    indices = np.linspace(1, n, n)
-    indices_diff = np.setdiff1d(indices, i)
-    perm_arrange = np.append(np.array([i]), indices_diff)
-    perm_rearrange = np.zeros(n)
-
-    for i in range(n):
-        perm_rearrange[i] = np.argwhere(perm_arrange == i + 1)[0][0] + 1
-
-    perm_rearrange = perm_rearrange.astype(int)
-    Sx = np.array([[0, 1], [1, 0]])
-    Rx = expm(-1j * t * Sx / 2)
-    out_temp = tensor(Rx, [eye(2), n - 1])
-    out = syspermute(out_temp, perm_rearrange, dims)
-
-    return out
+    return _local_gate(Rx(t), [i], n, sparse, local)
 
 
 def Rx(t):
@@ -159,29 +234,13 @@ def Rx(t):
     return expm(-1j * t * Sx / 2.0)
 
 
-def Ry_i(i, t, n):
+def Ry_i(i, t, n, sparse=False, local=False):
     """
     Rotation about the Y axis on qubit i by angle t. The total number of
     qubits is n.
     """
 
-    dims = 2 * np.ones(n)
-    dims = dims.astype(int)
-    indices = np.linspace(1, n, n)
-    indices_diff = np.setdiff1d(indices, i)
-    perm_arrange = np.append(np.array([i]), indices_diff)
-    perm_rearrange = np.zeros(n)
-
-    for i in range(n):
-        perm_rearrange[i] = np.argwhere(perm_arrange == i + 1)[0][0] + 1
-
-    perm_rearrange = perm_rearrange.astype(int)
-    Sy = np.array([[0, -1j], [1j, 0]])
-    Ry = expm(-1j * t * Sy / 2)
-    out_temp = tensor(Ry, [eye(2), n - 1])
-    out = syspermute(out_temp, perm_rearrange, dims)
-
-    return out
+    return _local_gate(Ry(t), [i], n, sparse, local)
 
 
 def Ry(t):
@@ -194,29 +253,13 @@ def Ry(t):
     return expm(-1j * t * Sy / 2.0)
 
 
-def Rz_i(i, t, n):
+def Rz_i(i, t, n, sparse=False, local=False):
     """
     Rotation about the Z axis on qubit i by angle t. The total number of
     qubits is n.
     """
 
-    dims = 2 * np.ones(n)
-    dims = dims.astype(int)
-    indices = np.linspace(1, n, n)
-    indices_diff = np.setdiff1d(indices, i)
-    perm_arrange = np.append(np.array([i]), indices_diff)
-    perm_rearrange = np.zeros(n)
-
-    for i in range(n):
-        perm_rearrange[i] = np.argwhere(perm_arrange == i + 1)[0][0] + 1
-
-    perm_rearrange = perm_rearrange.astype(int)
-    Sz = np.array([[1, 0], [0, -1]])
-    Rz = expm(-1j * t * Sz / 2)
-    out_temp = tensor(Rz, [eye(2), n - 1])
-    out = syspermute(out_temp, perm_rearrange, dims)
-
-    return out
+    return _local_gate(Rz(t), [i], n, sparse, local)
 
 
 def Rz(t):
@@ -229,7 +272,7 @@ def Rz(t):
     return expm(-1j * t * Sz / 2.0)
 
 
-def S_i(i, n):
+def S_i(i, n, sparse=False, local=False):
     """
     Generates the matrix for the S gate applied to the ith qubit.
     n is the total number of qubits. The S gate is defined as:
@@ -240,22 +283,10 @@ def S_i(i, n):
     It is one of the generators of the Clifford group.
     """
 
-    dims = 2 * np.ones(n)
-    dims = dims.astype(int)
-    indices = np.linspace(1, n, n)
-    indices_diff = np.setdiff1d(indices, i)
-    perm_arrange = np.append(np.array([i]), indices_diff)
-    perm_rearrange = np.zeros(n)
-
-    for i in range(n):
-        perm_rearrange[i] = np.argwhere(perm_arrange == i + 1)[0][0] + 1
-
-    perm_rearrange = perm_rearrange.astype(int)
     S = np.array([[1, 0], [0, 1j]])
-    out_temp = tensor(S, [eye(2), n - 1])
-    out = syspermute(out_temp, perm_rearrange, dims)
 
-    return out
+    return _local_gate(S, [i], n, sparse, local)
+
 
 def QFT(d):
     """
@@ -22,12 +22,12 @@
 
 import itertools
 
-import cvxpy
 import cvxpy as cvx
 import numpy as np
+import scipy.sparse as sp
 from numpy.linalg import norm
 
-from qutipy.misc import cvxpy_to_numpy, numpy_to_cvxpy  
+from qutipy.misc import operator_cache
 
 
 def dag(X):
@@ -185,42 +185,58 @@ def partial_trace(X, sys, dim):
     discards the first and third subsystems, so that we obtain the density
     matrix for system B.
 
-    """
+    X can also be an array of shape (...,D,D), i.e., a stack of operators, in
+    which case the partial trace of every operator in the stack is returned.
 
-    if isinstance(X, cvxpy.Variable):
-        X = cvxpy_to_numpy(X)
-        X_out = partial_trace(X, sys, dim)
-        return numpy_to_cvxpy(X_out)
+    """
 
     if not sys:  # If sys is empty, just return the original operator
         return X
-    elif len(sys) == len(dim):  # If tracing over all systems
-        return Tr(X)
-    else:
-        if X.shape[1] == 1:
-            X = X @ dag(X)
 
-        num_sys = len(dim)
-        total_sys = range(1, num_sys + 1)
+    if isinstance(X, cvx.Expression):
+        if len(sys) == len(dim):
+            return cvx.trace(X)
 
-        dims_sys = [
-            dim[s - 1] for s in sys
-        ]  # Dimensions of the system to be traced over
-        dims_keep = [dim[s - 1] for s in list(set(total_sys) - set(sys))]
-        dim_sys = np.prod(dims_sys)
-        dim_keep = np.prod(dims_keep)
+        D_keep = int(np.prod(dim)) // int(np.prod([dim[s - 1] for s in sys]))
 
-        perm = sys + list(set(total_sys) - set(sys))
-        X = syspermute(X, perm, dim)
+        return _cvx_apply_map(partial_trace_map(sys, dim), X, (D_keep, D_keep))
 
-        X = np.array(X)
-        dim = [dim_sys] + dims_keep
-        X_reshape = np.reshape(X, dim + dim)
-        X_reshape = np.sum(np.diagonal(X_reshape, axis1=0, axis2=len(dim)), axis=-1)
-        X = np.reshape(X_reshape, (dim_keep, dim_keep))
+    X = np.array(X)
 
+    # X can have leading (batch) dimensions, in which case the partial trace is
+    # taken for every operator in the batch. The subsystems are traced out with a
+    # single einsum, in which the row and column axes of the traced subsystems are
+    # given the same label.
+    n = len(dim)
+    batch = X.shape[:-2]
+    b = len(batch)
+
+    keep = [s for s in range(1, n + 1) if s not in sys]
+    dim_keep = int(np.prod([dim[s - 1] for s in keep]))
+
+    rows = list(range(b, b + n))
+    cols = [rows[s - 1] if s in sys else b + n + s - 1 for s in range(1, n + 1)]
+    out = list(range(b)) + [rows[s - 1] for s in keep] + [cols[s - 1] for s in keep]
+
+    if X.shape[-1] == 1:
+        # For a state vector psi, the reduced state is obtained by contracting psi
+        # with its conjugate directly, without forming |psi><psi|, which takes
+        # time and memory O(D*dim_keep) instead of O(D^2).
+        T = np.reshape(X, batch + tuple(dim))
+        X = np.einsum(
+            T, list(range(b)) + rows, np.conjugate(T), list(range(b)) + cols, out
+        )
+    elif len(sys) == len(dim):  # If tracing over all systems
+        return np.trace(X, axis1=-2, axis2=-1)
+    else:
+        X = np.reshape(X, batch + tuple(dim) + tuple(dim))
+        X = np.einsum(X, list(range(b)) + rows + cols, out)
+
+    if len(sys) == len(dim):
         return X
 
+    return np.reshape(X, batch + (dim_keep, dim_keep))
+
 
 def partial_transpose(X, sys, dim):
     """Takes the partial transpose on systems given by sys. dim is a list of
@@ -248,6 +264,9 @@ def partial_transpose(X, sys, dim):
     factor lives in an operator space taking a 5-dimensional space to a
     3-dimensional space.
 
+    X can also be an array of shape (...,D,D), i.e., a stack of operators, in
+    which case the partial transpose of every operator in the stack is returned.
+
     Args:
         X (matrix): _description_
         sys (matrix): _description_
@@ -257,59 +276,224 @@ def partial_transpose(X, sys, dim):
         _type_: _description_
     """
 
-    if isinstance(X, cvxpy.Variable):
-        X = cvxpy_to_numpy(X)
-        X_out = partial_transpose(X, sys, dim)
-        return numpy_to_cvxpy(X_out)
+    if isinstance(X, cvx.Expression):
+        M = partial_transpose_map(sys, dim)
 
-    if X.shape[1] == 1:
-        X = X @ dag(X)
+        if isinstance(dim[0], (tuple, list)):
+            shape = (
+                int(np.prod([dim[s][s + 1 in sys] for s in range(len(dim))])),
+                int(np.prod([dim[s][s + 1 not in sys] for s in range(len(dim))])),
+            )
+        else:
+            shape = X.shape
+
+        return _cvx_apply_map(M, X, shape)
 
     X = np.array(X)
 
+    # X can have leading (batch) dimensions, in which case the partial transpose is
+    # taken for every operator in the batch.
+    batch = X.shape[:-2]
+    b = len(batch)
+
     n = len(dim)  # Number of subsystems in the operator
 
+    if X.shape[-1] == 1:
+        if isinstance(dim[0], (tuple, list)):
+            X = X @ np.conjugate(np.swapaxes(X, -1, -2))
+        else:
+            # For a state vector psi, the partial transpose of |psi><psi| is
+            # formed in one step, by exchanging the row and column labels of the
+            # transposed subsystems.
+            T = np.reshape(X, batch + tuple(dim))
+            rows = list(range(b, b + n))
+            cols = list(range(b + n, b + 2 * n))
+            out_rows = [cols[s] if s + 1 in sys else rows[s] for s in range(n)]
+            out_cols = [rows[s] if s + 1 in sys else cols[s] for s in range(n)]
+            X = np.einsum(
+                T,
+                list(range(b)) + rows,
+                np.conjugate(T),
+                list(range(b)) + cols,
+                list(range(b)) + out_rows + out_cols,
+            )
+            D = int(np.prod(dim))
+            return np.reshape(X, batch + (D, D))
+
     if isinstance(dim[0], tuple) or isinstance(
         dim[0], list
     ):  # When the operator is a non-square matrix
+        # Copy the dimensions, so that the list passed in is not modified below.
+        dim = [list(dim[i]) for i in range(n)]
         dim_row = [dim[i][0] for i in range(n)]
         dim_col = [dim[i][1] for i in range(n)]
-    elif isinstance(dim[0], int):  # When the operator is a square matrix
+    else:  # When the operator is a square matrix
+        dim = list(dim)
         dim_row = dim
         dim_col = dim
 
-    X_reshape = np.reshape(X, dim_row + dim_col)
+    X_reshape = np.reshape(X, batch + tuple(dim_row) + tuple(dim_col))
 
     axes = list(range(2 * n))
 
     for i in range(len(sys)):
         axes[sys[i] - 1], axes[n + sys[i] - 1] = axes[n + sys[i] - 1], axes[sys[i] - 1]
-        if isinstance(dim[0], tuple) or isinstance(dim[0], list):
-            dim[sys[i] - 1] = list(dim[sys[i] - 1])
+        if isinstance(dim[0], list):
             dim[sys[i] - 1][0], dim[sys[i] - 1][1] = (
                 dim[sys[i] - 1][1],
                 dim[sys[i] - 1][0],
             )
-            # dim[sys[i]-1]=tuple(dim[sys[i]-1])
-        else:
-            continue
 
-    X_reshape = np.transpose(X_reshape, tuple(axes))
+    X_reshape = np.transpose(X_reshape, list(range(b)) + [b + a for a in axes])
 
-    if isinstance(dim[0], tuple) or isinstance(dim[0], list):
+    if isinstance(dim[0], list):
         dim_row = [dim[i][0] for i in range(n)]
         dim_col = [dim[i][1] for i in range(n)]
         dim_total = (np.prod(dim_row), np.prod(dim_col))
-    elif isinstance(dim[0], int):
-        dim_row = dim
-        dim_col = dim
+    else:
         dim_total = (np.prod(dim), np.prod(dim))
 
-    X_new = np.reshape(X_reshape, dim_total)
+    X_new = np.reshape(X_reshape, batch + dim_total)
 
     return X_new
 
 
+def partial_trace_map(sys, dim):
+    """
+    Returns the sparse matrix M of the partial trace over the systems in sys
+    (see partial_trace), acting on (row-major) vectorized operators, i.e.,
+
+        M @ X.reshape(-1) = partial_trace(X, sys, dim).reshape(-1).
+
+    This is used to take partial traces of cvxpy expressions. The matrices are
+    cached for every sys and dim.
+    """
+
+    return _partial_trace_map(tuple(int(s) for s in sys), tuple(int(d) for d in dim))
+
+
+@operator_cache.memoize
+def _partial_trace_map(sys, dim):
+    n = len(dim)
+    D = int(np.prod(dim))
+    keep = [s for s in range(1, n + 1) if s not in sys]
+    dim_keep = [dim[s - 1] for s in keep]
+    dim_sys = [dim[s - 1] for s in sys]
+    D_keep = int(np.prod(dim_keep))
+
+    # All combinations (row of the output, column of the output, traced index).
+    a, b, t = np.meshgrid(
+        np.arange(D_keep),
+        np.arange(D_keep),
+        np.arange(int(np.prod(dim_sys))),
+        indexing="ij",
+    )
+    a, b, t = a.reshape(-1), b.reshape(-1), t.reshape(-1)
+
+    digits_a = np.unravel_index(a, dim_keep) if keep else ()
+    digits_b = np.unravel_index(b, dim_keep) if keep else ()
+    digits_t = np.unravel_index(t, dim_sys) if sys else ()
+
+    rows = [None] * n
+    cols = [None] * n
+    for m, s in enumerate(keep):
+        rows[s - 1], cols[s - 1] = digits_a[m], digits_b[m]
+    for m, s in enumerate(sys):
+        rows[s - 1] = cols[s - 1] = digits_t[m]
+
+    source = np.ravel_multi_index(rows, dim) * D + np.ravel_multi_index(cols, dim)
+
+    return sp.csr_matrix(
+        (np.ones(len(source)), (a * D_keep + b, source)), shape=(D_keep**2, D**2)
+    )
+
+
+def partial_transpose_map(sys, dim):
+    """
+    Returns the sparse (permutation) matrix M of the partial transpose on the
+    systems in sys (see partial_transpose), acting on (row-major) vectorized
+    operators, i.e.,
+
+        M @ X.reshape(-1) = partial_transpose(X, sys, dim).reshape(-1).
+
+    As in partial_transpose, dim can also be a list of tuples (row dimension,
+    column dimension) for non-square operators. This is used to take partial
+    transposes of cvxpy expressions. The matrices are cached for every sys and
+    dim.
+    """
+
+    if isinstance(dim[0], (tuple, list)):
+        dim = tuple((int(r), int(c)) for r, c in dim)
+    else:
+        dim = tuple((int(d), int(d)) for d in dim)
+
+    return _partial_transpose_map(tuple(int(s) for s in sys), dim)
+
+
+@operator_cache.memoize
+def _partial_transpose_map(sys, dim):
+    dim_row = [r for r, _ in dim]
+    dim_col = [c for _, c in dim]
+    R = int(np.prod(dim_row))
+    C = int(np.prod(dim_col))
+
+    # Row and column indices of every entry of the input.
+    index = np.arange(R * C)
+    rows = list(np.unravel_index(index // C, dim_row))
+    cols = list(np.unravel_index(index % C, dim_col))
+
+    for s in sys:
+        rows[s - 1], cols[s - 1] = cols[s - 1], rows[s - 1]
+        dim_row[s - 1], dim_col[s - 1] = dim_col[s - 1], dim_row[s - 1]
+
+    target = np.ravel_multi_index(rows, dim_row) * int(
+        np.prod(dim_col)
+    ) + np.ravel_multi_index(cols, dim_col)
+
+    return sp.csr_matrix((np.ones(R * C), (target, index)), shape=(R * C, R * C))
+
+
+def syspermute_map(perm, dim):
+    """
+    Returns the sparse (permutation) matrix M of the permutation of subsystems
+    given by perm (see syspermute), acting on (row-major) vectorized operators,
+    i.e.,
+
+        M @ X.reshape(-1) = syspermute(X, perm, dim).reshape(-1).
+
+    This is used to permute the subsystems of cvxpy expressions. The matrices are
+    cached for every perm and dim.
+    """
+
+    return _syspermute_map(tuple(int(p) for p in perm), tuple(int(d) for d in dim))
+
+
+@operator_cache.memoize
+def _syspermute_map(perm, dim):
+    D = int(np.prod(dim))
+
+    # Permuting the array of indices gives, for every entry of the output, the
+    # entry of the input that it comes from.
+    source = syspermute(np.arange(D * D).reshape(D, D), list(perm), list(dim))
+
+    return sp.csr_matrix(
+        (np.ones(D * D), (np.arange(D * D), source.reshape(-1))), shape=(D * D, D * D)
+    )
+
+
+def _cvx_apply_map(M, X, shape):
+    """
+    Applies the sparse matrix M to the row-major vectorization of the cvxpy
+    expression X, and returns the result as a cvxpy expression of the given shape,
+    i.e., the cvxpy analogue of (M @ X.reshape(-1)).reshape(shape). Unlike
+    building the result element by element, this gives a single linear operator,
+    so that problems are compiled in time roughly linear in the number of nonzero
+    entries of M.
+    """
+
+    return cvx.reshape(M @ cvx.vec(X, order="C"), shape, order="C")
+
+
 def permute_tensor_factors(perm, dims):
     """
     Generates the permutation operator that permutes the tensor factors according
@@ -332,6 +516,28 @@ def permute_tensor_factors(perm, dims):
     return W
 
 
+def pure_state_key(psi, decimals=10, tol=1e-6):
+    """
+    Returns a hashable canonical form of the pure state psi, given as a state
+    vector. Two state vectors that are equal up to a global phase (and up to
+    the given number of decimal places) have the same key.
+
+    The global phase is fixed by making the first amplitude whose absolute value is
+    larger than tol real and positive. The amplitudes are then rounded to the given
+    number of decimal places.
+    """
+
+    psi = np.array(psi, dtype=np.complex128).flatten()
+
+    k = np.argmax(np.abs(psi) > tol)
+    psi = psi * (np.abs(psi[k]) / psi[k])
+
+    # Adding 0.0 turns -0.0 into 0.0, which would otherwise give a different key.
+    psi = np.round(psi, decimals) + 0.0
+
+    return psi.tobytes()
+
+
 def SWAP(sys, dim):
     """
     Generates a swap matrix between the pair of systems in sys. dim is a list
@@ -382,8 +588,25 @@ def syspermute(X, perm, dim):
     perm is a list
     containing the desired order, and dim is a list of the dimensions of all
     subsystems.
+
+    X can also be an array of shape (...,D,D) (or (...,D,1) for vectors), i.e., a
+    stack of operators, in which case the subsystems of every operator in the
+    stack are permuted.
     """
 
+    if isinstance(X, cvx.Expression):
+        if X.ndim == 2 and X.shape[0] == X.shape[1] and X.shape[0] > 1:
+            return _cvx_apply_map(syspermute_map(perm, dim), X, X.shape)
+
+        # For a (row or column) vector, the permutation acts on the entries.
+        D = int(np.prod(dim))
+        source = syspermute(np.arange(D).reshape(D, 1), perm, dim)
+        M = sp.csr_matrix(
+            (np.ones(D), (np.arange(D), source.reshape(-1))), shape=(D, D)
+        )
+
+        return _cvx_apply_map(M, X, X.shape)
+
     # If p is defined using np.array(), then it must first be converted
     # to a numpy array, or else the reshaping below won't work.
     X = np.array(X)
@@ -391,22 +614,24 @@ def syspermute(X, perm, dim):
     n = len(dim)
     d = X.shape
 
-    perm = np.array(perm)
-    dim = np.array(dim)
+    # X can have leading (batch) dimensions, in which case the subsystems are
+    # permuted for every operator (or vector) in the batch.
+    batch = d[:-2]
+    b = len(batch)
 
-    if d[0] == 1 or d[1] == 1:
+    perm = [b + p - 1 for p in perm]
+    dim = [int(a) for a in dim]
+
+    if d[-2] == 1 or d[-1] == 1:
         # For a pure state
-        perm = perm - 1
-        tmp = np.reshape(X, dim)
-        q = np.reshape(np.transpose(tmp, perm), d)
+        tmp = np.reshape(X, batch + tuple(dim))
+        q = np.reshape(np.transpose(tmp, list(range(b)) + perm), d)
 
         return q
-    elif d[0] == d[1]:
+    elif d[-2] == d[-1]:
         # For a mixed state (density matrix)
-        perm = perm - 1
-        perm = np.append(perm, n + perm)
-        dim = np.append(dim, dim)
-        tmp = np.reshape(X, dim)
+        perm = list(range(b)) + perm + [n + p for p in perm]
+        tmp = np.reshape(X, batch + tuple(dim + dim))
         Y = np.reshape(np.transpose(tmp, perm), d)
 
         return Y
@@ -446,10 +671,14 @@ def trace_distance_pure_states(psi, phi):
 
     """
 
+    if psi.shape[1] == 1 and phi.shape[1] == 1:
+        # If both are state vectors, only their overlap is needed.
+        return 1 - np.abs(np.vdot(psi, phi)) ** 2
+
     if psi.shape[1] == 1:  # If psi is specified as a state vector
-        psi = psi @ dag(psi)
+        return 1 - np.real(np.vdot(psi, phi @ psi))
     if phi.shape[1] == 1:  # If phi is specified as a state vector
-        phi = phi @ dag(phi)
+        return 1 - np.real(np.vdot(phi, psi @ phi))
 
     return 1 - Tr(psi @ phi)
 
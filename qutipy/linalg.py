@@ -28,6 +28,7 @@ from numpy.linalg import eig, matrix_rank, norm
 from scipy.linalg import sqrtm, inv, pinv
 
 from qutipy.general_functions import dag, eye, tensor, ket
+from qutipy.misc import operator_cache
 from qutipy.pauli import nQubit_Pauli_basis
 #from qutipy.states import max_ent
 from qutipy.su import nQudit_su_generators, su_generators
@@ -152,37 +153,44 @@ def generate_linear_op_basis(d, basis="w", local_dimension=2):
         - basis='pauli': the basis of tensor products of single-qubit
             Pauli operators. Valid when d=2^n.
 
+    The choice of basis is not case sensitive. The basis is returned as a read-only
+    array of shape (d^2,d,d), and it is stored in the process-wide operator_cache
+    (see qutipy.misc), so that it is only generated once.
     """
 
+    return _generate_linear_op_basis(d, basis.lower(), local_dimension)
+
+
+@operator_cache.memoize
+def _generate_linear_op_basis(d, basis, local_dimension):
     B = []
 
     if basis == "w":
         B = discrete_Weyl_basis(d)
-        return B
     elif basis == "su":
         B = su_generators(d)
-        return B
     elif basis == "pauli":
         if np.log2(d) - int(np.log2(d)) == 0:
             B = nQubit_Pauli_basis(int(np.log2(d)))
-            return B
         else:
             return "The dimension must be an exponent of two!\n"
     elif basis == "wtensor":
         exponent = math.log(d, local_dimension)
-        if exponent - int(exponent) == 0:
-            B = nQudit_discrete_Weyl_basis(local_dimension, int(exponent))
+        if np.isclose(exponent, round(exponent)):
+            B = nQudit_discrete_Weyl_basis(local_dimension, int(round(exponent)))
         else:
             return "The dimension must be an exponent of the local dimension!\n"
     elif basis == "sutensor":
         exponent = math.log(d, local_dimension)
-        if exponent - int(exponent) == 0:
-            B = nQudit_su_generators(local_dimension, int(exponent))
+        if np.isclose(exponent, round(exponent)):
+            B = nQudit_su_generators(local_dimension, int(round(exponent)))
         else:
             return "The dimension must be an exponent of the local dimension!\n"
     else:
         return "Improper basis choice!\n"
 
+    return np.array(B, dtype=np.complex128)
+
 
 def eigenvalues(X):
     """
@@ -20,7 +20,22 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
 
+import functools
+import inspect
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+import signal
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict, deque
+from concurrent.futures.process import BrokenProcessPool
+
 import numpy as np
+import scipy.sparse as sp
 from cvxpy import bmat
 
 
@@ -54,3 +69,491 @@ def numpy_to_cvxpy(np_obj):
     """
     np_obj_list = np_obj.tolist()
     return bmat(np_obj_list)
+
+
+def read_only(value):
+    """
+    Makes the given (freshly computed) value immutable, so that it can be safely
+    shared between callers: numpy arrays are marked as non-writeable, lists are
+    converted to tuples, and dictionaries are wrapped in a read-only view. This is
+    applied recursively to the elements of lists, tuples, and dictionaries.
+    """
+
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+        return value
+    elif isinstance(value, (list, tuple)):
+        return tuple(read_only(v) for v in value)
+    elif isinstance(value, dict):
+        return types.MappingProxyType({k: read_only(v) for k, v in value.items()})
+    else:
+        return value
+
+
+def nbytes(value):
+    """
+    Estimates the memory (in bytes) used by the given value, counting the data of
+    numpy arrays and scipy.sparse matrices and (recursively) the elements of lists,
+    tuples, and dictionaries.
+    """
+
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    elif sp.issparse(value):
+        return sum(a.nbytes for a in vars(value).values() if isinstance(a, np.ndarray))
+    elif isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(nbytes(v) for v in value)
+    elif isinstance(value, (dict, types.MappingProxyType)):
+        return sys.getsizeof(value) + sum(
+            nbytes(k) + nbytes(v) for k, v in value.items()
+        )
+    else:
+        return sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    A thread-safe, memory-bounded cache with least-recently-used eviction.
+
+    The size of every entry is estimated with nbytes, and the least recently used
+    entries are evicted once the total size exceeds max_bytes. Entries larger than
+    max_bytes are not stored at all.
+
+    The number of hits, misses, and evictions is available through stats(), and
+    all entries (and statistics) are removed by clear().
+    """
+
+    def __init__(self, max_bytes=2**28):
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+        self._nbytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """
+        Returns the value for the given key (marking it as recently used), or
+        default if the key is not in the cache.
+        """
+
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self._hits += 1
+                return self._data[key][0]
+            else:
+                self._misses += 1
+                return default
+
+    def put(self, key, value, size=None):
+        """
+        Stores the value for the given key, evicting the least recently used entries
+        if necessary. The size (in bytes) of the value is estimated with nbytes,
+        unless it is given.
+        """
+
+        if size is None:
+            size = nbytes(value)
+
+        with self._lock:
+            if key in self._data:
+                self._nbytes -= self._data.pop(key)[1]
+
+            if size > self.max_bytes:
+                return
+
+            self._data[key] = (value, size)
+            self._nbytes += size
+
+            while self._nbytes > self.max_bytes:
+                _, (_, s) = self._data.popitem(last=False)
+                self._nbytes -= s
+                self._evictions += 1
+
+    def clear(self):
+        """
+        Removes all entries from the cache and resets the statistics.
+        """
+
+        with self._lock:
+            self._data.clear()
+            self._nbytes = 0
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+    def stats(self):
+        """
+        Returns a dictionary with the number of hits, misses, and evictions, as well
+        as the number of entries and their total size in bytes.
+        """
+
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "entries": len(self._data),
+                "nbytes": self._nbytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def memoize(self, func):
+        """
+        Decorator that caches the outputs of the function func. The key consists of
+        the name of the function and the values of all of its arguments (with the
+        defaults filled in), which must therefore be hashable. The cached outputs
+        are made immutable with read_only.
+        """
+
+        signature = inspect.signature(func)
+        missing = object()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (func.__module__, func.__qualname__) + tuple(bound.arguments.items())
+
+            value = self.get(key, missing)
+
+            if value is missing:
+                value = read_only(func(*args, **kwargs))
+                self.put(key, value)
+
+            return value
+
+        return wrapper
+
+
+# Process-wide cache for immutable sets of operators (operator bases, structure
+# constants, quadrature operators, etc.) that are expensive to regenerate.
+operator_cache = LRUCache()
+
+
+# Cache for the cvxpy problems created by sdp_template.
+sdp_cache = LRUCache(max_bytes=2**26)
+
+
+def sdp_template(key, build):
+    """
+    Returns the SDP template with the given key from sdp_cache, creating it with
+    build() if it is not in the cache. The key should identify the problem
+    structure, e.g., (function name, dA, dB, variant), and build should return a
+    tuple (problem, parameters, variables), where problem is a cvxpy Problem whose
+    data is given by the cvxpy Parameters in the dictionary parameters, and
+    variables is a dictionary of the Variables whose values are needed after
+    solving. The template is solved with solve_sdp_template.
+
+    Since the problem is only built (and canonicalized) once, repeatedly solving
+    problems with the same structure but different data is much faster.
+    """
+
+    template = sdp_cache.get(key)
+
+    if template is None:
+        problem, parameters, variables = build()
+
+        template = {
+            "problem": problem,
+            "parameters": parameters,
+            "variables": variables,
+            "lock": threading.Lock(),
+        }
+
+        # Rough estimate of the memory used by the problem and its canonicalization.
+        metrics = problem.size_metrics
+        size = 1024 * (metrics.num_scalar_variables + metrics.num_scalar_data)
+
+        sdp_cache.put(key, template, size=size)
+
+    return template
+
+
+def solve_sdp_template(template, values, warm_start=False, **kwargs):
+    """
+    Solves the SDP template (see sdp_template) with the parameters set to the
+    given values, which should be a dictionary with the same keys as the
+    parameters of the template. Values of Hermitian parameters are Hermitized
+    first. If warm_start=True, the solver is started from the previous solution
+    of the template. The remaining keyword arguments are passed to the solve
+    method of the problem.
+
+    Returns the optimal value and a dictionary with the values of the variables
+    of the template.
+    """
+
+    with template["lock"]:
+        for name, value in values.items():
+            parameter = template["parameters"][name]
+            value = np.asarray(value)
+
+            if parameter.attributes["hermitian"]:
+                value = (value + np.conj(value.T)) / 2
+            elif not parameter.attributes["complex"]:
+                value = np.real(value)
+
+            parameter.value = value
+
+        problem = template["problem"]
+        problem.solve(warm_start=warm_start, **kwargs)
+
+        variables = {
+            name: None if var.value is None else np.copy(var.value)
+            for name, var in template["variables"].items()
+        }
+
+        return problem.value, variables
+
+
+def _raise_timeout(signum, frame):
+    raise TimeoutError("The task exceeded its time limit.")
+
+
+def _call_item(func, item, kwargs, timeout=None):
+    """
+    Calls func on a single input of batch_solve, returning (True, output), or
+    (False, exception) if the call fails or exceeds the timeout (in seconds).
+    The timeout is only used when batch_solve runs in the current process.
+    """
+
+    if isinstance(item, tuple):
+        args, item_kwargs = item, {}
+    elif isinstance(item, dict):
+        args, item_kwargs = (), item
+    else:
+        args, item_kwargs = (item,), {}
+
+    # The timeout is enforced with SIGALRM, which is only available on Unix and
+    # only in the main thread.
+    alarm = (
+        timeout is not None
+        and hasattr(signal, "setitimer")
+        and threading.current_thread() is threading.main_thread()
+    )
+
+    if alarm:
+        handler = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    try:
+        return True, func(*args, **{**kwargs, **item_kwargs})
+    except Exception as e:
+        return False, e
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, handler)
+
+
+def _batch_worker(func, kwargs, conn):
+    """
+    Worker process of batch_solve. Receives lists of (index, input) pairs through
+    the connection conn, and sends back (index, ok, value) for every input as soon
+    as it has been evaluated (see _call_item), until it receives None. Values that
+    cannot be sent back to the main process are replaced by a RuntimeError.
+    """
+
+    while True:
+        chunk = conn.recv()
+
+        if chunk is None:
+            break
+
+        for index, item in chunk:
+            ok, value = _call_item(func, item, kwargs)
+
+            try:
+                pickle.dumps(value)
+            except Exception:
+                ok, value = False, RuntimeError(repr(value))
+
+            conn.send((index, ok, value))
+
+    conn.close()
+
+
+class _BatchWorker:
+    """
+    A worker process of batch_solve, together with the indices of the inputs that
+    it has been sent and the time at which it started evaluating the first one.
+    """
+
+    def __init__(self, context, func, kwargs):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(
+            target=_batch_worker, args=(func, kwargs, child), daemon=True
+        )
+        self.process.start()
+        child.close()
+        self.indices = deque()
+        self.start = None
+
+    def submit(self, chunk):
+        self.indices.extend(index for index, _ in chunk)
+        self.start = time.monotonic()
+        self.conn.send(chunk)
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+def _batch_solve_processes(func, inputs, processes, chunksize, timeout, kwargs):
+    """
+    Evaluates func on the inputs with a pool of worker processes (see
+    batch_solve), and returns the list of (ok, value) pairs, in the same order as
+    inputs.
+
+    The workers are managed here, instead of with a ProcessPoolExecutor, so that a
+    worker can be killed and replaced by a new one when it exceeds the timeout or
+    crashes. Only the input that it was evaluating then fails, and the remaining
+    inputs of its chunk are sent to another worker.
+    """
+
+    context = multiprocessing.get_context()
+
+    pending = deque(enumerate(inputs))
+    results = [None] * len(inputs)
+
+    def next_chunk():
+        return [pending.popleft() for _ in range(min(chunksize, len(pending)))]
+
+    def replace(worker, error):
+        # The first input of the worker failed; the others are resubmitted.
+        index = worker.indices.popleft()
+        results[index] = (False, error)
+        pending.extendleft(reversed([(i, inputs[i]) for i in worker.indices]))
+        worker.kill()
+        workers.remove(worker)
+
+    workers = []
+
+    try:
+        while pending or any(w.indices for w in workers):
+            while pending and len(workers) < processes:
+                workers.append(_BatchWorker(context, func, kwargs))
+
+            for worker in workers:
+                if pending and not worker.indices:
+                    worker.submit(next_chunk())
+
+            busy = [w for w in workers if w.indices]
+
+            wait = None
+            if timeout is not None:
+                now = time.monotonic()
+                wait = max(0, min(w.start + timeout - now for w in busy))
+
+            ready = multiprocessing.connection.wait(
+                [w.conn for w in busy] + [w.process.sentinel for w in busy], wait
+            )
+
+            for worker in busy:
+                if worker.conn in ready:
+                    try:
+                        while worker.conn.poll():
+                            index, ok, value = worker.conn.recv()
+                            results[index] = (ok, value)
+                            worker.indices.popleft()
+                            worker.start = time.monotonic()
+                    except (EOFError, OSError):
+                        pass
+
+                if not worker.indices:
+                    continue
+
+                if not worker.process.is_alive():
+                    error = BrokenProcessPool(
+                        "The worker process terminated abruptly (exit code {}).".format(
+                            worker.process.exitcode
+                        )
+                    )
+                    replace(worker, error)
+                elif timeout is not None and time.monotonic() - worker.start >= timeout:
+                    replace(worker, TimeoutError("The task exceeded its time limit."))
+    finally:
+        for worker in workers:
+            worker.close()
+
+    return results
+
+
+def batch_solve(
+    func,
+    inputs,
+    processes=None,
+    chunksize=1,
+    timeout=None,
+    raise_errors=False,
+    **kwargs,
+):
+    """
+    Evaluates the function func (for example, diamond_norm, hypo_testing_rel_ent,
+    max_relative_entropy, conditional_min_entropy, or check_kext) on every element
+    of the list inputs, in parallel using a pool of processes. Every element of
+    inputs is either a tuple of positional arguments, a dictionary of keyword
+    arguments, or a single (first) argument of func. The keyword arguments kwargs
+    are passed to every call.
+
+    processes is the number of worker processes (by default the number of CPUs);
+    if processes=1, the inputs are evaluated in the current process. The inputs
+    are sent to the workers in chunks of chunksize elements. If timeout is given,
+    every call that takes longer than timeout seconds fails with a TimeoutError.
+    The worker process evaluating such a call is killed and replaced, so that
+    the timeout also applies to calls that spend their time in compiled code
+    (e.g., in a solver). If processes=1, the timeout is instead enforced with
+    SIGALRM (on Unix), which only interrupts the call when control returns to
+    Python.
+
+    Returns the list of outputs, in the same order as inputs. If a call fails, the
+    exception that it raised takes the place of its output, unless
+    raise_errors=True, in which case the first such exception is raised. If a
+    worker process crashes, only the call that it was evaluating fails (with a
+    BrokenProcessPool exception), and the other inputs are evaluated by a new
+    worker.
+    """
+
+    if processes is not None and processes < 1:
+        raise ValueError("processes should be None or a positive integer.")
+
+    inputs = list(inputs)
+
+    if processes == 1:
+        results = [_call_item(func, item, kwargs, timeout) for item in inputs]
+    else:
+        if processes is None:
+            processes = os.cpu_count() or 1
+
+        results = _batch_solve_processes(
+            func, inputs, processes, chunksize, timeout, kwargs
+        )
+
+    outputs = []
+
+    for ok, value in results:
+        if not ok and raise_errors:
+            raise value
+        outputs.append(value)
+
+    return outputs
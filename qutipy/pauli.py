@@ -23,8 +23,10 @@
 import itertools
 
 import numpy as np
+from scipy import sparse
 
 from qutipy.general_functions import Tr, dag, eye, ket, tensor
+from qutipy.misc import operator_cache
 
 
 def generate_nQubit_Pauli_X(indices):
@@ -71,7 +73,7 @@ def generate_nQubit_Pauli_Z(indices):
     return out
 
 
-def generate_nQubit_Pauli(indices,alt=False):
+def generate_nQubit_Pauli(indices, alt=False, as_string=False):
     """
     Generates a tensor product of Pauli operators for n qubits. indices is a list
     of indices i specifying the Pauli operator for each tensor factor. i=0 is the identity, i=1 is sigma_x,
@@ -81,8 +83,17 @@ def generate_nQubit_Pauli(indices,alt=False):
     In this case, the variables 'indices' should be a list of two lists:
         [[z1,z2,...,zn],[x1,x2,...xn]],
     such that every zi and xi is either 0 or 1.
+
+    If as_string=True, then the operator is returned as a PauliString instead of
+    a matrix.
     """
 
+    if as_string:
+        if alt:
+            return PauliString.from_ZX(indices[0], indices[1])
+        else:
+            return PauliString.from_indices(indices)
+
     if alt:
         z=indices[0]
         x=indices[1]
@@ -109,20 +120,293 @@ def generate_nQubit_Pauli(indices,alt=False):
         return out
 
 
-def nQubit_Pauli_basis(n):
+def nQubit_Pauli_basis(n, as_string=False):
     """
-    Generates a list of all n-qubit Pauli operators.
+    Generates a list of all n-qubit Pauli operators. If as_string=True, then the
+    operators are given as PauliStrings instead of matrices.
     """
 
     S = list(itertools.product([0, 1, 2, 3], repeat=n))
 
     B = []
     for s in S:
-        B.append(generate_nQubit_Pauli(s))
+        B.append(generate_nQubit_Pauli(s, as_string=as_string))
 
     return B
 
 
+# Number of 1 bits in each possible byte, used to count bits in packed arrays.
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+
+def _popcount(a):
+    return int(np.sum(_POPCOUNT[a]))
+
+
+def _parity(b):
+    """
+    Computes the parity of the bits of every (non-negative) integer in the array b.
+    """
+
+    b = np.array(b, dtype=np.int64)
+    for shift in [32, 16, 8, 4, 2, 1]:
+        b ^= b >> shift
+
+    return b & 1
+
+
+class PauliString:
+    """
+    A compact representation of an n-qubit Pauli operator
+
+        i^phase * P_1 ⊗ P_2 ⊗ ... ⊗ P_n,
+
+    where every P_j is one of I, X, Y, Z. The operator on the jth qubit is stored
+    as two bits (x_j,z_j), with I=(0,0), X=(1,0), Y=(1,1), and Z=(0,1), and the bits
+    for all of the qubits are packed into two arrays of bytes. The phase is an
+    integer modulo 4.
+
+    Products, commutation checks, and expectation values are calculated directly
+    from the bits, so that the 2^n x 2^n matrix of the operator is only built
+    (using the methods to_sparse() and to_matrix()) if it is actually needed.
+
+    As elsewhere in this module, the first qubit corresponds to the most
+    significant bit of the computational basis index.
+    """
+
+    def __init__(self, x, z, phase=0):
+        x = np.array(x, dtype=np.uint8).flatten()
+        z = np.array(z, dtype=np.uint8).flatten()
+
+        if len(x) != len(z):
+            raise ValueError("x and z must have the same length.")
+        if np.any(x > 1) or np.any(z > 1):
+            raise ValueError("x and z must consist of bits, either 0 or 1.")
+
+        self.n = len(x)
+        self.x = np.packbits(x)
+        self.z = np.packbits(z)
+        self.phase = int(phase) % 4
+
+    @classmethod
+    def from_indices(cls, indices, phase=0):
+        """
+        Constructs the Pauli string from a list of indices i=0,1,2,3 (for I, X, Y,
+        and Z, respectively), as in generate_nQubit_Pauli.
+        """
+
+        indices = np.array(indices, dtype=np.int64)
+        x = (indices == 1) | (indices == 2)
+        z = (indices == 2) | (indices == 3)
+
+        return cls(x, z, phase)
+
+    @classmethod
+    def from_label(cls, label):
+        """
+        Constructs the Pauli string from a label such as 'XIZY', '-XX', or 'iZ'.
+        """
+
+        phase = 0
+        if label.startswith("+"):
+            label = label[1:]
+        elif label.startswith("-"):
+            phase = 2
+            label = label[1:]
+        if label.startswith("i"):
+            phase += 1
+            label = label[1:]
+
+        try:
+            indices = ["IXYZ".index(c) for c in label]
+        except ValueError:
+            raise ValueError("The label must consist of the characters I, X, Y, Z.")
+
+        return cls.from_indices(indices, phase)
+
+    @classmethod
+    def from_ZX(cls, z, x):
+        """
+        Constructs the Pauli string for the operator Z^z X^x, where z and x are lists
+        of bits, as in generate_nQubit_Pauli with alt=True.
+        """
+
+        z = np.array(z, dtype=np.uint8)
+        x = np.array(x, dtype=np.uint8)
+
+        # Z^z X^x=i^{x.z} P, because ZX=iY.
+        return cls(x, z, phase=np.sum(x & z))
+
+    def x_bits(self):
+        return np.unpackbits(self.x, count=self.n)
+
+    def z_bits(self):
+        return np.unpackbits(self.z, count=self.n)
+
+    def indices(self):
+        """
+        Returns the list of indices i=0,1,2,3 (for I, X, Y, and Z, respectively)
+        of the Pauli string, ignoring the phase.
+        """
+
+        x = self.x_bits().astype(np.int64)
+        z = self.z_bits().astype(np.int64)
+
+        return list(x + 3 * z - 2 * x * z)
+
+    def weight(self):
+        """
+        Returns the number of qubits on which the Pauli string acts non-trivially.
+        """
+
+        return _popcount(self.x | self.z)
+
+    def _masks(self):
+        # The x and z bits as integers, with the first qubit as the most
+        # significant bit.
+        pad = 8 * len(self.x) - self.n
+        x = int.from_bytes(self.x.tobytes(), "big") >> pad
+        z = int.from_bytes(self.z.tobytes(), "big") >> pad
+
+        return x, z
+
+    def _ZX_phase(self):
+        # The phase q such that the operator is equal to i^q Z^z X^x.
+        return (self.phase - _popcount(self.x & self.z)) % 4
+
+    def __mul__(self, other):
+        if not isinstance(other, PauliString):
+            return NotImplemented
+        if self.n != other.n:
+            raise ValueError("The Pauli strings must act on the same number of qubits.")
+
+        # (Z^z1 X^x1)(Z^z2 X^x2)=(-1)^{x1.z2} Z^{z1+z2} X^{x1+x2}
+        q = self._ZX_phase() + other._ZX_phase() + 2 * _popcount(self.x & other.z)
+
+        out = PauliString.__new__(PauliString)
+        out.n = self.n
+        out.x = self.x ^ other.x
+        out.z = self.z ^ other.z
+        out.phase = (q + _popcount(out.x & out.z)) % 4
+
+        return out
+
+    def __neg__(self):
+        out = self.copy()
+        out.phase = (self.phase + 2) % 4
+
+        return out
+
+    def __eq__(self, other):
+        if not isinstance(other, PauliString):
+            return NotImplemented
+
+        return (
+            self.n == other.n
+            and self.phase == other.phase
+            and np.array_equal(self.x, other.x)
+            and np.array_equal(self.z, other.z)
+        )
+
+    def __hash__(self):
+        return hash((self.n, self.phase, self.x.tobytes(), self.z.tobytes()))
+
+    def __repr__(self):
+        return "PauliString('" + str(self) + "')"
+
+    def __str__(self):
+        prefix = ["+", "+i", "-", "-i"][self.phase]
+
+        return prefix + "".join("IXYZ"[i] for i in self.indices())
+
+    def copy(self):
+        out = PauliString.__new__(PauliString)
+        out.n = self.n
+        out.x = self.x.copy()
+        out.z = self.z.copy()
+        out.phase = self.phase
+
+        return out
+
+    def dag(self):
+        """
+        Returns the adjoint of the Pauli string.
+        """
+
+        out = self.copy()
+        out.phase = (-self.phase) % 4
+
+        return out
+
+    def commutes(self, other):
+        """
+        Returns True if the Pauli string commutes with the Pauli string other, and
+        False if it anticommutes with it.
+        """
+
+        s = _popcount(self.x & other.z) + _popcount(self.z & other.x)
+
+        return s % 2 == 0
+
+    def apply(self, psi):
+        """
+        Applies the Pauli string to the vector psi (or to the columns of the
+        matrix psi), without constructing the matrix of the Pauli string.
+        """
+
+        psi = np.array(psi)
+        D = 2**self.n
+
+        if psi.shape[0] != D:
+            raise ValueError("The dimension of psi does not match the Pauli string.")
+
+        x, z = self._masks()
+        b = np.arange(D)
+
+        # (Z^z X^x psi)[b]=(-1)^{z.b} psi[b+x]
+        c = (1j) ** self._ZX_phase() * (1 - 2 * _parity(b & z))
+        c = np.reshape(c, (D,) + (1,) * (psi.ndim - 1))
+
+        return c * psi[b ^ x]
+
+    def expectation(self, rho):
+        """
+        Calculates the expectation value Tr[P*rho] of the Pauli string P with respect
+        to rho, which can be either a state vector or a density matrix.
+        """
+
+        rho = np.array(rho)
+
+        if rho.ndim == 1 or rho.shape[1] == 1:
+            psi = rho.flatten()
+            return np.vdot(psi, self.apply(psi))
+        else:
+            D = 2**self.n
+            x, z = self._masks()
+            b = np.arange(D)
+            c = (1j) ** self._ZX_phase() * (1 - 2 * _parity(b & z))
+            return np.sum(c * rho[b ^ x, b])
+
+    def to_sparse(self):
+        """
+        Returns the matrix of the Pauli string as a scipy.sparse CSR matrix.
+        """
+
+        D = 2**self.n
+        x, z = self._masks()
+        b = np.arange(D)
+        c = (1j) ** self._ZX_phase() * (1 - 2 * _parity(b & z))
+
+        return sparse.csr_matrix((c, (b, b ^ x)), shape=(D, D))
+
+    def to_matrix(self):
+        """
+        Returns the matrix of the Pauli string as a dense numpy array.
+        """
+
+        return self.to_sparse().toarray()
+
+
 def nQubit_cov_matrix(X, n):
     """
     Using the n-qubit quadrature operators, we define the n-qubit "covariance matrix"
@@ -167,26 +451,26 @@ def nQubit_Pauli_coeff(X, n, return_dict=False):
 
     X=(1/2^n)\\sum_{alpha} c_alpha \\sigma_alpha
 
-    The coefficients are returned in lexicographical ordering.
+    The coefficients are returned as a numpy array in lexicographical ordering.
+    If return_dict=True, they are returned as a dictionary instead, with the
+    tuples of indices as the keys.
+
+    The coefficients are calculated with a fast (Walsh-Hadamard style) transform
+    that acts on one qubit at a time, which requires O(n*4^n) operations rather
+    than the O(16^n*2^n) operations needed to take the trace of X with every
+    Pauli operator.
     """
 
-    indices = list(itertools.product(*[range(0, 4)] * n))
+    C = Pauli_transform(X, n)
 
     if return_dict:
-        C = {}
+        indices = itertools.product(*[range(0, 4)] * n)
+        return dict(zip(indices, C))
     else:
-        C = []
-
-    for index in indices:
-        sigma_i = generate_nQubit_Pauli(index)
-        if return_dict:
-            C[index] = Tr(dag(sigma_i) @ X)
-        else:
-            C.append(Tr(dag(sigma_i) @ X))
-
-    return C
+        return C
 
 
+@operator_cache.memoize
 def nQubit_quadratures(n):
     """
     Returns the list of n-qubit "quadrature" operators, which are defined as
@@ -208,6 +492,9 @@ def nQubit_quadratures(n):
         .
         S[2n-2]=Id ⊗ Id ⊗ ... ⊗ Sx
         S[2n-1]=Id⊗ Id ⊗ ... ⊗ Sz
+
+    The operators are stored in the process-wide operator_cache (see qutipy.misc),
+    so the returned dictionary and matrices are read-only.
     """
 
     S = {}
@@ -235,11 +522,70 @@ def Pauli_coeff_to_matrix(coeffs, n):
     lexicographical ordering.
     """
 
-    all_indices = list(itertools.product(*[range(0, 4)] * n))
+    return Pauli_transform(coeffs, n, inverse=True)
 
-    out = 0 + 0j
 
-    for i in range(len(all_indices)):
-        out += (1.0 / 2.0**n) * coeffs[i] * generate_nQubit_Pauli(all_indices[i])
+def Pauli_transform(X, n, inverse=False):
+    """
+    Transforms the 2^n x 2^n matrix X into its vector of 4^n coefficients in the
+    n-qubit Pauli basis, as defined in nQubit_Pauli_coeff. If inverse=True, then
+    X should instead be the vector of coefficients, and the function returns the
+    corresponding matrix, as in Pauli_coeff_to_matrix.
+
+    The transform is performed in place on a work array, one qubit at a time:
+    for each qubit, the 2 x 2 block (X00,X01,X10,X11) is mapped by a butterfly
+    to the coefficients (X00+X11,X01+X10,i(X01-X10),X00-X11) of I, X, Y, and Z.
+    The total cost is therefore O(n*4^n).
+
+    X can also have leading (batch) dimensions, i.e., X can have the shape
+    (...,2^n,2^n), or (...,4^n) if inverse=True, in which case the transform is
+    applied to every matrix (or vector) in the batch.
+    """
 
-    return out
+    X = np.array(X, dtype=np.complex128)
+
+    if inverse:
+        batch = X.shape[:-1]
+    else:
+        batch = X.shape[:-2]
+        # Group the row and column index of every qubit together, so that the
+        # 2 x 2 block of each qubit forms one axis of length 4.
+        X = np.reshape(X, batch + (2,) * (2 * n))
+        b = len(batch)
+        axes = list(range(b)) + [b + k for j in range(n) for k in [j, n + j]]
+        X = np.ascontiguousarray(np.transpose(X, axes))
+
+    B = int(np.prod(batch))
+
+    for j in range(n):
+        A = np.reshape(X, (B, 4**j, 4, 4 ** (n - j - 1)))
+        a0 = A[:, :, 0]
+        a1 = A[:, :, 1]
+        a2 = A[:, :, 2]
+        a3 = A[:, :, 3]
+        t0 = a0.copy()
+        t1 = a1.copy()
+        if not inverse:
+            a0 += a3
+            np.subtract(t0, a3, out=a3)
+            a1 += a2
+            np.subtract(t1, a2, out=a2)
+            a2 *= 1j
+        else:
+            a2 *= 1j
+            a0 += a3
+            np.subtract(t0, a3, out=a3)
+            np.subtract(t1, a2, out=a1)
+            a2 += t1
+            A *= 0.5
+
+    if inverse:
+        # Undo the grouping of the row and column indices of every qubit.
+        X = np.reshape(X, batch + (2,) * (2 * n))
+        b = len(batch)
+        axes = list(range(b)) + [b + 2 * j for j in range(n)]
+        axes += [b + 2 * j + 1 for j in range(n)]
+        X = np.transpose(X, axes)
+        return np.reshape(X, batch + (2**n, 2**n))
+    else:
+        return np.reshape(X, batch + (4**n,))
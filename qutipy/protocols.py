@@ -28,8 +28,9 @@ from cvxpy.settings import CVXOPT
 from numpy.linalg import matrix_power
 
 from qutipy.channels import diamond_norm
+from qutipy.clifford import PauliFrame
 from qutipy.fidelities import fidelity
-from qutipy.gates import CNOT_ij, Rx_i
+from qutipy.gates import CNOT_ij, LocalGate
 from qutipy.general_functions import (
     Tr,
     dag,
@@ -40,14 +41,60 @@ from qutipy.general_functions import (
     tensor,
     trace_norm,
 )
-from qutipy.misc import cvxpy_to_numpy, numpy_to_cvxpy
-from qutipy.pauli import generate_nQubit_Pauli_Z
-from qutipy.states import bell, apply_isotropic_twirl, graph_state
+from qutipy.misc import sdp_template, solve_sdp_template
+from qutipy.pauli import PauliString, generate_nQubit_Pauli_Z
+from qutipy.states import (
+    bell,
+    convolve_Bell_diagonal,
+    apply_isotropic_twirl,
+    graph_state,
+    graph_state_stabilizers,
+)
 from qutipy.weyl import discrete_Weyl_X, discrete_Weyl_Z, CNOT_qudit
 
 
+def _state_discrimination_problem(d, N, dual):
+    """
+    Builds the SDP template (see misc.sdp_template) for state_discrimination,
+    with the operators p[i]*S[i] as the parameters i=0,...,N-1.
+    """
+
+    Q={i: cvx.Parameter((d,d),hermitian=True) for i in range(N)}
+
+    if not dual:
+        M={}
+
+        for i in range(N):
+            M[i]=cvx.Variable((d,d),hermitian=True)
+
+        c=[M[i]>>0 for i in range(N)]+[eye(d)-M[i]>>0 for i in range(N)]
+
+        P=M[0]
+        for i in range(1,N):
+            P=P+M[i]
+
+        c+=[P==eye(d)]
+
+        f=sum([cvx.trace(Q[i]@M[i]) for i in range(N)])
+
+        obj = cvx.Maximize(
+            cvx.real(f)
+        )
+
+        return cvx.Problem(obj, constraints=c), Q, M
+
+    else:
+        W = cvx.Variable((d, d), hermitian=True)
+
+        c=[W>>Q[i] for i in range(N)]
+
+        obj = cvx.Minimize(cvx.real(cvx.trace(W)))
+
+        return cvx.Problem(obj, constraints=c), Q, {}
+
+
 def state_discrimination(
-    S, p, err=False, dual=False, display=False, return_meas=False
+    S, p, err=False, dual=False, display=False, return_meas=False, warm_start=False
 ):
     """
     Calculates the optimal success probability for multiple quantum state discrimination,
@@ -56,6 +103,11 @@ def state_discrimination(
     positive semi-definite operators (not necessarily unit trace).
 
     If err=True, then this function returns the optimal error probability instead.
+
+    For more than two states, the SDP is built once for every dimension, number
+    of states, and value of dual, and then cached (see misc.sdp_template). If
+    warm_start=True, the solver starts from the solution of the previous call
+    with the same structure.
     """
 
     d=S[0].shape[0]
@@ -73,59 +125,26 @@ def state_discrimination(
         else:
             return p_succ
     else:
-        if not dual:
-            M={}
-
-            for i in range(N):
-                M[i]=cvx.Variable((d,d),hermitian=True)
-
-            c=[M[i]>>0 for i in range(N)]+[eye(d)-M[i]>>0 for i in range(N)]
-
-            P=M[0]
-            for i in range(1,N):
-                P=P+M[i]
-
-            c+=[P==eye(d)]
-
-            f=sum([p[i]*cvx.trace(S[i]@M[i]) for i in range(N)])
-
-            obj = cvx.Maximize(
-                cvx.real(f)
-            )
-            prob = cvx.Problem(obj, constraints=c)
-
-            prob.solve(verbose=display, eps=1e-9)
-
-            p_succ = prob.value
-
-            if err:
-                if return_meas:
-                    return 1-p_succ,[M[i].value for i in range(N)]
-                else:
-                    return 1 - p_succ
-            else:
-                if return_meas:
-                    return p_succ,[M[i].value for i in range(N)]
-                else:
-                    return p_succ
-
-        elif dual:
-
-            W = cvx.Variable((d, d), hermitian=True)
-
-            c=[W>>p[i]*S[i] for i in range(N)]
-
-            obj = cvx.Minimize(cvx.real(cvx.trace(W)))
-            prob = cvx.Problem(obj, constraints=c)
+        template = sdp_template(
+            ("state_discrimination", d, N, dual),
+            lambda: _state_discrimination_problem(d, N, dual),
+        )
 
-            prob.solve(verbose=display, eps=1e-9)
+        p_succ, M = solve_sdp_template(
+            template,
+            {i: p[i] * S[i] for i in range(N)},
+            warm_start=warm_start,
+            verbose=display,
+            eps=1e-9,
+        )
 
-            p_succ = prob.value
+        if err:
+            p_succ = 1 - p_succ
 
-            if err:
-                return 1 - p_succ
-            else:
-                return p_succ
+        if return_meas:
+            return p_succ,[M[i] for i in range(N)]
+        else:
+            return p_succ
 
 ### TODO: function for minimax state discrimination
 
@@ -151,8 +170,22 @@ def apply_teleportation_chain_channel(rho, n, dA=2, dR=2, dB=2):
     We obtain a chain of entanglement swaps by letting
 
         rho_{A R11 R12 R21 R22 ... Rn1 Rn2 B} = Phi_{A R11}^+ ⊗ Phi_{R12 R21}^+ ⊗ ... ⊗ Phi_{Rn2 B}^+.
+
+    Alternatively, for a chain of entanglement swaps of Bell-diagonal states (with
+    all dimensions equal to d=dB), rho can be the list of the n+1 d x d arrays of
+    Bell-diagonal coefficients (see states.Bell_diagonal_coefficients) of the
+    states of A R11, R12 R21, ..., Rn2 B. The output state on AB is then also
+    Bell-diagonal, and the array of its coefficients is returned. It is the
+    convolution of the input arrays (see states.convolve_Bell_diagonal), which is
+    calculated in time O(n d^2 log(d)) instead of exponential time in n.
     """
 
+    if isinstance(rho, (list, tuple)):
+        if len(rho) != n + 1:
+            raise ValueError("rho must be a list of n+1 Bell-diagonal coefficients.")
+
+        return convolve_Bell_diagonal(rho)
+
     indices = list(itertools.product(*[range(dB)] * n))
 
     rho_out = np.array(np.zeros((dA * dB, dA * dB), dtype=complex))
@@ -177,14 +210,28 @@ def apply_teleportation_chain_channel(rho, n, dA=2, dR=2, dB=2):
     return rho_out
 
 
-def post_graph_state_dist_fidelity(A_G, n, rho):
+def post_graph_state_dist_fidelity(A_G, n, rho, shots=10000, rng=None):
     """
     Finds the fidelity of the output state of the graph state distribution channel
     with respect to the graph state |G>, where A_G is the adjacency matrix of the
     graph G and n is the number of vertices of G. The input state rho is a state of
     2*n qubits.
+
+    Alternatively, rho can be a list of n Bell-diagonal states of the pairs of
+    qubits A_k R_k, each given by a 2 x 2 array p_k of probabilities such that
+    p_k[z,x] is the probability of bell(z,x). In this case, the protocol is
+    simulated with a PauliFrame (using the given number of shots and the numpy
+    random Generator rng), in time polynomial in n, so that graphs with hundreds
+    of vertices can be used. The result is then a Monte Carlo estimate of the
+    fidelity, whose statistical error is at most 1/(2*sqrt(shots)) (one standard
+    deviation); pass rng to make it reproducible.
     """
 
+    if isinstance(rho, (list, tuple)):
+        return _graph_state_dist_frame(A_G, n, rho, shots, rng).fidelity(
+            graph_state_stabilizers(A_G, n), range(1, n + 1)
+        )
+
     X_n = list(itertools.product(*[range(2)] * n))
 
     f = 0
@@ -192,25 +239,52 @@ def post_graph_state_dist_fidelity(A_G, n, rho):
     for x_n in X_n:
         x_n = np.array([x_n]).T  # Turn x_n into a column vector matrix
 
-        z_n = A_G * x_n
-        z_n = np.mod(z_n, 2)
+        z_n = np.mod(A_G[:n, :n] @ x_n, 2)
 
-        bell = bell(z_n[0, 0], x_n[0, 0], 2, as_matrix=True)
+        Bell_zx = bell(z_n[0, 0], x_n[0, 0], 2)
 
         for k in range(1, n):
-            bell = tensor(bell, bell(z_n[k, 0], x_n[k, 0], 2, as_matrix=True))
+            Bell_zx = tensor(Bell_zx, bell(z_n[k, 0], x_n[k, 0], 2))
 
-        bell = syspermute(
-            bell,
+        Bell_zx = syspermute(
+            Bell_zx,
             list(range(1, 2 * n, 2)) + list(range(2, 2 * n + 1, 2)),
             2 * np.ones(2 * n, dtype=int),
         )
 
-        f += fidelity(rho, bell)
+        f += fidelity(rho, Bell_zx)
 
     return f
 
 
+def _graph_state_dist_frame(A_G, n, p, shots=10000, rng=None):
+    """
+    Simulates the graph state distribution protocol (see
+    apply_graph_state_dist_channel) with Bell-diagonal input states p (see
+    post_graph_state_dist_fidelity), returning the PauliFrame. The qubits are
+    A_1,...,A_n,R_1,...,R_n.
+    """
+
+    frame = PauliFrame(2 * n, shots=shots, rng=rng)
+
+    for k in range(1, n + 1):
+        frame.Bell_noise(k, p[k - 1])
+
+    # Measurement of R_1,...,R_n in the graph state basis.
+    for i in range(n):
+        for j in range(i + 1, n):
+            if A_G[i, j] == 1:
+                frame.CZ(n + i + 1, n + j + 1)
+
+    Z = PauliString.from_label("Z")
+
+    for k in range(1, n + 1):
+        frame.H(n + k)
+        frame.correct(frame.measure(n + k), Z, [k])
+
+    return frame
+
+
 def post_teleportation_fidelity(rho, dA=2):
     """
     Calculates the fidelity of the output state of the teleportation channel with
@@ -223,8 +297,8 @@ def post_teleportation_fidelity(rho, dA=2):
             fidelity(
                 rho,
                 tensor(
-                    bell(z, x, dA, as_matrix=True),
-                    bell(z, x, dA, as_matrix=True),
+                    bell(z, x, dA),
+                    bell(z, x, dA),
                 ),
             )
             for z in range(dA)
@@ -237,8 +311,22 @@ def post_ent_swap_GHZ_chain_fidelity(rho, n):
     """
     Finds the fidelity of the output state of the apply_ent_swap_GHZ_chain_channel()
     function with respect to the (n+2)-party GHZ state.
+
+    Alternatively, rho can be a list of n+1 Bell-diagonal states of the pairs of
+    qubits A R11, R12 R21, ..., Rn2 B (the input of the channel), each given by a
+    2 x 2 array p_k of probabilities such that p_k[z,x] is the probability of
+    bell(z,x). The output is then the GHZ state exactly when none of the pairs has
+    an X error and the number of Z errors is even, so that the fidelity is
+
+        (prod_k (p_k[0,0]+p_k[1,0]) + prod_k (p_k[0,0]-p_k[1,0]))/2,
+
+    which is computed in time linear in n.
     """
 
+    if isinstance(rho, (list, tuple)):
+        p = np.array(rho)
+        return (np.prod(p[:, 0, 0] + p[:, 1, 0]) + np.prod(p[:, 0, 0] - p[:, 1, 0])) / 2
+
     indices = list(itertools.product(*[range(2)] * n))
 
     f = 0
@@ -248,10 +336,10 @@ def post_ent_swap_GHZ_chain_fidelity(rho, n):
 
         s = np.mod(sum(index), 2)
 
-        Bell_z = bell(s, 0, 2, as_matrix=True)
+        Bell_z = bell(s, 0, 2)
 
         for z in index:
-            Bell_z = tensor(Bell_z, bell(z, 0, 2, as_matrix=True))
+            Bell_z = tensor(Bell_z, bell(z, 0, 2))
 
         f = f + fidelity(Bell_z, rho)
 
@@ -271,25 +359,7 @@ def apply_ent_swap_GHZ_channel(rho):
     Currently only works for qubits.
     """
 
-    C = CNOT_ij(2, 3, 4)
-
-    X = [matrix_power(discrete_Weyl_X(2), x) for x in range(2)]
-
-    rho_out = np.sum(
-        [
-            tensor(eye(4), dag(ket(2, x)), eye(2))
-            @ C
-            @ tensor(eye(8), X[x])
-            @ rho
-            @ tensor(eye(8), X[x])
-            @ dag(C)
-            @ tensor(eye(4), ket(2, x), eye(2))
-            for x in range(2)
-        ],
-        0,
-    )
-
-    return rho_out
+    return apply_ent_swap_GHZ_chain_channel(rho, 1)
 
 
 def apply_ent_swap_GHZ_chain_channel(rho, n):
@@ -306,48 +376,66 @@ def apply_ent_swap_GHZ_chain_channel(rho, n):
     Currently only works for qubits. For n=1, we get the same thing as apply_ent_swap_GHZ_channel().
     """
 
-    def K(j, x):
-        # j is between 1 and n, denoting the pair of R systems. x is either 0 or 1.
-        # For each j, the qubit indices are 2*j and 2*j+1 for the pair Rj1 and
-        # Rj2
+    # The channel is the composition of the channels for the pairs j=1,...,n, each
+    # of which consists of (local) gates on the qubits 2*j, 2*j+1, and 2*j+2, so
+    # that it is applied to rho without building any 2^(2n+2) x 2^(2n+2) operators.
+    X = np.array([[0, 1], [1, 0]])
 
-        Mx = tensor(
-            eye(2),
-            eye(2 ** (2 * j - 2)),
-            eye(2),
-            ket(2, x) @ dag(ket(2, x)),
-            eye(2 ** (2 * (n - j))),
-            eye(2),
-        )
+    for j in range(1, n + 1):
+        C = CNOT_ij(2 * j, 2 * j + 1, 2 * n + 2, local=True)
+        X_B = LocalGate(X, [2 * j + 2], 2 * n + 2)
 
-        C = CNOT_ij(2 * j, 2 * j + 1, 2 * n + 2)
+        rho_out = 0
 
-        X = 1j * Rx_i(2 * j + 2, np.pi, 2 * n + 2)
+        for x in range(2):
+            Mx = LocalGate(ket(2, x) @ dag(ket(2, x)), [2 * j + 1], 2 * n + 2)
+            rho_x = C.apply(X_B.apply(rho) if x == 1 else rho)
+            rho_out = rho_out + Mx.apply(rho_x)
 
-        return Mx @ C @ matrix_power(X, x)
+        rho = rho_out
 
-    indices = list(itertools.product(*[range(2)] * n))
+    rho_out = partial_trace(
+        rho, [2 * j + 1 for j in range(1, n + 1)], [2] * (2 * n + 2)
+    )
 
-    rho_out = np.array(np.zeros((2 ** (2 * n + 2), 2 ** (2 * n + 2)), dtype=complex))
+    return rho_out
 
-    for index in indices:
-        index = list(index)
 
-        L = K(1, index[0])
-        for j in range(2, n + 1):
-            L = K(j, index[j - 1]) @ L
+def _channel_discrimination_problem(dA, dB, n, dual):
+    """
+    Builds the SDP template (see misc.sdp_template) for channel_discrimination,
+    with the operators P[i]*C[i] as the parameters i=0,...,n-1.
+    """
 
-        rho_out = rho_out + L @ rho @ dag(L)
+    R={i: cvx.Parameter((dA*dB,dA*dB),hermitian=True) for i in range(n)}
 
-    rho_out = partial_trace(
-        rho_out, [2 * j + 1 for j in range(1, n + 1)], [2] * (2 * n + 2)
-    )
+    if not dual:
 
-    return rho_out
+        Q={}
+        for i in range(n):
+            Q[i]=cvx.Variable((dA*dB,dA*dB),hermitian=True)
+
+        sigma=cvx.Variable((dA,dA),hermitian=True)
+
+        c=[Q[i]>>0 for i in range(n)]+[sigma>>0,cvx.trace(sigma)==1]
+        c+=[cvx.sum([Q[i] for i in range(n)])==cvx.kron(sigma,eye(dB))]
+
+        obj=cvx.Maximize(cvx.sum([cvx.real(cvx.trace(Q[i]@R[i])) for i in range(n)]))
+
+    else:
+
+        l = cvx.Variable()
+        Y = cvx.Variable((dA * dB, dA * dB), hermitian=True)
+
+        c=[l>=0]+[Y>>R[i] for i in range(n)]+[Y>>0,cvx.partial_trace(Y,[dA,dB],1)==l*eye(dA)]
+
+        obj = cvx.Minimize(l)
+
+    return cvx.Problem(obj, constraints=c), R, {}
 
 
 def channel_discrimination(
-    C, dA, dB, P, err=False, dual=False, display=False
+    C, dA, dB, P, err=False, dual=False, display=False, warm_start=False
 ):
     """
     Calculates the optimal success probability for multiple quantum channel
@@ -357,6 +445,10 @@ def channel_discrimination(
     the input and output dimensions, respectively, of the channels.
 
     If err=True, then this function returns the optimal error probability instead.
+
+    The SDP is built once for every (dA,dB,number of channels,dual) and cached
+    (see misc.sdp_template). If warm_start=True, the solver starts from the
+    solution of the previous call with the same structure.
     """
 
     ##TODO: General comb optimization with multiple channel uses. 
@@ -365,61 +457,36 @@ def channel_discrimination(
         p_succ = (1 / 2) * (
             1
             + diamond_norm(
-                P[0] * C[0] - P[1] * C[1], dA, dB, display=display, choi=True
+                P[0] * C[0] - P[1] * C[1],
+                dA,
+                dB,
+                display=display,
+                choi=True,
+                warm_start=warm_start,
             )
         )
-        if err:
-            return 1 - p_succ
-        else:
-            return p_succ
 
     else:
 
         n=len(C)
 
-        if not dual:
-
-            Q={}
-            for i in range(n):
-                Q[i]=cvx.Variable((dA*dB,dA*dB),hermitian=True)
-
-            sigma=cvx.Variable((dA,dA),hermitian=True)
-
-            c=[Q[i]>>0 for i in range(n)]+[sigma>>0,cvx.trace(sigma)==1]
-            c+=[cvx.sum([Q[i] for i in range(n)])==cvx.kron(sigma,eye(dB))]
-
-            obj=cvx.Maximize(cvx.sum([P[i]*cvx.real(cvx.trace(Q[i]@C[i])) for i in range(n)]))
-            prob=cvx.Problem(obj,constraints=c)
-
-            prob.solve(verbose=display,eps=1e-9)
-
-            p_succ=prob.value
-
-            if err:
-                return 1 - p_succ
-            else:
-                return p_succ
-
-        elif dual:
-
-            l = cvx.Variable()
-            Y = cvx.Variable((dA * dB, dA * dB), hermitian=True)
-
-            #YA = numpy_to_cvxpy(partial_trace(cvxpy_to_numpy(Y), [2], [dA, dB]))
-
-            c=[l>=0]+[Y>>P[i]*C[i] for i in range(n)]+[Y>>0,cvx.partial_trace(Y,[dA,dB],1)==l*eye(dA)]
-
-            obj = cvx.Minimize(l)
-            prob = cvx.Problem(obj, constraints=c)
-
-            prob.solve(verbose=display, eps=1e-9)
+        template = sdp_template(
+            ("channel_discrimination", dA, dB, n, dual),
+            lambda: _channel_discrimination_problem(dA, dB, n, dual),
+        )
 
-            p_succ = prob.value
+        p_succ, _ = solve_sdp_template(
+            template,
+            {i: P[i] * C[i] for i in range(n)},
+            warm_start=warm_start,
+            verbose=display,
+            eps=1e-9,
+        )
 
-            if err:
-                return 1 - p_succ
-            else:
-                return p_succ
+    if err:
+        return 1 - p_succ
+    else:
+        return p_succ
 
 
 def channel_discrimination_minimax(C,dA,dB,err=False, dual=False, display=False):
@@ -465,7 +532,7 @@ def channel_discrimination_minimax(C,dA,dB,err=False, dual=False, display=False)
         P=cvx.Variable(n)
         Y=cvx.Variable((dA*dB,dA*dB),hermitian=True)
 
-        YA=numpy_to_cvxpy(partial_trace(cvxpy_to_numpy(Y),[2],[dA,dB]))
+        YA=partial_trace(Y,[2],[dA,dB])
 
         c=[l>=0]+[Y>>P[i]*C[i] for i in range(n)]+[p>=0 for p in P]+[cvx.sum(P)==1]+[Y>>0,YA==l*eye(dA)]
 
@@ -490,7 +557,7 @@ def post_ent_swap_GHZ_fidelity(rho):
     with respect to the three-party GHZ state.
     """
 
-    Phi = [bell(z, 0, 2, as_matrix=True) for z in range(2)]
+    Phi = [bell(z, 0, 2) for z in range(2)]
 
     return sum([fidelity(tensor(Phi[z], Phi[z]), rho) for z in range(2)])
 
@@ -649,16 +716,26 @@ def post_teleportation_chain_fidelity(rho, n, dA=2):
         rho_{A R11 R12 R21 R22 ... Rn1 Rn2 B}.
 
     We assume that A, B, and all R systems have the same dimension.
+
+    Alternatively, rho can be the list of the n+1 arrays of Bell-diagonal
+    coefficients of the states of A R11, R12 R21, ..., Rn2 B (see
+    apply_teleportation_chain_channel), in which case the fidelity is calculated
+    in time O(n dA^2 log(dA)).
     """
 
+    if isinstance(rho, (list, tuple)):
+        return apply_teleportation_chain_channel(rho, n, dA, dA, dA)[0, 0]
+
     f = 0
 
     indices = list(itertools.product(*[range(dA)] * n))
 
     for z_indices in indices:
         for x_indices in indices:
-            z_sum = np.mod(sum(z_indices), dA)
-            x_sum = np.mod(sum(x_indices), dA)
+            # The output is |Phi^+> if and only if the indices of all n+1 Bell
+            # states add up to zero.
+            z_sum = np.mod(-sum(z_indices), dA)
+            x_sum = np.mod(-sum(x_indices), dA)
 
             Bell_tot = bell(z_sum, x_sum, dA, as_matrix=True)
 
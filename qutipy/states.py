@@ -21,18 +21,18 @@
 #
 
 import numpy as np
+import scipy.sparse as sp
 from numpy.linalg import matrix_power, norm, inv
 
 import itertools
 
 from math import factorial
-from sympy.combinatorics.permutations import Permutation
 
-from qutipy.gates import CZ_ij
 from qutipy.general_functions import SWAP, Tr, dag, eye, ket, syspermute, tensor
-from qutipy.pauli import generate_nQubit_Pauli
-from qutipy.weyl import discrete_Weyl, discrete_Weyl_X, discrete_Weyl_Z, discrete_Weyl_basis
+from qutipy.pauli import PauliString, generate_nQubit_Pauli
+from qutipy.weyl import discrete_Weyl_X, discrete_Weyl_Z, discrete_Weyl_basis
 from qutipy.linalg import Sqrtm, vec, vec_inverse
+from qutipy.misc import operator_cache
 
 
 def max_ent(dim, normalized=True, as_matrix=True):
@@ -162,6 +162,40 @@ def Bell_diagonal_state(d,p,n_qubit=False):
     return np.sum([p[(s1,s2)]*bell(s1,s2,d,as_matrix=True,n_qubit=n_qubit) for s1 in S for s2 in S],0)
 
 
+def Bell_diagonal_coefficients(rho, d):
+    """
+    Returns the d x d array p of the coefficients p[z,x]=<Phi_{z,x}|rho|Phi_{z,x}>
+    of the two-qudit state rho with respect to the Bell states |Phi_{z,x}> (see
+    bell). If rho is Bell-diagonal, then rho=Bell_diagonal_state(d,p).
+    """
+
+    B = np.hstack(generate_Bell_basis(d))
+
+    return np.real(np.einsum("ij,ik,kj->j", B.conj(), rho, B)).reshape((d, d))
+
+
+def convolve_Bell_diagonal(P):
+    """
+    Returns the convolution over Z_d x Z_d of the d x d arrays in the list P, i.e.,
+    the array q with
+
+        q[z,x] = sum_{z_1+...+z_m=z, x_1+...+x_m=x} P[0][z_1,x_1]...P[m-1][z_m,x_m],
+
+    where the sums in the indices are modulo d. If the arrays are the coefficients
+    of Bell-diagonal states (see Bell_diagonal_coefficients), then q gives the
+    Bell-diagonal state obtained by teleportation or entanglement swapping through
+    the chain of these states (see apply_teleportation_chain_channel in the
+    protocols module).
+
+    The convolution is calculated with the two-dimensional FFT, which takes time
+    O(m d^2 log(d)).
+    """
+
+    F = np.prod([np.fft.fft2(np.asarray(p, dtype=float)) for p in P], axis=0)
+
+    return np.real(np.fft.ifft2(F))
+
+
 def random_Bell_diagonal(d,PSD=True,normalized=True):
 
     index_set=list(itertools.product(range(d),repeat=2))
@@ -196,6 +230,25 @@ def GHZ(dim, n, as_matrix=True):
         return GHZ
 
 
+def GHZ_stabilizers(n):
+    """
+    Returns the list of the n stabilizer generators
+
+        X ⊗ X ⊗ ... ⊗ X,  Z_k ⊗ Z_{k+1}, k=1,2,...,n-1,
+
+    of the n-qubit GHZ state as PauliStrings.
+    """
+
+    stabilizers = [PauliString(np.ones(n, dtype=int), np.zeros(n, dtype=int))]
+
+    for k in range(n - 1):
+        z = np.zeros(n, dtype=int)
+        z[k : k + 2] = 1
+        stabilizers.append(PauliString(np.zeros(n, dtype=int), z))
+
+    return stabilizers
+
+
 def graph_state(A_G, n, as_matrix=False, return_CZ=False, alt=True):
     """
     Generates the graph state corresponding to the undirected graph G with n vertices.
@@ -208,28 +261,51 @@ def graph_state(A_G, n, as_matrix=False, return_CZ=False, alt=True):
 
     """
 
-    plus = (1 / np.sqrt(2)) * (ket(2, 0) + ket(2, 1))
+    # The CZ gates are diagonal in the standard basis, with the basis vector |b>
+    # acquiring the sign (-1)^(b_i b_j) for every edge {i,j}, so the graph state
+    # is obtained from the signs instead of the product of the 2^n x 2^n CZ gates.
+    edges = [(i, j) for i in range(n) for j in range(i + 1, n) if A_G[i, j] == 1]
 
-    plus_n = tensor([plus, n])
+    b = (np.arange(2**n)[:, None] >> np.arange(n - 1, -1, -1)) & 1
 
-    G = eye(2**n)
+    parity = np.zeros(2**n, dtype=int)
+    for i, j in edges:
+        parity ^= b[:, i] & b[:, j]
 
-    for i in range(n):
-        for j in range(i, n):
-            if A_G[i, j] == 1:
-                G = G @ CZ_ij(i + 1, j + 1, n)
+    signs = 1 - 2 * parity
+
+    G_plus_n = signs[:, None] / np.sqrt(2**n)
 
     if as_matrix:
-        plus_n = plus_n @ dag(plus_n)
-        if return_CZ:
-            return G @ plus_n @ dag(G), G
-        else:
-            return G @ plus_n @ dag(G)
+        G_plus_n = G_plus_n @ dag(G_plus_n)
+
+    if return_CZ:
+        return G_plus_n, np.diag(signs.astype(float))
     else:
-        if return_CZ:
-            return G @ plus_n, G
-        else:
-            return G @ plus_n
+        return G_plus_n
+
+
+def graph_state_stabilizers(A_G, n):
+    """
+    Returns the list of the n stabilizer generators
+
+        K_k = X_k ⊗ Z_{N(k)}, k=1,2,...,n,
+
+    of the graph state |G> (see graph_state) as PauliStrings, where N(k) is the set
+    of neighbours of the vertex k in the graph G with adjacency matrix A_G. Unlike
+    the graph state itself, the stabilizers can be used for graphs with hundreds of
+    vertices (e.g., with clifford.PauliFrame).
+    """
+
+    stabilizers = []
+
+    for k in range(n):
+        x = np.zeros(n, dtype=int)
+        x[k] = 1
+        z = np.array([int(A_G[k, j] == 1 and j != k) for j in range(n)])
+        stabilizers.append(PauliString(x, z))
+
+    return stabilizers
 
 
 def isotropic_state(p, d, fidelity=False):
@@ -274,10 +350,15 @@ def apply_isotropic_twirl(X, d):
     the same fidelity to the maximally entangled state as rho.
     """
 
-    G = max_ent(d, normalized=False, as_matrix=True)
+    G = _twirl_operators(d)[0]
 
-    return (Tr(X) / (d**2 - 1) - Tr(G @ X) / (d * (d**2 - 1))) * eye(d**2) + (
-        Tr(G @ X) / (d**2 - 1) - Tr(X) / (d * (d**2 - 1))
+    # Tr(G*X)=sum_{i,j} <jj|X|ii>, which is read off from X directly.
+    T = np.reshape(X, (d, d, d, d))
+    tr_X = np.einsum("ijij->", T)
+    tr_GX = np.einsum("jjii->", T)
+
+    return (tr_X / (d**2 - 1) - tr_GX / (d * (d**2 - 1))) * eye(d**2) + (
+        tr_GX / (d**2 - 1) - tr_X / (d * (d**2 - 1))
     ) * G
 
 
@@ -368,7 +449,7 @@ def random_state_vector(dim, rank=None, as_matrix=False):
             return psi @ dag(psi)
         else:
             return psi
-        
+
 
 def random_probability_distribution(d,as_dict=False,index_set=None):
     """
@@ -461,13 +542,67 @@ def apply_Werner_twirl(X, d):
     the same fidelity to the singlet state as rho.
     """
 
-    F = SWAP([1, 2], [d, d])
+    F = _twirl_operators(d)[1]
 
-    return (Tr(X) / (d**2 - 1) - Tr(F @ X) / (d * (d**2 - 1))) * eye(d**2) + (
-        Tr(F @ X) / (d**2 - 1) - Tr(X) / (d * (d**2 - 1))
+    # Tr(F*X)=sum_{i,j} <ji|X|ij>, which is read off from X directly.
+    T = np.reshape(X, (d, d, d, d))
+    tr_X = np.einsum("ijij->", T)
+    tr_FX = np.einsum("jiij->", T)
+
+    return (tr_X / (d**2 - 1) - tr_FX / (d * (d**2 - 1))) * eye(d**2) + (
+        tr_FX / (d**2 - 1) - tr_X / (d * (d**2 - 1))
     ) * F
 
 
+@operator_cache.memoize
+def _twirl_operators(d):
+    """
+    Returns the (unnormalized) maximally entangled operator G=|Gamma><Gamma| and
+    the swap operator F on two d-dimensional systems, which span the invariant
+    operators of the isotropic and Werner twirls, respectively.
+    """
+
+    return max_ent(d, normalized=False, as_matrix=True), SWAP([1, 2], [d, d])
+
+
+def _Weyl_twirl(X, d, groups, N):
+    """
+    Projects the operator X on N qudits of dimension d onto the operators that
+    commute with W_{z,x} ⊗ ... ⊗ W_{z,x} on the qudits in g (0-based indices), for
+    all z,x=0,...,d-1 and every list g in groups, i.e., applies the discrete Weyl
+    twirl of every group.
+
+    Since W_{z,x}|j>=w^{z(j+x)}|j+x>, conjugating the matrix element
+    <i|X|j> by W_{z,x}^{⊗g} moves it to <i+x|.|j+x> (with x added to every qudit
+    in g) and multiplies it by w^{z(|i|-|j|)}, where |i| is the sum of the
+    indices of the qudits in g. The average over z therefore keeps only the
+    elements with |i|=|j| mod d, and the average over x is an average of d shifted
+    copies of X, so that the twirl takes time O(d*D^2) for D=d^N.
+    """
+
+    T = np.reshape(X, (d,) * (2 * N)).astype(complex)
+
+    for g in groups:
+        axes = list(g) + [N + a for a in g]
+
+        S = np.copy(T)
+        for x in range(1, d):
+            S += np.roll(T, x, axis=axes)
+        T = S / d
+
+        charge = np.zeros((1,) * (2 * N), dtype=int)
+        for a in g:
+            shape = [1] * (2 * N)
+            shape[a] = d
+            charge = charge + np.reshape(np.arange(d), shape)
+            shape[a], shape[N + a] = 1, d
+            charge = charge - np.reshape(np.arange(d), shape)
+
+        T = np.where(np.mod(charge, d) == 0, T, 0)
+
+    return np.reshape(T, np.shape(X))
+
+
 def apply_discrete_Weyl_twirl(X, d, n):
     """
     Applies a discrete Weyl twirling channel to the input operator X.
@@ -477,21 +612,15 @@ def apply_discrete_Weyl_twirl(X, d, n):
     For example, if n=2, and accordingly X is a bipartite operator, then
     the twirling channel is
 
-        X -> \sum_{z,x=0}^{d-1} (W_{z,x} ⊗ W_{z,x}) X (W_{z,x} ⊗ W_{z,x})^†
+        X -> (1/d^2) \sum_{z,x=0}^{d-1} (W_{z,x} ⊗ W_{z,x}) X (W_{z,x} ⊗ W_{z,x})^†
 
     For d=2, this is the same as the Pauli twirl -- see the 'apply_Pauli_twirl' function.
+
+    The twirl is calculated as a projection in time O(d*D^2), where D=d^n, rather
+    than as a sum of d^2 conjugations by D x D matrices.
     """
 
-    return (1/d**2)*np.sum(
-        [
-            tensor([discrete_Weyl(d, z, x), n])
-            @ X
-            @ tensor([dag(discrete_Weyl(d, z, x)), n])
-            for z in range(d)
-            for x in range(d)
-        ],
-        0,
-    )
+    return _Weyl_twirl(X, d, [list(range(n))], n)
 
 
 def apply_Pauli_twirl(X, n, m=1,alt=False):
@@ -502,29 +631,17 @@ def apply_Pauli_twirl(X, n, m=1,alt=False):
     For example, if n=3, then the twirling channel is
 
         X -> \sum_{i=0}^4 (P_i ⊗ P_i ⊗ P_i) X (P_i ⊗ P_i ⊗ P_i)
+
+    The sum over the 4^m m-qubit Pauli operators P_i factorizes into one-qubit
+    Pauli twirls of the n qubits at the same position in each of the subsystems,
+    each of which is a projection (see apply_discrete_Weyl_twirl), so the twirl
+    takes time O(m*4^(nm)). The operators Z^zX^x (alt=True) differ from the
+    Pauli operators only by phases, which do not affect the twirl.
     """
 
-    if alt:
-        x=list(itertools.product([0, 1], repeat=m))
-        z=list(itertools.product([0, 1], repeat=m))
-
-        return np.sum(
-            [
-                generate_nQubit_Pauli([z*n,x*n],alt=True) @ X @ dag(generate_nQubit_Pauli([z*n,x*n],alt=True))
-                for s in S
-            ],
-            0,
-        )
-    else:
-        S = list(itertools.product([0, 1, 2, 3], repeat=m))
-
-        return np.sum(
-            [
-                generate_nQubit_Pauli(s * n) @ X @ dag(generate_nQubit_Pauli(s * n))
-                for s in S
-            ],
-            0,
-        )
+    groups = [[k * m + q for k in range(n)] for q in range(m)]
+
+    return 4**m * _Weyl_twirl(X, 2, groups, n * m)
 
 
 def purification(rho,as_matrix=False,alt=False):
@@ -559,61 +676,127 @@ def purification(rho,as_matrix=False,alt=False):
         return R@Gamma
 
 
-def occupation_number_state_sym(d,n,c):
+def _multiset_permutations(c):
+    """
+    Returns the array of shape (M,n), with M=n!/(c_0!c_1!...), whose rows are the
+    distinct strings of length n=sum(c) containing the symbol i exactly c[i] times,
+    in lexicographic order. The strings are built one position at a time, by
+    extending every partial string with every symbol that is still available.
+    """
+
+    c = np.array(c, dtype=int)
+
+    strings = np.zeros((1, 0), dtype=int)
+    remaining = c[np.newaxis, :]
+
+    for _ in range(np.sum(c)):
+        rows, symbols = np.nonzero(remaining > 0)
+        strings = np.hstack([strings[rows], symbols[:, np.newaxis]])
+        remaining = remaining[rows]
+        remaining[np.arange(len(rows)), symbols] -= 1
+
+    return strings
+
+
+def _occupation_number_vector(d, n, strings, amplitudes, sparse):
+    """
+    Returns the vector in (C^d)^{⊗ n} with the given amplitudes for the basis
+    vectors |s_1,...,s_n> given by the rows of strings, as a (d^n,1) numpy array
+    or, if sparse=True, as a scipy.sparse column vector.
+    """
+
+    indices = strings @ (d ** np.arange(n - 1, -1, -1, dtype=np.int64))
+
+    if sparse:
+        return sp.csc_matrix(
+            (amplitudes, (indices, np.zeros(len(indices), dtype=int))),
+            shape=(d**n, 1),
+            dtype=np.complex128,
+        )
+
+    out = np.zeros((d**n, 1), dtype=np.complex128)
+    out[indices, 0] = amplitudes
+
+    return out
+
+
+def occupation_number_state_sym(d,n,c,sparse=False):
     """
     Returns an occupation number state corresponding to the 
     symmetric subspace of n tensor copies of C^d The variable
     c is a list/tuple of d integers between 0 and d-1, which
     should sum up to n.
+
+    The state is the uniform superposition of the n!/(c_0!c_1!...) distinct basis
+    vectors with the given occupation numbers, which are enumerated directly
+    instead of summing over all n! permutations. If sparse=True, then the state is
+    returned as a scipy.sparse column vector.
     """
 
     if np.sum(c)!=n:
         return "Sum of the occupation numbers should be equal to n."
 
-    v=1
-    
-    for i in range(d):
-        v=tensor(v,[ket(d,i),c[i]])
-
-    perms=list(itertools.permutations(list(range(1,n+1))))
-
-    out=np.zeros((d**n,1),dtype=np.complex128)
+    strings = _multiset_permutations(c[:d])
 
-    for perm in perms:
-        out=out+syspermute(v,perm,[d]*n)
+    # Every distinct string appears prod_i c_i! times in the sum over permutations.
+    amplitude = np.sqrt(np.prod([factorial(ci) for ci in c[:d]]) / factorial(n))
 
-    N=(1/np.sqrt(factorial(n)))*(1/np.sqrt(np.prod([factorial(ci) for ci in c])))
-
-    return N*out
+    return _occupation_number_vector(
+        d, n, strings, np.full(len(strings), amplitude), sparse
+    )
 
 
-def occupation_number_state_asym(d,n,c):
+def occupation_number_state_asym(d,n,c,sparse=False):
     """
     Returns an occupation number state corresponding to the 
     anti-symmetric subspace of n tensor copies of C^d The variable
     c is a list/tuple of d integers between 0 and d-1, which
     should sum up to n.
+
+    The state vanishes if any of the occupation numbers is larger than one.
+    Otherwise, it is the superposition of the n! basis vectors with the given
+    occupation numbers, with the sign of every basis vector given by the parity
+    of the number of inversions of its string. If sparse=True, then the state is
+    returned as a scipy.sparse column vector.
     """
 
     if np.sum(c)!=n:
         return "Sum of the occupation numbers should be equal to n."
 
-    v=1
-    
-    for i in range(d):
-        v=tensor(v,[ket(d,i),c[i]])
+    if np.any(np.array(c[:d]) > 1):
+        strings = np.zeros((0, n), dtype=int)
+    else:
+        strings = _multiset_permutations(c[:d])
+
+    inversions = np.zeros(len(strings), dtype=int)
+
+    for k in range(n - 1):
+        inversions += np.sum(strings[:, k : k + 1] > strings[:, k + 1 :], axis=1)
 
-    perms=list(itertools.permutations(list(range(1,n+1))))
+    signs = 1 - 2 * np.mod(inversions, 2)
 
-    out=np.zeros((d**n,1),dtype=np.complex128)
+    return _occupation_number_vector(
+        d, n, strings, signs / np.sqrt(factorial(n)), sparse
+    )
+
+
+def symmetric_subspace_isometry(d, n):
+    """
+    Returns the isometry V from C^m to (C^d)^{⊗ n}, with m=binom(n+d-1,n), onto
+    the symmetric subspace, as a real scipy.sparse matrix. The columns of V are
+    the occupation number states (see occupation_number_state_sym) for all
+    occupation numbers c_0+c_1+...+c_{d-1}=n, so that V@V.T is the projection
+    onto the symmetric subspace.
+    """
+
+    columns = []
 
-    for perm in perms:
-        sign=Permutation([p-1 for p in perm]).signature()
-        out=out+sign*syspermute(v,perm,[d]*n)
+    for symbols in itertools.combinations_with_replacement(range(d), n):
+        c = np.bincount(np.array(symbols, dtype=int), minlength=d)
+        columns.append(occupation_number_state_sym(d, n, c, sparse=True).real)
 
-    N=(1/np.sqrt(factorial(n)))
+    return sp.hstack(columns, format="csc")
 
-    return N*out
 
 ############################################################################
 
@@ -621,7 +804,13 @@ def occupation_number_state_asym(d,n,c):
 
 import cvxpy as cvx
 
-from qutipy.general_functions import partial_trace, partial_transpose, trace_norm
+from qutipy.general_functions import (
+    _cvx_apply_map,
+    partial_trace_map,
+    partial_transpose,
+    partial_transpose_map,
+    trace_norm,
+)
 
 
 def density_matrix_basis(d,return_dual=False):
@@ -675,7 +864,7 @@ def density_matrix_POVM(d,return_dual=False):
         return M, O
     else:
         return M
-    
+
 
 def discrete_Weyl_POVM(d,rho,return_dual=False):
     """
@@ -703,27 +892,143 @@ def discrete_Weyl_POVM(d,rho,return_dual=False):
         return M
 
 
-def check_kext(rhoAB, dimA, dimB, k, display=False):
+def _Bose_marginal_map(dimA, dimB, k):
     """
-    Checks if the bipartite state rhoAB is k-extendible.
+    Returns the sparse matrix that maps the vectorization of an operator S on
+    C^dimA ⊗ C^m, with m=binom(k+dimB-1,k), to the vectorization of the marginal
+    on A and B_1 of R=(I ⊗ V)S(I ⊗ V)^†, where V=symmetric_subspace_isometry(dimB,k).
+    Since V has exactly one nonzero entry in every row, the marginal is obtained
+    directly from the entries of V, without forming R.
     """
 
-    all_sys = list(range(1, k + 2))
-    dim = [dimA] + [dimB] * k
+    V = symmetric_subspace_isometry(dimB, k).tocoo()
+    m = V.shape[1]
+
+    column = np.zeros(dimB**k, dtype=int)
+    value = np.zeros(dimB**k)
+    column[V.row] = V.col
+    value[V.row] = V.data
+
+    # Index as [b_1,l], where l is the string of B_2,...,B_k.
+    column = column.reshape(dimB, -1)
+    value = value.reshape(dimB, -1)
+
+    a = np.arange(dimA)[:, None, None, None, None]
+    b = np.arange(dimB)[None, :, None, None, None]
+    a2 = np.arange(dimA)[None, None, :, None, None]
+    b2 = np.arange(dimB)[None, None, None, :, None]
+    l = np.arange(column.shape[1])[None, None, None, None, :]
+
+    shape = (dimA, dimB, dimA, dimB, column.shape[1])
+
+    rows = (a * dimB + b) * (dimA * dimB) + a2 * dimB + b2
+    cols = (a * m + column[b, l]) * (dimA * m) + a2 * m + column[b2, l]
+    data = value[b, l] * value[b2, l]
+
+    return sp.csr_matrix(
+        (
+            np.broadcast_to(data, shape).reshape(-1),
+            (
+                np.broadcast_to(rows, shape).reshape(-1),
+                np.broadcast_to(cols, shape).reshape(-1),
+            ),
+        ),
+        shape=((dimA * dimB) ** 2, (dimA * m) ** 2),
+    )
+
+
+def _Bose_PPT_map(dimA, dimB, k, j):
+    """
+    Returns the sparse matrix that maps the vectorization of S (see
+    _Bose_marginal_map) to the vectorization of the partial transpose on the
+    last j B systems of R=(I ⊗ V)S(I ⊗ V)^†, compressed to
+    C^dimA ⊗ Sym^{k-j}(C^dimB) ⊗ Sym^j(C^dimB). Since the symmetric subspace of k
+    systems is contained in Sym^{k-j} ⊗ Sym^j, this compression has the same
+    nonzero eigenvalues as the partial transpose of R.
+    """
+
+    V = symmetric_subspace_isometry(dimB, k)
+    V1 = symmetric_subspace_isometry(dimB, k - j)
+    V2 = symmetric_subspace_isometry(dimB, j)
+
+    K = sp.kron(sp.identity(dimA), sp.kron(V1, V2).T @ V)
+
+    dim = [dimA, V1.shape[1], V2.shape[1]]
+
+    return partial_transpose_map([3], dim) @ sp.kron(K, K, format="csr")
+
+
+def check_kext(rhoAB, dimA, dimB, k, display=False, bose_symmetric=False, PPT=False):
+    """
+    Checks if the bipartite state rhoAB is k-extendible, by maximizing t such that
+    R-t*I is positive semidefinite, where R is an operator on A ⊗ B_1 ⊗ ... ⊗ B_k
+    whose marginals on A and B_j are equal to rhoAB for all j. The state is
+    k-extendible if and only if the optimal value is non-negative. Returns the
+    optimal value and R.
+
+    If bose_symmetric=True, then the function instead checks if rhoAB has a
+    Bose-symmetric k-extension, i.e., one supported on the symmetric subspace of
+    B_1,...,B_k. This is a strictly stronger condition than k-extendibility, so a
+    negative optimal value does not imply that rhoAB is not k-extendible (for
+    example, a mixture of the antisymmetric Werner state and the maximally mixed
+    state can be 2-extendible without being Bose-symmetric 2-extendible). In this
+    case, R=(I ⊗ V)S(I ⊗ V)^† with V=symmetric_subspace_isometry(dimB,k), and the
+    optimization is over the operator S on C^dimA ⊗ C^m, with
+    m=binom(k+dimB-1,k), whose size does not grow exponentially with k. The
+    function then returns the optimal value and S.
+
+    If PPT=True, then R is additionally required to have a positive partial
+    transpose with respect to the last j B systems, for all j=1,...,k. Only
+    these cuts are constrained, and R is not symmetrized over B_1,...,B_k, so
+    without bose_symmetric=True this does not constrain every bipartite cut.
+
+    The marginals and partial transposes are computed with precomputed sparse
+    linear maps (see partial_trace_map and partial_transpose_map).
+    """
 
     t = cvx.Variable()
-    R = cvx.Variable((dimA * dimB**k, dimA * dimB**k), hermitian=True)
 
-    obj = cvx.Maximize(t)
+    if bose_symmetric:
+        m = symmetric_subspace_isometry(dimB, k).shape[1]
+        D = dimA * m
+
+        R = cvx.Variable((D, D), hermitian=True)
+
+        maps = [(_Bose_marginal_map(dimA, dimB, k), rhoAB)]
 
-    c = [R - t * eye(dimA * dimB**k) >> 0]
+        if PPT:
+            PT_maps = [_Bose_PPT_map(dimA, dimB, k, j) for j in range(1, k + 1)]
+    else:
+        all_sys = list(range(1, k + 2))
+        dim = [dimA] + [dimB] * k
+        D = dimA * dimB**k
+
+        R = cvx.Variable((D, D), hermitian=True)
+
+        maps = []
+
+        for j in range(2, k + 2):
+            sys = list(np.setdiff1d(all_sys, [1, j]))
+            maps.append((partial_trace_map(sys, dim), rhoAB))
+
+        if PPT:
+            PT_maps = [
+                partial_transpose_map(list(range(k - j + 2, k + 2)), dim)
+                for j in range(1, k + 1)
+            ]
+
+    obj = cvx.Maximize(t)
 
-    for j in range(2, k + 2):
-        sys = list(np.setdiff1d(all_sys, [1, j]))
+    c = [R - t * eye(D) >> 0]
 
-        R_ABj = partial_trace(R, sys, dim)
+    for M, rho in maps:
+        c.append(_cvx_apply_map(M, R, rho.shape) == rho)
 
-        c.append(R_ABj == rhoAB)
+    if PPT:
+        for M in PT_maps:
+            n = int(np.sqrt(M.shape[0]))
+            T = cvx.Variable((n, n), hermitian=True)
+            c += [_cvx_apply_map(M, R, (n, n)) == T, T >> 0]
 
     prob = cvx.Problem(obj, constraints=c)
 
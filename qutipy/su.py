@@ -25,6 +25,7 @@ import itertools
 import numpy as np
 
 from qutipy.general_functions import Tr, dag, eye, ket, tensor
+from qutipy.misc import operator_cache
 
 
 def coherence_vector_star_product(n1, n2, d):
@@ -147,6 +148,7 @@ def nQudit_su_generators(d, n):
     return B
 
 
+@operator_cache.memoize
 def su_structure_constants(d):
     """
     Generates the structure constants corresponding to the su(d)
@@ -156,6 +158,8 @@ def su_structure_constants(d):
 
         g_{i,j,k}=(1/d^2)*Tr[S_k*{S_i,S_j}]
 
+    The structure constants are stored in the process-wide operator_cache (see
+    qutipy.misc), so the returned dictionaries are read-only.
     """
 
     f = {}
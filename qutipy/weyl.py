@@ -24,8 +24,10 @@ import itertools
 
 import numpy as np
 from numpy.linalg import matrix_power, inv
+from scipy import sparse
 
 from qutipy.general_functions import Tr, dag, ket, tensor, eye
+from qutipy.misc import operator_cache
 
 
 def discrete_Weyl_X(d):
@@ -56,12 +58,18 @@ def discrete_Weyl_Z(d):
     return Z
 
 
-def discrete_Weyl(d, z, x):
+def discrete_Weyl(d, z, x, as_operator=False):
     """
-    Generates the discrete Weyl operator Z^zX^x.
+    Generates the discrete Weyl operator Z^zX^x. If as_operator=True, then the
+    operator is returned as a WeylOperator instead of a matrix.
     """
 
-    return matrix_power(discrete_Weyl_Z(d), z) @ matrix_power(discrete_Weyl_X(d), x)
+    W = WeylOperator(d, [z], [x])
+
+    if as_operator:
+        return W
+    else:
+        return W.to_matrix()
 
 
 def discrete_Weyl_basis(d):
@@ -111,10 +119,11 @@ def generate_nQudit_Z(d, indices):
     return out
 
 
-def nQudit_discrete_Weyl_basis(d, n):
+def nQudit_discrete_Weyl_basis(d, n, as_operator=False):
     """
     Generates a list of all n-fold tensor products of the
-    discrete Weyl operators acting in d dimensions.
+    discrete Weyl operators acting in d dimensions. If as_operator=True, then
+    the operators are given as WeylOperators instead of matrices.
     """
 
     S = list(itertools.product(range(d), repeat=n))
@@ -123,11 +132,179 @@ def nQudit_discrete_Weyl_basis(d, n):
 
     for s1 in S:
         for s2 in S:
-            B.append(generate_nQudit_Z(d, s1) @ generate_nQudit_X(d, s2))
+            W = WeylOperator(d, s1, s2)
+            if as_operator:
+                B.append(W)
+            else:
+                B.append(W.to_matrix())
 
     return B
 
 
+class WeylOperator:
+    """
+    A compact representation of the n-qudit discrete Weyl operator
+
+        w^phase * Z^z X^x,
+
+    where w=exp(2*pi*i/d), Z^z=Z^{z_1} ⊗ ... ⊗ Z^{z_n}, and similarly for X^x.
+    The operator is stored using the dits z and x and the integer phase (modulo d).
+
+    Every such operator is a monomial matrix, i.e., a permutation matrix times a
+    diagonal matrix of phases:
+
+        w^phase * Z^z X^x|k> = w^{phase+z.(k+x)}|k+x>,
+
+    with the addition performed digitwise modulo d. It can therefore be applied to
+    vectors and matrices without constructing the d^n x d^n matrix, which is only
+    built (using the methods to_sparse() and to_matrix()) if it is actually needed.
+    """
+
+    def __init__(self, d, z, x, phase=0):
+        z = np.array(z, dtype=np.int64).flatten() % d
+        x = np.array(x, dtype=np.int64).flatten() % d
+
+        if len(z) != len(x):
+            raise ValueError("z and x must have the same length.")
+
+        self.d = d
+        self.n = len(z)
+        self.z = z
+        self.x = x
+        self.phase = int(phase) % d
+
+    def _digits(self):
+        # The digits of all of the computational basis indices, in lexicographical
+        # ordering.
+        D = self.d**self.n
+        powers = self.d ** np.arange(self.n - 1, -1, -1)
+
+        return (np.arange(D)[:, np.newaxis] // powers) % self.d, powers
+
+    def permutation(self):
+        """
+        Returns the array perm such that the operator maps |k> to a multiple of
+        |perm[k]>.
+        """
+
+        k, powers = self._digits()
+
+        return ((k + self.x) % self.d) @ powers
+
+    def phases(self):
+        """
+        Returns the array c such that the operator maps |k> to c[k]|perm[k]>.
+        """
+
+        k, _ = self._digits()
+        e = (self.phase + ((k + self.x) % self.d) @ self.z) % self.d
+
+        return np.exp(2 * np.pi * 1j * e / self.d)
+
+    def apply(self, psi):
+        """
+        Applies the operator to the vector psi (or to the columns of the matrix
+        psi) in O(d^n) time per column.
+        """
+
+        psi = np.array(psi)
+        D = self.d**self.n
+
+        if psi.shape[0] != D:
+            raise ValueError("The dimension of psi does not match the operator.")
+
+        c = np.reshape(self.phases(), (D,) + (1,) * (psi.ndim - 1))
+        out = np.zeros(psi.shape, dtype=np.complex128)
+        out[self.permutation()] = c * psi
+
+        return out
+
+    def conjugate(self, rho):
+        """
+        Returns W*rho*W^dag, where W is the operator, without constructing W.
+        """
+
+        rho = np.array(rho)
+        perm = self.permutation()
+        c = self.phases()
+
+        out = np.zeros(rho.shape, dtype=np.complex128)
+        out[np.ix_(perm, perm)] = np.outer(c, np.conjugate(c)) * rho
+
+        return out
+
+    def __mul__(self, other):
+        if not isinstance(other, WeylOperator):
+            return NotImplemented
+        if self.d != other.d or self.n != other.n:
+            raise ValueError("The operators must act on the same space.")
+
+        # (Z^z1 X^x1)(Z^z2 X^x2)=w^{-x1.z2} Z^{z1+z2} X^{x1+x2}
+        phase = self.phase + other.phase - self.x @ other.z
+
+        return WeylOperator(self.d, self.z + other.z, self.x + other.x, phase)
+
+    def dag(self):
+        """
+        Returns the adjoint of the operator.
+        """
+
+        # (Z^z X^x)^dag=X^{-x} Z^{-z}=w^{-x.z} Z^{-z} X^{-x}
+        return WeylOperator(self.d, -self.z, -self.x, -self.phase - self.x @ self.z)
+
+    def commutes(self, other):
+        """
+        Returns True if the operator commutes with the operator other.
+        """
+
+        return (self.x @ other.z - self.z @ other.x) % self.d == 0
+
+    def __eq__(self, other):
+        if not isinstance(other, WeylOperator):
+            return NotImplemented
+
+        return (
+            self.d == other.d
+            and self.phase == other.phase
+            and np.array_equal(self.z, other.z)
+            and np.array_equal(self.x, other.x)
+        )
+
+    def __hash__(self):
+        return hash((self.d, self.phase, tuple(self.z), tuple(self.x)))
+
+    def __repr__(self):
+        return (
+            "WeylOperator(d="
+            + str(self.d)
+            + ", z="
+            + str(list(self.z))
+            + ", x="
+            + str(list(self.x))
+            + ", phase="
+            + str(self.phase)
+            + ")"
+        )
+
+    def to_sparse(self):
+        """
+        Returns the matrix of the operator as a scipy.sparse CSR matrix.
+        """
+
+        D = self.d**self.n
+
+        return sparse.csr_matrix(
+            (self.phases(), (self.permutation(), np.arange(D))), shape=(D, D)
+        )
+
+    def to_matrix(self):
+        """
+        Returns the matrix of the operator as a dense numpy array.
+        """
+
+        return self.to_sparse().toarray()
+
+
 def nQudit_cov_matrix(X, d, n):
     """
     Generates the matrix of second moments (aka covariance matrix) of an
@@ -145,6 +322,7 @@ def nQudit_cov_matrix(X, d, n):
     return V
 
 
+@operator_cache.memoize
 def nQudit_quadratures(d, n):
     """
     Returns the list of n-qudit "quadrature" operators, which are defined as
@@ -166,6 +344,9 @@ def nQudit_quadratures(d, n):
         .
         S[2n-2]=Id ⊗ Id ⊗ ... ⊗ X(0)
         S[2n-1]=Id ⊗ Id ⊗ ... ⊗ Z(0)
+
+    The operators are stored in the process-wide operator_cache (see qutipy.misc),
+    so the returned dictionary and matrices are read-only.
     """
 
     S = {}
@@ -181,24 +362,90 @@ def nQudit_quadratures(d, n):
     return S
 
 
-def nQudit_Weyl_coeff(X, d, n):
+def discrete_Weyl_transform(X, d, n):
+    """
+    Calculates the coefficients Tr[W^dag X] of the d^n x d^n matrix X for all of
+    the n-qudit discrete Weyl operators W=Z^z X^x, in the same order as in
+    nQudit_discrete_Weyl_basis (so that the index of the coefficient for (z,x) is
+    z*d^n+x, with z and x in lexicographical ordering).
+
+    Since Z^z X^x|k>=w^{z.(k+x)}|k+x>, the coefficient is
+
+        sum_j w^{-z.j} X[j,j-x],
+
+    i.e., for every x it is the n-dimensional discrete Fourier transform of the
+    (shifted) diagonal j -> X[j,j-x]. The total cost is O(d^(2n)log(d^n)).
+
+    X can also have leading (batch) dimensions, i.e., X can have the shape
+    (...,d^n,d^n), in which case the coefficients of every matrix in the batch are
+    calculated.
+    """
+
+    X = np.array(X)
+    D = d**n
+    batch = X.shape[:-2]
+
+    powers = d ** np.arange(n - 1, -1, -1)
+    k = (np.arange(D)[:, np.newaxis] // powers) % d
+
+    # cols[x,j] is the index of the basis element |j-x>.
+    cols = ((k[np.newaxis, :, :] - k[:, np.newaxis, :]) % d) @ powers
+    B = X[..., np.arange(D)[np.newaxis, :], cols]
+
+    B = np.reshape(B, batch + (D,) + (d,) * n)
+    b = len(batch)
+    C = np.fft.fftn(B, axes=list(range(b + 1, b + n + 1)))
+    C = np.swapaxes(np.reshape(C, batch + (D, D)), -1, -2)
+
+    return np.reshape(C, batch + (D * D,))
+
+
+def nQudit_Weyl_coeff(X, d, n, as_dict=True):
     """
     Generates the coefficients of the operator X acting on n qudit
     systems.
+
+    The coefficient for the pair (s,t) of lists of dits is (1/d^n)Tr[G^dag X],
+    where G=X^s Z^t is a product of the n-qudit X and Z operators. The
+    coefficients are returned as a dictionary with keys (str(s),str(t)). If
+    as_dict=False, then they are returned as a d^n x d^n array C instead, with
+    C[s,t] the coefficient for the pair (s,t) (each in lexicographical ordering).
+
+    Since X^s Z^t|k>=w^{t.k}|k+s>, the coefficient is
+
+        (1/d^n) sum_k w^{-t.k} X[k+s,k],
+
+    i.e., for every s it is the n-dimensional discrete Fourier transform of the
+    (shifted) diagonal k -> X[k+s,k]. All d^(2n) coefficients are therefore
+    obtained with d^n FFTs, in O(d^(2n)log(d^n)) time.
     """
 
-    C = {}
+    X = np.array(X)
+    D = d**n
+
+    powers = d ** np.arange(n - 1, -1, -1)
+    k = (np.arange(D)[:, np.newaxis] // powers) % d
+
+    # rows[s,k] is the index of the basis element |k+s>.
+    rows = ((k[:, np.newaxis, :] + k[np.newaxis, :, :]) % d) @ powers
+    B = X[rows, np.arange(D)[np.newaxis, :]]
+
+    B = np.reshape(B, (D,) + (d,) * n)
+    C = np.fft.fftn(B, axes=list(range(1, n + 1)))
+    C = (1 / d**n) * np.around(np.reshape(C, (D, D)), 10)
+
+    if not as_dict:
+        return C
 
     S = list(itertools.product(*[range(0, d)] * n))
 
-    for s in S:
-        s = list(s)
-        for t in S:
-            t = list(t)
-            G = generate_nQudit_X(d, s) @ generate_nQudit_Z(d, t)
-            C[(str(s), str(t))] = (1 / d**n) * np.around(Tr(dag(G) @ X), 10)
+    out = {}
 
-    return C
+    for i in range(D):
+        for j in range(D):
+            out[(str(list(S[i])), str(list(S[j])))] = C[i, j]
+
+    return out
 
 
 def flip_sign(d):
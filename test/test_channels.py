@@ -20,12 +20,15 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
 
+import cvxpy as cvx
 import numpy as np
 
 from qutipy.channels import (
     BB84_channel,
     Pauli_channel,
     Pauli_channel_nQubit,
+    ProductChannel,
+    QuantumChannel,
     amplitude_damping_channel,
     apply_channel,
     bit_flip_channel,
@@ -35,10 +38,12 @@ from qutipy.channels import (
     choi_to_natural,
     completely_dephasing_channel,
     compose_channels,
+    compress_kraus,
     dephasing_channel,
     depolarizing_channel,
     depolarizing_channel_n_uses,
     depolarizing_channel_nQubits,
+    diamond_distance_channels,
     diamond_norm,
     generalized_amplitude_damping_channel,
     generate_channel_isometry,
@@ -46,7 +51,9 @@ from qutipy.channels import (
     natural_representation,
     phase_damping_channel,
     tensor_channels,
+    transfer_matrix,
 )
+from qutipy.linalg import generate_linear_op_basis
 
 X = np.array([[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12], [13, 14, 15, 16]])
 
@@ -241,6 +248,37 @@ def test_diamond_norm():
     )
 
 
+def test_diamond_closed_forms():
+    paulis = [
+        np.eye(2),
+        np.array([[0, 1], [1, 0]]),
+        np.array([[0, -1j], [1j, 0]]),
+        np.array([[1, 0], [0, -1]]),
+    ]
+    p = np.array([0.7, 0.1, 0.15, 0.05])
+    q = np.array([0.85, 0.05, 0.05, 0.05])
+    K1 = [np.sqrt(p[i]) * paulis[i] for i in range(4)]
+    K2 = [np.sqrt(q[i]) * paulis[i] for i in range(4)]
+
+    for method in ["auto", "pauli", "sdp"]:
+        assert np.isclose(
+            diamond_distance_channels(K1, K2, 2, 2, method=method), 0.15, atol=1e-6
+        )
+
+    U = H
+    V = np.diag([1, np.exp(0.4j)])
+    assert np.isclose(diamond_distance_channels([U], [U @ V], 2, 2), np.sin(0.2))
+    assert np.isclose(
+        diamond_distance_channels([U], [U @ V], 2, 2, method="sdp"),
+        np.sin(0.2),
+        atol=1e-6,
+    )
+
+    J = choi_representation(K1, 2) - choi_representation(K2, 2)
+    assert np.isclose(diamond_norm(J, 2, 2, choi=True, method="pauli"), 0.3)
+    assert np.isclose(diamond_norm([np.diag([1, 0.5])], 2, 2, method="cp"), 1)
+
+
 def test_depolarizing_channel_nQubits():
     channel = depolarizing_channel_nQubits(2, 0.2)
 
@@ -642,3 +680,147 @@ def test_depolarizing_channel():
             ]
         )
     )
+
+
+def test_apply_channel_subsystems():
+    K = amplitude_damping_channel(0.3)
+    rho = np.arange(64).reshape((8, 8)) + 1j * np.arange(64).reshape((8, 8)).T
+
+    # Compare with the channel applied via the explicit full-space Kraus operators.
+    I = np.identity(2)
+    K_full = [np.kron(np.kron(k1, I), k2) for k1 in K for k2 in K]
+    expected = np.sum([k @ rho @ k.conj().T for k in K_full], 0)
+
+    assert np.allclose(apply_channel(K, rho, [1, 3], [2, 2, 2]), expected)
+    assert np.allclose(apply_channel(K, rho, [3, 1], [2, 2, 2]), expected)
+
+    # Channels with different input and output dimensions
+    K = [np.array([[1, 0]]), np.array([[0, 1]])]
+    out = apply_channel(K, rho, [2], [2, 2, 2])
+    assert out.shape == (4, 4)
+    rho_13 = np.trace(rho.reshape((2, 2, 2, 2, 2, 2)), axis1=1, axis2=4)
+    assert np.allclose(out, rho_13.reshape((4, 4)))
+
+
+def test_apply_channel_cvxpy():
+    K = amplitude_damping_channel(0.3)
+    rho = np.arange(64).reshape((8, 8)) + 1j * np.arange(64).reshape((8, 8)).T
+    X = cvx.Variable((8, 8), complex=True)
+    X.value = rho
+    for sys, adjoint in [([1, 3], False), ([2], True)]:
+        out = apply_channel(K, X, sys, [2, 2, 2], adjoint)
+        assert isinstance(out, cvx.Expression)
+        assert np.allclose(out.value, apply_channel(K, rho, sys, [2, 2, 2], adjoint))
+    K = [np.array([[1, 0]]), np.array([[0, 1]])]
+    out = apply_channel(K, X, [2], [2, 2, 2])
+    assert out.shape == (4, 4)
+    assert np.allclose(out.value, apply_channel(K, rho, [2], [2, 2, 2]))
+
+
+def test_apply_channel_batch():
+    K = amplitude_damping_channel(0.3)
+    rho = np.arange(64).reshape((8, 8)) + 1j * np.arange(64).reshape((8, 8)).T
+    R = np.array([rho, rho.T, 2 * rho])
+
+    out = apply_channel(K, R, [2], [2, 2, 2])
+    assert out.shape == (3, 8, 8)
+    for i in range(3):
+        assert np.all(out[i] == apply_channel(K, R[i], [2], [2, 2, 2]))
+
+    out = apply_channel(K, R[:, 0:2, 0:2])
+    assert np.allclose(out[1], apply_channel(K, R[1, 0:2, 0:2]))
+
+
+def test_transfer_matrix():
+    K = amplitude_damping_channel(0.3)
+    K = [np.kron(k1, k2) for k1 in K for k2 in amplitude_damping_channel(0.6)]
+    for basis in ["W", "Wtensor", "SU", "pauli"]:
+        B = generate_linear_op_basis(4, basis=basis)
+        expected = np.array(
+            [
+                [
+                    np.trace(B[i].conj().T @ apply_channel(K, B[j])) / 4
+                    for j in range(16)
+                ]
+                for i in range(16)
+            ]
+        )
+        assert np.allclose(transfer_matrix(K, 4, 4, basis=basis), expected)
+        assert np.allclose(transfer_matrix(K, 4, 4, basis=basis, fast=False), expected)
+
+
+def test_QuantumChannel():
+    K = generalized_amplitude_damping_channel(0.3, 0.4)
+    C = QuantumChannel.from_kraus(K)
+    assert np.allclose(C.choi, choi_representation(K, 2))
+    assert np.allclose(C.natural, natural_representation(K))
+    V = np.sum([np.kron(K[i], np.eye(4)[:, [i]]) for i in range(4)], 0)
+    assert np.allclose(C.stinespring, V)
+
+    rho = np.array([[0.6, 0.2 - 0.1j], [0.2 + 0.1j, 0.4]])
+    for D in [
+        QuantumChannel.from_choi(C.choi, 2, 2),
+        QuantumChannel.from_natural(C.natural, 2, 2),
+        QuantumChannel.from_stinespring(C.stinespring, 2, 2),
+    ]:
+        assert np.allclose(D.apply(rho), apply_channel(K, rho))
+        assert np.allclose(D.choi, C.choi)
+
+    assert np.allclose(choi_representation(C, normalized=True), C.choi / 2)
+    assert np.allclose(
+        transfer_matrix(C, basis="pauli"), transfer_matrix(K, 2, 2, "pauli")
+    )
+
+
+def test_ProductChannel():
+    A = amplitude_damping_channel(0.3)
+    R = [np.arange(6).reshape(3, 2) / 10, np.eye(3, 2) / 2]
+
+    P = tensor_channels([A, R], lazy=True)
+    K = tensor_channels([A, R])
+
+    assert isinstance(P, ProductChannel)
+    assert (P.dA, P.dB) == (4, 6)
+    assert all(np.allclose(a, b) for a, b in zip(P.iter_kraus(), K))
+    assert P._kraus is None
+    assert np.allclose(P.choi, choi_representation(K, 4))
+    assert np.allclose(P.natural, natural_representation(K))
+
+    rho = X @ X.T
+    assert np.allclose(apply_channel(P, rho), apply_channel(K, rho))
+    assert np.allclose(
+        apply_channel(P, np.kron(rho, rho), [2], [4, 4]),
+        apply_channel(K, np.kron(rho, rho), [2], [4, 4]),
+    )
+    assert P._kraus is None
+
+    Q = n_channel_uses(A, 3, lazy=True)
+    assert np.allclose(Q.choi, choi_representation(n_channel_uses(A, 3), 8))
+
+
+def test_compress_kraus():
+    K = compose_channels(
+        [
+            amplitude_damping_channel(0.2),
+            phase_damping_channel(0.3),
+            amplitude_damping_channel(0.1),
+        ]
+    )
+    J = choi_representation(K, 2)
+    J_id = choi_representation([np.eye(2)], 2)
+
+    for method in ["gram", "choi"]:
+        K_c = compress_kraus(K + [np.zeros((2, 2))], method=method)
+        assert len(K_c) == np.linalg.matrix_rank(J)
+        assert np.allclose(choi_representation(K_c, 2), J)
+
+        # The cutoff is relative, so small (nonzero) maps are kept.
+        K_c = compress_kraus([1e-7 * np.eye(2), 1e-7 * np.eye(2)], method=method)
+        assert len(K_c) == 1
+        assert np.allclose(choi_representation(K_c, 2) * 1e14, 2 * J_id)
+
+    K_c = compose_channels(
+        [amplitude_damping_channel(0.2), phase_damping_channel(0.3)], compress=True
+    )
+    assert len(K_c) == 3
+    assert len(n_channel_uses(K_c, 2, compress=True)) == 9
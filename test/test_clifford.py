@@ -23,11 +23,19 @@
 import numpy as np
 
 from qutipy.clifford import (
+    Clifford_group_element,
     Clifford_group_generators,
+    Clifford_group_size,
     Clifford_twirl_channel_one_qubit,
+    CliffordTableau,
+    PauliFrame,
     generate_Clifford_group,
     generate_state_2design,
+    random_Clifford,
+    state_2design_iter,
 )
+from qutipy.general_functions import unitary_distance
+from qutipy.pauli import PauliString
 
 X = np.array([[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12], [13, 14, 15, 16]])
 
@@ -294,8 +302,61 @@ def test_generate_Clifford_group():
     )
 
 
+def test_generate_Clifford_group_tableau():
+    group = generate_Clifford_group(2, as_tableau=True)
+    assert len(group) == Clifford_group_size(2) == 11520
+    assert set(group) == {
+        CliffordTableau.from_index(i, 2) for i in range(Clifford_group_size(2))
+    }
+
+
+def test_CliffordTableau():
+    U = Clifford_group_element(1234, 2)
+    V = Clifford_group_element(4321, 2)
+    T_U = CliffordTableau.from_unitary(U, 2)
+    T_V = CliffordTableau.from_unitary(V, 2)
+    assert T_U == CliffordTableau.from_index(1234, 2)
+    assert np.isclose(unitary_distance((T_U * T_V).to_unitary(), U @ V), 0)
+    assert T_U * T_U.inverse() == CliffordTableau.identity(2)
+
+
+def test_random_Clifford():
+    U = random_Clifford(3, rng=np.random.default_rng(1))
+    assert np.allclose(U @ U.conj().T, np.eye(8))
+    T = CliffordTableau.from_unitary(U, 3)
+    assert np.isclose(unitary_distance(T.to_unitary(), U), 0)
+
+
 def test_generate_state_2design():
     assert np.all(
         np.round(generate_state_2design([H], 1), 8)
         == np.array([[[1], [0]], [[0.70710678], [0.70710678]]])
     )
+
+
+def test_state_2design_iter():
+    states = list(state_2design_iter(generate_Clifford_group(2, as_tableau=True), 2))
+    assert len(states) == 60
+    assert len(generate_state_2design(generate_Clifford_group(1), 1)) == 6
+    assert np.allclose([np.linalg.norm(s) for s in states], 1)
+
+
+def test_PauliFrame():
+    frame = PauliFrame(3, shots=4)
+    frame.correct(
+        np.array([True, False, True, False]), PauliString.from_label("X"), [1]
+    )
+    frame.CNOT(1, 2)
+    frame.H(2)
+    frame.CZ(2, 3)
+    assert np.all(frame.x[0] == [1, 0, 0]) and np.all(frame.z[0] == [0, 1, 0])
+    assert np.all(
+        frame.commutes([PauliString.from_label("ZI")], [1, 3]) == [0, 1, 0, 1]
+    )
+    assert np.all(frame.measure(1) == [1, 0, 1, 0]) and not np.any(frame.x[:, 0])
+
+    frame = PauliFrame(2, shots=100000, rng=np.random.default_rng(1))
+    frame.Bell_noise(1, [[0.7, 0.1], [0.15, 0.05]])
+    XX, ZZ = PauliString.from_label("XX"), PauliString.from_label("ZZ")
+    assert abs(frame.fidelity([XX, ZZ]) - 0.7) < 0.01
+    assert abs(np.mean(frame.commutes([ZZ])) - 0.85) < 0.01
@@ -38,6 +38,7 @@ from qutipy.entropies import (
     relative_entropy_var,
     sandwiched_Renyi_mut_inf_state,
     sandwiched_Renyi_rel_ent,
+    spectral_cache,
 )
 
 X = np.array([[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12], [13, 14, 15, 16]])
@@ -114,3 +115,53 @@ def test_min_output_entropy():
     new_t = new_t[:2, :2] + new_t[2:, 2:]
     new_t = (new_t @ amplitude_damping_channel @ H)[0]
     assert np.round(min_output_entropy([new_t], 2), 4) == -19.8268
+
+
+def test_spectral_entropies():
+    rng = np.random.default_rng(1)
+    G = rng.normal(size=(3, 4, 4)) + 1j * rng.normal(size=(3, 4, 4))
+    rhos = G @ np.conj(np.transpose(G, (0, 2, 1)))
+    rhos = rhos / np.trace(rhos, axis1=1, axis2=2)[:, None, None]
+    sigma = np.eye(4) / 4
+
+    spectral_cache.clear()
+    D = relative_entropy(rhos, sigma)
+    assert D.shape == (3,)
+    assert np.allclose(D, 2 - entropy(rhos))
+    assert np.allclose(D, [relative_entropy(rho, sigma) for rho in rhos])
+    assert spectral_cache.stats()["misses"] == 1
+    assert np.allclose(relative_entropy_var(rhos, rhos), 0)
+
+    pure = np.diag([1.0, 0.0])
+    assert entropy(pure) == 0
+    assert relative_entropy(pure, np.eye(2) / 2) == 1
+    assert relative_entropy(np.eye(2) / 2, pure) == np.inf
+
+    rhoAB = np.kron(rhos[0][:2, :2] / np.trace(rhos[0][:2, :2]), np.eye(2) / 2)
+    assert np.isclose(mutual_information(rhoAB, 2, 2), 0)
+    assert np.isclose(coherent_inf_state(rhoAB, 2, 2), 1 - entropy(rhoAB))
+    assert np.isclose(Holevo_inf_ensemble([0.5, 0.5], [pure, np.eye(2) - pure]), 1)
+
+
+def test_pure_state_entropies():
+    psi = np.random.randn(6, 1) + 1j * np.random.randn(6, 1)
+    psi = psi / np.linalg.norm(psi)
+    rho = psi @ np.conj(psi.T)
+    assert entropy(psi) == 0
+    assert np.isclose(mutual_information(psi, 2, 3), mutual_information(rho, 2, 3))
+    assert np.isclose(coherent_inf_state(psi, 3, 2), coherent_inf_state(rho, 3, 2))
+
+
+def test_channel_optimization_multistart():
+    value, traces = min_output_entropy(
+        amplitude_damping_channel, 2, display=False, starts=2, return_all=True
+    )
+    assert np.round(value, 6) == 0
+    assert len(traces) == 2
+    assert np.isclose(min(trace[-1] for trace in traces), value)
+
+    value, traces = coherent_inf_channel(
+        amplitude_damping_channel, 2, 2, display=False, starts=2, return_all=True
+    )
+    assert np.round(value, 6) == 0.456892
+    assert np.isclose(max(trace[-1] for trace in traces), value)
@@ -41,7 +41,9 @@ def test_avg_fidelity():
 
 
 def test_avg_fidelity_qubit():
-    assert np.round(avg_fidelity_qubit(H @ (X / 20)[2:, 2:]), 5) == 0.9325
+    assert np.round(avg_fidelity_qubit([H]), 8) == 0.33333333
+    K = [np.array([[1, 0], [0, np.sqrt(0.7)]]), np.array([[0, np.sqrt(0.3)], [0, 0]])]
+    assert np.isclose(avg_fidelity_qubit(K), avg_fidelity(K, 2))
 
 
 def test_ent_fidelity():
@@ -55,3 +57,12 @@ def test_ent_fidelity_channel():
 def test_fidelity():
     assert fidelity(H, X[:2, :2]) == 13.178570359601418
     assert fidelity(H, X[::2, ::2]) == 24.91835598486949
+
+
+def test_fidelity_state_vector():
+    psi = np.array([[1], [1j]]) / np.sqrt(2)
+    phi = np.array([[1], [0]])
+    rho = np.array([[0.7, 0.1], [0.1, 0.3]])
+    assert np.isclose(fidelity(psi, phi), 0.5)
+    assert np.isclose(fidelity(rho, phi), 0.7)
+    assert np.isclose(fidelity(psi, rho), fidelity(psi @ psi.conj().T, rho))
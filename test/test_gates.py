@@ -26,6 +26,7 @@ from qutipy.gates import (
     CNOT_ij,
     CZ_ij,
     H_i,
+    LocalGate,
     RandomUnitary,
     Rx,
     Rx_i,
@@ -167,3 +168,21 @@ def test_Rz():
 
 def test_S_i():
     assert np.all(S_i(1, 1) == np.array([[1.0, 0.0], [0.0, 1j]]))
+
+
+def test_LocalGate():
+    n = 4
+    X = np.random.randn(2**n, 2**n) + 1j * np.random.randn(2**n, 2**n)
+    psi = np.random.randn(2**n, 1)
+
+    for gate, args in [(CNOT_ij, (3, 1)), (CZ_ij, (2, 4)), (Ry_i, (3, 0.4))]:
+        U = gate(*args, n)
+        G = gate(*args, n, local=True)
+        assert np.allclose(gate(*args, n, sparse=True).toarray(), U)
+        assert np.allclose(G @ X, U @ X) and np.allclose(X @ G, X @ U)
+        assert np.allclose(G.apply(X), U @ X @ U.conj().T)
+        assert np.allclose(G.apply(psi), U @ psi)
+
+    G = LocalGate(RandomUnitary(4), [4, 2], n)
+    assert np.allclose(G.adjoint() @ (G @ psi), psi)
+    assert np.allclose(G.to_matrix() @ psi, G @ psi)
@@ -32,8 +32,11 @@ from qutipy.general_functions import (
     get_subblock,
     ket,
     partial_trace,
+    partial_trace_map,
     partial_transpose,
+    partial_transpose_map,
     permute_tensor_factors,
+    pure_state_key,
     spectral_norm,
     syspermute,
     tensor,
@@ -100,6 +103,35 @@ def test_partial_trace():
     assert partial_trace(X, [2], [2]) == 34
 
 
+def test_partial_trace_batch():
+    R = np.array([random_density_matrix(12) for _ in range(6)]).reshape(2, 3, 12, 12)
+    out = partial_trace(R, [1, 3], [2, 3, 2])
+    assert out.shape == (2, 3, 3, 3)
+    assert np.all(out[1, 2] == partial_trace(R[1, 2], [1, 3], [2, 3, 2]))
+    out = partial_transpose(R, [2], [2, 3, 2])
+    assert np.all(out[0, 1] == partial_transpose(R[0, 1], [2], [2, 3, 2]))
+    out = syspermute(R, [3, 1, 2], [2, 3, 2])
+    assert np.all(out[1, 0] == syspermute(R[1, 0], [3, 1, 2], [2, 3, 2]))
+
+
+def test_partial_trace_state_vector():
+    psi = np.random.randn(12, 1) + 1j * np.random.randn(12, 1)
+    rho = psi @ dag(psi)
+    for sys in [[2], [1, 3], [1, 2, 3]]:
+        assert np.allclose(
+            partial_trace(psi, sys, [2, 3, 2]), partial_trace(rho, sys, [2, 3, 2])
+        )
+    assert np.allclose(
+        partial_transpose(psi, [1, 3], [2, 3, 2]),
+        partial_transpose(rho, [1, 3], [2, 3, 2]),
+    )
+    phi = np.random.randn(12, 1)
+    assert np.isclose(
+        trace_distance_pure_states(psi, phi),
+        trace_distance_pure_states(rho, phi @ phi.T),
+    )
+
+
 def test_partial_transpose():
     dimA = 2
     assert np.all(
@@ -115,6 +147,38 @@ def test_partial_transpose():
     )
 
 
+def test_partial_trace_map():
+    R = random_density_matrix(12)
+    for sys in [[2], [1, 3]]:
+        out = partial_trace(R, sys, [2, 3, 2])
+        M = partial_trace_map(sys, [2, 3, 2])
+        assert np.allclose(M @ R.reshape(-1), out.reshape(-1))
+        assert np.allclose(M @ R.reshape(-1, order="F"), out.reshape(-1, order="F"))
+    M = partial_transpose_map([1, 3], [2, 3, 2])
+    assert np.allclose(
+        (M @ R.reshape(-1)).reshape(12, 12), partial_transpose(R, [1, 3], [2, 3, 2])
+    )
+
+
+def test_partial_trace_cvxpy():
+    R = random_density_matrix(12)
+    X = cvx.Variable((12, 12), hermitian=True)
+    X.value = R
+    for sys in [[2], [1, 3], [1, 2, 3]]:
+        out = partial_trace(X, sys, [2, 3, 2])
+        assert isinstance(out, cvx.Expression)
+        assert np.allclose(out.value, partial_trace(R, sys, [2, 3, 2]))
+    out = partial_transpose(X, [1, 3], [2, 3, 2])
+    assert np.allclose(out.value, partial_transpose(R, [1, 3], [2, 3, 2]))
+    out = syspermute(X, [3, 1, 2], [2, 3, 2])
+    assert np.allclose(out.value, syspermute(R, [3, 1, 2], [2, 3, 2]))
+    Y = cvx.Variable((6, 20))
+    Y.value = np.arange(120).reshape(6, 20)
+    out = partial_transpose(Y, [2], [(2, 4), (3, 5)])
+    assert out.shape == (10, 12)
+    assert np.allclose(out.value, partial_transpose(Y.value, [2], [(2, 4), (3, 5)]))
+
+
 def test_permute_tensor_factors():
     permuted_tensor = permute_tensor_factors([1, 2], [2, 2])
     assert permuted_tensor.shape == (4, 4)
@@ -127,6 +191,13 @@ def test_permute_tensor_factors():
     )
 
 
+def test_pure_state_key():
+    psi = (ket(4, 1) + 1j * ket(4, 2)) / np.sqrt(2)
+    assert pure_state_key(psi) == pure_state_key(np.exp(0.3j) * psi)
+    assert pure_state_key(psi) == pure_state_key(-psi + 1e-14)
+    assert pure_state_key(psi) != pure_state_key(np.conjugate(psi))
+
+
 def test_syspermute():
     # NOTE: Dims is [2, 2] and not [4, 4] as the dims are for states and not
     # for matrix
@@ -22,7 +22,7 @@
 
 import numpy as np
 
-from qutipy.linalg import gram_schmidt, proj, rank
+from qutipy.linalg import generate_linear_op_basis, gram_schmidt, proj, rank
 
 X = np.array([[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12], [13, 14, 15, 16]])
 
@@ -52,3 +52,15 @@ def test_proj():
 
 def test_rank():
     assert rank(X) == 2
+
+
+def test_generate_linear_op_basis():
+    B = generate_linear_op_basis(4, basis="pauli")
+    assert B.shape == (16, 4, 4)
+    assert not B.flags.writeable
+    assert generate_linear_op_basis(4, basis="Pauli") is B
+    assert generate_linear_op_basis(9, basis="Wtensor", local_dimension=3).shape == (
+        81,
+        9,
+        9,
+    )
@@ -0,0 +1,130 @@
+#               This file is part of the QuTIpy package.
+#                https://github.com/sumeetkhatri/QuTIpy
+#
+#                   Copyright (c) 2023 Sumeet Khatri.
+#                       --.- ..- - .. .--. -.--
+#
+#
+# SPDX-License-Identifier: AGPL-3.0
+#
+#  This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import cvxpy as cvx
+import numpy as np
+import pytest
+
+from qutipy.entropies import max_relative_entropy
+from qutipy.misc import (
+    LRUCache,
+    batch_solve,
+    read_only,
+    sdp_template,
+    solve_sdp_template,
+)
+
+
+def test_LRUCache():
+    cache = LRUCache(max_bytes=3000)
+    for i in range(5):
+        cache.put(i, np.zeros(100))
+    assert list(cache._data) == [2, 3, 4]
+    assert cache.get(2) is not None
+    assert cache.get(0) is None
+    cache.put(5, np.zeros(100))
+    assert 2 in cache and 3 not in cache
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["evictions"] == 3
+
+    calls = []
+
+    @cache.memoize
+    def f(n, scale=1):
+        calls.append(n)
+        return scale * np.ones(n)
+
+    assert f(3) is f(3, scale=1)
+    assert calls == [3]
+    assert not f(3).flags.writeable
+
+    cache.clear()
+    assert len(cache) == 0 and cache.stats()["hits"] == 0
+
+
+def test_read_only():
+    out = read_only({"a": [np.zeros(2), np.ones(2)]})
+    assert isinstance(out["a"], tuple)
+    assert not out["a"][1].flags.writeable
+
+
+def test_sdp_template():
+    builds = []
+
+    def build():
+        builds.append(1)
+        A = cvx.Parameter((2, 2), hermitian=True)
+        X = cvx.Variable((2, 2), hermitian=True)
+        c = [X >> 0, cvx.trace(X) == 1]
+        obj = cvx.Maximize(cvx.real(cvx.trace(A @ X)))
+        return cvx.Problem(obj, constraints=c), {"A": A}, {"X": X}
+
+    for a in [1.0, 2.0, 3.0]:
+        template = sdp_template(("test_sdp_template", 2), build)
+        value, var = solve_sdp_template(template, {"A": np.diag([a, 0])})
+        assert np.isclose(value, a, atol=1e-4)
+        assert np.isclose(var["X"][0, 0], 1, atol=1e-4)
+
+    assert len(builds) == 1
+
+
+def test_batch_solve():
+    P = np.diag([0.5, 0.5])
+    inputs = [(P, np.diag([q, 1 - q])) for q in [0.25, 0.5]] + ["not an operator"]
+
+    out = batch_solve(max_relative_entropy, inputs, processes=2, sdp=False)
+
+    assert np.isclose(out[0], 1)
+    assert np.isclose(out[1], 0)
+    assert isinstance(out[2], Exception)
+
+    out = batch_solve(np.round, [{"a": 2.6}, 3.4], processes=1)
+    assert out == [3.0, 3.0]
+
+    out = batch_solve(time.sleep, [5], processes=1, timeout=0.1)
+    assert isinstance(out[0], TimeoutError)
+
+    with pytest.raises(ValueError):
+        batch_solve(np.sqrt, [1, 4], processes=0)
+
+
+def _exit_on_one(i):
+    if i == 1:
+        os._exit(1)
+    return i
+
+
+def test_batch_solve_worker_failures():
+    out = batch_solve(_exit_on_one, range(6), processes=2, chunksize=3)
+    assert isinstance(out[1], BrokenProcessPool)
+    assert out[:1] + out[2:] == [0, 2, 3, 4, 5]
+
+    start = time.monotonic()
+    out = batch_solve(time.sleep, [0, 5, 0], processes=2, timeout=0.2)
+    assert out[0] is None and out[2] is None
+    assert isinstance(out[1], TimeoutError)
+    assert time.monotonic() - start < 4
@@ -24,6 +24,8 @@ import numpy as np
 
 from qutipy.pauli import (
     Pauli_coeff_to_matrix,
+    Pauli_transform,
+    PauliString,
     generate_nQubit_Pauli,
     generate_nQubit_Pauli_X,
     generate_nQubit_Pauli_Z,
@@ -258,3 +260,37 @@ def test_Pauli_coeff_to_matrix():
         Pauli_coeff_to_matrix([1, 2, 3, 4], 1)
         == np.array([[2.5 + 0.0j, 1.0 - 1.5j], [1.0 + 1.5j, -1.5 + 0.0j]])
     )
+
+
+def test_Pauli_transform():
+    Y = np.arange(64).reshape(8, 8) + 1j * np.arange(64).reshape(8, 8).T
+    C = Pauli_transform(Y, 3)
+    C_dict = nQubit_Pauli_coeff(Y, 3, return_dict=True)
+    for index in C_dict.keys():
+        sigma = generate_nQubit_Pauli(index)
+        assert np.isclose(C_dict[index], np.trace(sigma.conj().T @ Y))
+    assert np.allclose(C, list(C_dict.values()))
+    assert np.allclose(Pauli_transform(C, 3, inverse=True), Y)
+
+    Ys = np.array([X, 2 * X, X.T])
+    Cs = Pauli_transform(Ys, 2)
+    assert Cs.shape == (3, 16)
+    assert np.allclose(Cs[2], nQubit_Pauli_coeff(X.T, 2))
+    assert np.allclose(Pauli_transform(Cs, 2, inverse=True), Ys)
+
+
+def test_PauliString():
+    P = PauliString.from_label("XYZ")
+    Q = PauliString.from_indices([3, 0, 0], phase=2)
+    assert str(Q) == "-ZII"
+    assert np.all(P.to_matrix() == generate_nQubit_Pauli([1, 2, 3]))
+    assert np.allclose((P * Q).to_matrix(), P.to_matrix() @ Q.to_matrix())
+    assert not P.commutes(Q)
+    assert P.commutes(P * P)
+    assert P * P == PauliString.from_label("III")
+
+    psi = np.arange(8).reshape(8, 1) + 1j
+    rho = psi @ psi.conj().T
+    assert np.allclose(P.apply(psi), P.to_matrix() @ psi)
+    assert np.isclose(P.expectation(psi), np.trace(P.to_matrix() @ rho))
+    assert np.isclose(Q.expectation(rho), np.trace(Q.to_matrix() @ rho))
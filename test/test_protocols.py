@@ -20,10 +20,13 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
 
+import itertools
+
 import numpy as np
 
 from qutipy.channels import amplitude_damping_channel as damping_channel
 from qutipy.channels import choi_representation
+from qutipy.general_functions import syspermute, tensor
 from qutipy.protocols import (
     apply_ent_swap_GHZ_chain_channel,
     apply_ent_swap_GHZ_channel,
@@ -39,7 +42,12 @@ from qutipy.protocols import (
     post_teleportation_fidelity,
     state_discrimination,
 )
-from qutipy.states import random_density_matrix
+from qutipy.states import (
+    Bell_diagonal_coefficients,
+    Bell_diagonal_state,
+    bell,
+    random_density_matrix,
+)
 
 X = np.array([[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12], [13, 14, 15, 16]])
 H = np.dot(np.sqrt(1 / 2), np.array([[1, 1], [1, -1]]))
@@ -459,3 +467,63 @@ def test_apply_teleportation_channel():
 
 def test_post_teleportation_chain_fidelity():
     assert np.round(post_teleportation_chain_fidelity(RDM, 1), 8) == 0.18003
+
+
+def test_Pauli_frame_protocols():
+    # Bell-diagonal inputs with deterministic errors, for which the fidelity is 0
+    # or 1, are compared with the dense calculation.
+    A_G = np.array([[0, 1, 1], [1, 0, 0], [1, 0, 0]])
+    for zx in itertools.product(range(2), repeat=6):
+        p = [np.zeros((2, 2)) for _ in range(3)]
+        for k in range(3):
+            p[k][zx[2 * k], zx[2 * k + 1]] = 1
+        rho = tensor(
+            *[bell(zx[2 * k], zx[2 * k + 1], as_matrix=True) for k in range(3)]
+        )
+        f_GHZ = post_ent_swap_GHZ_chain_fidelity(p, 2)
+        assert np.isclose(f_GHZ, post_ent_swap_GHZ_chain_fidelity(rho, 2))
+        rho = syspermute(rho, [1, 3, 5, 2, 4, 6], [2] * 6)
+        f_G = post_graph_state_dist_fidelity(A_G, 3, p, shots=1)
+        assert np.isclose(f_G, post_graph_state_dist_fidelity(A_G, 3, rho))
+
+    # Random Bell-diagonal inputs, compared with the dense calculation.
+    rng = np.random.default_rng(1)
+    for n in [1, 2]:
+        p = [rng.dirichlet(np.ones(4)).reshape((2, 2)) for _ in range(n + 1)]
+        rho = tensor(*[Bell_diagonal_state(2, q) for q in p])
+        assert np.isclose(
+            post_ent_swap_GHZ_chain_fidelity(p, n),
+            post_ent_swap_GHZ_chain_fidelity(rho, n),
+        )
+
+    # For the GHZ chain, the fidelity is (prod_k q_k + prod_k d_k)/2, where q_k is
+    # the probability of no X error and d_k=p_k[0,0]-p_k[1,0].
+    n = 150
+    p = np.array([[0.997, 0.001], [0.001, 0.001]])
+    f = post_ent_swap_GHZ_chain_fidelity([p] * (n + 1), n)
+    assert np.isclose(f, (0.998 ** (n + 1) + 0.996 ** (n + 1)) / 2)
+
+    A_G = np.diag(np.ones(n - 1, dtype=int), 1) + np.diag(np.ones(n - 1, dtype=int), -1)
+    p = np.array([[1.0, 0], [0, 0]])
+    assert post_graph_state_dist_fidelity(A_G, n, [p] * n, shots=10) == 1
+
+
+def test_teleportation_chain_Bell_diagonal():
+    rng = np.random.default_rng(1)
+    for d, n in [(2, 2), (3, 1)]:
+        P = [rng.dirichlet(np.ones(d**2)).reshape((d, d)) for _ in range(n + 1)]
+        rho = tensor(*[Bell_diagonal_state(d, p) for p in P])
+        q = apply_teleportation_chain_channel(P, n, d, d, d)
+        rho_out = apply_teleportation_chain_channel(rho, n, d, d, d)
+        assert np.allclose(Bell_diagonal_state(d, q), rho_out)
+        assert np.allclose(Bell_diagonal_coefficients(rho_out, d), q)
+        assert np.isclose(
+            post_teleportation_chain_fidelity(P, n, d),
+            post_teleportation_chain_fidelity(rho, n, d),
+        )
+
+    # Werner states: the fidelity parameter of the output is the product of those
+    # of the inputs.
+    p = np.array([[0.85, 0.05], [0.05, 0.05]])
+    f = post_teleportation_chain_fidelity([p] * 51, 50)
+    assert np.isclose(f, 0.25 + 0.75 * 0.8**51)
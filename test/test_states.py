@@ -24,22 +24,26 @@ import warnings
 
 import numpy as np
 
+from qutipy.general_functions import dag, tensor
 from qutipy.states import (
     GHZ,
-    Bell,
     Werner_state,
     apply_discrete_Weyl_twirl,
     apply_isotropic_twirl,
     apply_Pauli_twirl,
     apply_Werner_twirl,
+    bell,
     graph_state,
     isotropic_state,
     max_ent,
     max_mix,
+    occupation_number_state_asym,
+    occupation_number_state_sym,
     random_density_matrix,
     random_state_vector,
     singlet_state,
 )
+from qutipy.weyl import discrete_Weyl
 
 dim = 3
 
@@ -109,7 +113,7 @@ def test_Bell():
     z = 1
     x = 1
     assert np.all(
-        np.round(Bell(d, z, x, as_matrix=True), 5)
+        np.round(bell(z, x, d, as_matrix=True), 5)
         == np.array(
             [
                 [0.0 + 0.0j, 0.0 + 0.0j, 0.0 + 0.0j, 0.0 + 0.0j],
@@ -239,103 +243,103 @@ def test_apply_discrete_Weyl_twirl():
         == np.array(
             [
                 [
-                    369.0 + 0.0j,
+                    41.0 + 0.0j,
                     -0.0 - 0.0j,
                     0.0 - 0.0j,
                     -0.0 - 0.0j,
                     0.0 - 0.0j,
-                    369.0 + 0.0j,
+                    41.0 + 0.0j,
                     0.0 - 0.0j,
-                    369.0 + 0.0j,
+                    41.0 + 0.0j,
                     -0.0 - 0.0j,
                 ],
                 [
                     -0.0 + 0.0j,
-                    369.0 + 0.0j,
+                    41.0 + 0.0j,
                     0.0 - 0.0j,
-                    369.0 + 0.0j,
+                    41.0 + 0.0j,
                     0.0 - 0.0j,
                     0.0 - 0.0j,
                     -0.0 - 0.0j,
                     0.0 - 0.0j,
-                    369.0 + 0.0j,
+                    41.0 + 0.0j,
                 ],
                 [
                     0.0 + 0.0j,
                     -0.0 + 0.0j,
-                    369.0 - 0.0j,
+                    41.0 - 0.0j,
                     -0.0 + 0.0j,
-                    369.0 + 0.0j,
+                    41.0 + 0.0j,
                     0.0 - 0.0j,
-                    369.0 - 0.0j,
+                    41.0 - 0.0j,
                     0.0 - 0.0j,
                     0.0 - 0.0j,
                 ],
                 [
                     -0.0 + 0.0j,
-                    369.0 + 0.0j,
+                    41.0 + 0.0j,
                     -0.0 - 0.0j,
-                    369.0 - 0.0j,
+                    41.0 - 0.0j,
                     0.0 - 0.0j,
                     0.0 - 0.0j,
                     -0.0 - 0.0j,
                     0.0 - 0.0j,
-                    369.0 + 0.0j,
+                    41.0 + 0.0j,
                 ],
                 [
                     0.0 + 0.0j,
                     0.0 + 0.0j,
-                    369.0 - 0.0j,
+                    41.0 - 0.0j,
                     -0.0 + 0.0j,
-                    369.0 + 0.0j,
+                    41.0 + 0.0j,
                     0.0 - 0.0j,
-                    369.0 + 0.0j,
+                    41.0 + 0.0j,
                     0.0 - 0.0j,
                     0.0 - 0.0j,
                 ],
                 [
-                    369.0 - 0.0j,
+                    41.0 - 0.0j,
                     0.0 + 0.0j,
                     0.0 + 0.0j,
                     0.0 + 0.0j,
                     0.0 + 0.0j,
-                    369.0 + 0.0j,
+                    41.0 + 0.0j,
                     0.0 + 0.0j,
-                    369.0 + 0.0j,
+                    41.0 + 0.0j,
                     0.0 - 0.0j,
                 ],
                 [
                     0.0 + 0.0j,
                     -0.0 + 0.0j,
-                    369.0 + 0.0j,
+                    41.0 + 0.0j,
                     0.0 + 0.0j,
-                    369.0 + 0.0j,
+                    41.0 + 0.0j,
                     0.0 - 0.0j,
-                    369.0 + 0.0j,
+                    41.0 + 0.0j,
                     0.0 - 0.0j,
                     0.0 - 0.0j,
                 ],
                 [
-                    369.0 - 0.0j,
+                    41.0 - 0.0j,
                     0.0 + 0.0j,
                     0.0 + 0.0j,
                     0.0 + 0.0j,
                     0.0 + 0.0j,
-                    369.0 + 0.0j,
+                    41.0 + 0.0j,
                     0.0 + 0.0j,
-                    369.0 + 0.0j,
+                    41.0 + 0.0j,
                     0.0 - 0.0j,
                 ],
                 [
                     -0.0 + 0.0j,
-                    369.0 - 0.0j,
+                    41.0 - 0.0j,
                     0.0 + 0.0j,
-                    369.0 - 0.0j,
+                    41.0 - 0.0j,
                     0.0 + 0.0j,
                     0.0 + 0.0j,
                     0.0 + 0.0j,
                     0.0 + 0.0j,
-                    369.0 + 0.0j,
+                    41.0 + 0.0j,
                 ],
             ]
         )
@@ -354,3 +358,31 @@ def test_apply_Pauli_twirl():
             ]
         )
     )
+
+
+def test_twirl_projections():
+    Z = np.random.randn(27, 27) + 1j * np.random.randn(27, 27)
+    T = apply_discrete_Weyl_twirl(Z, 3, 3)
+    W = [tensor([discrete_Weyl(3, z, x), 3]) for z in range(3) for x in range(3)]
+    assert np.allclose(T, np.sum([U @ Z @ dag(U) for U in W], 0) / 9)
+    assert np.allclose(apply_discrete_Weyl_twirl(T, 3, 3), T)
+
+    Z = np.random.randn(16, 16)
+    T = apply_Pauli_twirl(Z, 2, 2) / 16
+    assert np.allclose(apply_Pauli_twirl(T, 2, 2) / 16, T)
+    assert np.allclose(
+        apply_Werner_twirl(apply_Werner_twirl(Z, 4), 4), apply_Werner_twirl(Z, 4)
+    )
+
+
+def test_occupation_number_states():
+    sym = occupation_number_state_sym(2, 3, (1, 2))
+    assert np.allclose(sym.flatten(), np.array([0, 0, 0, 1, 0, 1, 1, 0]) / np.sqrt(3))
+    asym = occupation_number_state_asym(3, 3, (1, 1, 1))
+    assert np.isclose(asym[5, 0], 1 / np.sqrt(6))
+    assert np.isclose(asym[7, 0], -1 / np.sqrt(6))
+    assert np.allclose(occupation_number_state_asym(3, 3, (0, 2, 1)), 0)
+
+    v = occupation_number_state_sym(3, 12, (4, 4, 4), sparse=True)
+    assert v.shape == (3**12, 1) and v.nnz == 34650
+    assert np.isclose(np.linalg.norm(v.data), 1)
@@ -22,7 +22,13 @@
 
 import numpy as np
 
-from qutipy.states import check_kext, log_negativity
+from qutipy.general_functions import SWAP
+from qutipy.states import (
+    check_kext,
+    log_negativity,
+    max_ent,
+    symmetric_subspace_isometry,
+)
 
 X = np.array([[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12], [13, 14, 15, 16]])
 H = np.dot(np.sqrt(1 / 2), np.array([[1, 1], [1, -1]]))
@@ -316,3 +322,26 @@ def test_check_kext():
             [[0.70711 + 0.0j, 0.70711 + 0.0j], [0.70711 + 0.0j, -0.70711 + 0.0j]]
         )
     )
+
+
+def test_check_kext_bose_symmetric():
+    V = symmetric_subspace_isometry(2, 3)
+    assert V.shape == (8, 4)
+    assert np.allclose((V.T @ V).toarray(), np.eye(4))
+    phi = max_ent(2, as_matrix=True)
+    for p, k in [(0.3, 3), (0.7, 2)]:
+        rho = p * phi + (1 - p) * np.eye(4) / 4
+        full, _ = check_kext(rho, 2, 2, k)
+        bose, S = check_kext(rho, 2, 2, k, bose_symmetric=True)
+        assert S.shape == (2 * (k + 1), 2 * (k + 1))
+        assert np.sign(np.round(full, 4)) == np.sign(np.round(bose, 4))
+    rho = 0.3 * phi + 0.7 * np.eye(4) / 4
+    assert check_kext(rho, 2, 2, 8, bose_symmetric=True, PPT=True)[0] > 0
+    rho = 0.5 * phi + 0.5 * np.eye(4) / 4
+    assert check_kext(rho, 2, 2, 1, bose_symmetric=True)[0] > 0
+    assert check_kext(rho, 2, 2, 1, bose_symmetric=True, PPT=True)[0] == -np.inf
+    # A Bose-symmetric extension is stronger than a k-extension.
+    P = (np.eye(9) - SWAP([1, 2], [3, 3])) / 2
+    rho = 0.9 * P / 3 + 0.1 * np.eye(9) / 9
+    assert check_kext(rho, 3, 3, 2)[0] > 0
+    assert check_kext(rho, 3, 3, 2, bose_symmetric=True)[0] < 0
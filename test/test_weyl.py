@@ -23,6 +23,7 @@
 import numpy as np
 
 from qutipy.weyl import (
+    WeylOperator,
     discrete_Weyl,
     discrete_Weyl_X,
     discrete_Weyl_Z,
@@ -108,6 +109,29 @@ def test_nQudit_Weyl_coeff():
     )
 
 
+def test_nQudit_Weyl_coeff_array():
+    Y = np.arange(81).reshape(9, 9) * (1 + 1j)
+    C = nQudit_Weyl_coeff(Y, 3, 2, as_dict=False)
+    G = generate_nQudit_X(3, [2, 1]) @ generate_nQudit_Z(3, [0, 2])
+    assert np.isclose(C[7, 2], np.trace(G.conj().T @ Y) / 9)
+    assert nQudit_Weyl_coeff(Y, 3, 2)[("[2, 1]", "[0, 2]")] == C[7, 2]
+
+
+def test_WeylOperator():
+    W = WeylOperator(3, [1, 2], [2, 0], phase=1)
+    V = WeylOperator(3, [0, 1], [1, 1])
+    Y = np.arange(81).reshape(9, 9) * (1 + 1j)
+    assert np.allclose(
+        WeylOperator(3, [1, 2], [2, 0]).to_matrix(),
+        generate_nQudit_Z(3, [1, 2]) @ generate_nQudit_X(3, [2, 0]),
+    )
+    assert np.allclose((W * V).to_matrix(), W.to_matrix() @ V.to_matrix())
+    assert np.allclose(W.dag().to_matrix(), W.to_matrix().conj().T)
+    assert np.allclose(W.apply(Y), W.to_matrix() @ Y)
+    assert np.allclose(W.conjugate(Y), W.to_matrix() @ Y @ W.to_matrix().conj().T)
+    assert W * W.dag() == WeylOperator(3, [0, 0], [0, 0])
+
+
 def test_nQudit_quadratures():
     quadratures = nQudit_quadratures(2, 2)
     assert np.all(